@@ -0,0 +1,10 @@
+"""
+Micro benchmarks for Rango.
+
+Run a benchmark from the project root, for example:
+
+    python -m benchmarks.bench_api
+
+Every benchmark runs against a fresh test database, so the development
+database is never touched.
+"""
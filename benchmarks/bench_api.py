@@ -0,0 +1,45 @@
+"""
+Compares a v1 API request through the full middleware stack with
+session authentication against the lean API path with a signed key.
+"""
+from benchmarks.harness import measure
+from benchmarks.harness import report
+from benchmarks.harness import setup_database
+
+from django.contrib.auth.models import User
+from django.test import Client
+from django.test import override_settings
+
+from rango.api.v1.authentication import make_api_key
+from rango.models import Category
+
+UNTHROTTLED = {'api': {'capacity': 10 ** 9, 'refill_rate': 10 ** 9},
+               'ajax': {'capacity': 10 ** 9, 'refill_rate': 10 ** 9}}
+
+
+def main():
+    setup_database()
+    user = User.objects.create_user('bench', password='bench')
+    for i in range(20):
+        Category.objects.create(name='Category %d' % i)
+
+    results = {}
+
+    with override_settings(RANGO_API_LEAN_MIDDLEWARE=False,
+                           RANGO_THROTTLE_RATES=UNTHROTTLED):
+        client = Client()
+        client.force_login(user)
+        results['full stack, session auth'] = measure(
+            lambda: client.get('/api/Category/'))
+
+    with override_settings(RANGO_API_LEAN_MIDDLEWARE=True,
+                           RANGO_THROTTLE_RATES=UNTHROTTLED):
+        client = Client(HTTP_AUTHORIZATION='Key ' + make_api_key(user))
+        results['lean stack, signed key'] = measure(
+            lambda: client.get('/api/Category/'))
+
+    report('GET /api/Category/ (20 categories)', results)
+
+
+if __name__ == '__main__':
+    main()
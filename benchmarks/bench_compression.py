@@ -0,0 +1,81 @@
+"""
+Measures the CPU time and the bytes saved by each gzip level and brotli
+quality on real responses, the HTML pages rendered from
+base_bootstrap.html and JSON from the v1 API, to pick the levels of
+CompressionMiddleware.
+"""
+from benchmarks.harness import measure
+from benchmarks.harness import setup_database
+
+from django.contrib.auth.models import User
+from django.test import Client
+from django.test import override_settings
+
+from rango.api.v1.authentication import make_api_key
+from rango.compression import available_encodings
+from rango.compression import compress
+from rango.models import Category
+from rango.models import Page
+
+UNTHROTTLED = {'api': {'capacity': 10 ** 9, 'refill_rate': 10 ** 9},
+               'ajax': {'capacity': 10 ** 9, 'refill_rate': 10 ** 9}}
+
+LEVELS = {
+    'gzip': [1, 4, 6, 9],
+    'br': [1, 3, 4, 5, 6, 8, 11],
+}
+
+
+def fetch_bodies(user):
+    """
+    Returns:
+        dict: the uncompressed response bodies by label.
+    """
+    client = Client()
+    client.force_login(user)
+    api = Client(HTTP_AUTHORIZATION='Key ' + make_api_key(user))
+    category = Category.objects.order_by('id').first()
+
+    with override_settings(RANGO_THROTTLE_RATES=UNTHROTTLED):
+        responses = {
+            'index (logged in)': client.get('/rango/'),
+            'category, 50 pages': client.get(
+                '/rango/category/%s/' % category.slug),
+            'about (anonymous)': Client().get('/rango/about/'),
+            'api Category list': api.get('/api/Category/'),
+            'api Page list': api.get('/api/Page/'),
+        }
+    return {label: response.content for label, response in responses.items()}
+
+
+def main():
+    setup_database()
+    user = User.objects.create_user('bench', password='bench')
+
+    for i in range(20):
+        category = Category.objects.create(name='Category %d' % i, likes=i)
+        for j in range(50 if i == 0 else 5):
+            Page.objects.create(
+                category=category, title='Page title %d-%d' % (i, j),
+                url='https://example.com/category/%d/page/%d/' % (i, j),
+                views=i * j)
+
+    bodies = fetch_bodies(user)
+
+    for label, body in bodies.items():
+        print('%s, %d bytes' % (label, len(body)))
+        print('%-12s %12s %12s %10s' % ('', 'median us', 'bytes',
+                                        'ratio'))
+        for encoding in available_encodings():
+            for level in LEVELS[encoding]:
+                size = len(compress(body, encoding, level))
+                result = measure(lambda: compress(body, encoding, level),
+                                 number=200, warmup=10)
+                print('%-12s %12.1f %12d %10.3f' % (
+                    '%s %d' % (encoding, level), result['median_us'], size,
+                    size / len(body)))
+        print()
+
+
+if __name__ == '__main__':
+    main()
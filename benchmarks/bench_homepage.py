@@ -0,0 +1,83 @@
+"""
+Measures homepage requests per second of a returning visitor with a
+session with the old visitor tracking, which wrote the session on every
+request, and with the session and signed-cookie modes of
+CookieHandlerView.
+"""
+from datetime import datetime
+from importlib import import_module
+from unittest import mock
+
+from benchmarks.harness import measure
+from benchmarks.harness import report
+from benchmarks.harness import setup_database
+
+from django.conf import settings
+from django.test import Client
+from django.test import override_settings
+
+from rango import views
+from rango.models import Category
+from rango.models import Page
+
+
+class LegacyCookieHandlerView(views.CookieHandlerView):
+    """
+    The visitor tracking as it was before epoch timestamps, kept here
+    as the baseline of the benchmark.
+    """
+    def visitor_cookie_handler(self, request, response):
+        visits = int(self.get_server_side_cookie(request, 'visits', '1'))
+        last_visit_cookie = self.get_server_side_cookie(
+            request, 'last_visit', str(datetime.now()))
+        last_visit_time = datetime.strptime(last_visit_cookie[:-7],
+                                            '%Y-%m-%d %H:%M:%S')
+
+        if (datetime.now() - last_visit_time).days > 0:
+            visits = visits + 1
+            request.session['last_visit'] = str(datetime.now())
+        else:
+            request.session['last_visit'] = last_visit_cookie
+
+        request.session['visits'] = visits
+        request.session.set_test_cookie()
+
+
+def returning_visitor():
+    # The anonymous page cache answers requests without a session
+    # cookie before IndexView runs, so the visitor brings one along.
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session.create()
+    client = Client()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+    client.get('/rango/')
+    return lambda: client.get('/rango/')
+
+
+def main():
+    setup_database()
+    for i in range(10):
+        category = Category.objects.create(name='Category %d' % i,
+                                           likes=i)
+        for j in range(5):
+            Page.objects.create(category=category, title='Page %d' % j,
+                                url='http://example.com/%d/%d' % (i, j),
+                                views=i * j)
+
+    results = {}
+
+    with override_settings(RANGO_VISITOR_TRACKING='session'):
+        with mock.patch('rango.views.CookieHandlerView',
+                        LegacyCookieHandlerView):
+            results['before: session write per hit'] = measure(
+                returning_visitor())
+        results['after: session mode'] = measure(returning_visitor())
+
+    with override_settings(RANGO_VISITOR_TRACKING='cookie'):
+        results['after: signed cookie mode'] = measure(returning_visitor())
+
+    report('GET /rango/ as a returning visitor', results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Measures what rendering each template costs when it is read and parsed
+on every render, as with the plain loaders, and when the cached loader
+holds it compiled, with contexts the size of a busy site's pages.
+"""
+from benchmarks.harness import measure
+from benchmarks.harness import report
+from benchmarks.harness import setup_database
+
+from django.conf import settings
+from django.contrib.auth.forms import AuthenticationForm
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.models import User
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+
+from rango.forms import CategoryForm
+from rango.forms import PageForm
+from rango.forms import UserProfileForm
+from rango.models import Category
+from rango.models import Page
+from rango.models import UserProfile
+
+LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def make_engine(loaders):
+    """
+    Returns:
+        DjangoTemplates: the configured template backend with other
+        loaders.
+    """
+    params = dict(settings.TEMPLATES[0])
+    del params['BACKEND']
+    params['OPTIONS'] = dict(params['OPTIONS'], loaders=loaders)
+    params.update(APP_DIRS=False, NAME='bench')
+    return DjangoTemplates(params)
+
+
+def make_categories(count):
+    return [Category(id=i, name='Category %d' % i, slug='category-%d' % i,
+                     likes=i, views=i * 10, page_count=i % 20)
+            for i in range(1, count + 1)]
+
+
+def make_pages(count, category):
+    return [Page(id=i, category=category, title='Page title %d' % i,
+                 url='https://example.com/articles/%d/' % i, views=i * 3)
+            for i in range(1, count + 1)]
+
+
+def make_profiles(count):
+    variants = {str(size): {
+        'webp': 'profile_images/ab/%064d.webp' % size,
+        'jpg': 'profile_images/ab/%064d.jpg' % size,
+    } for size in settings.RANGO_THUMBNAIL_SIZES}
+
+    return [UserProfile(id=i, user=User(id=i, username='user%d' % i),
+                        picture='profile_images/ab/%064d.jpg' % i,
+                        picture_variants=variants)
+            for i in range(1, count + 1)]
+
+
+def contexts(user):
+    """
+    Returns:
+        dict: (context, user) pairs by template name, sized like the
+        pages of a busy site.
+    """
+    categories = make_categories(100)
+    category = categories[0]
+    pages = make_pages(50, category)
+    profile = make_profiles(1)[0]
+    results = [{'title': 'Result %d' % i,
+                'link': 'https://example.com/results/%d/' % i,
+                'snippet': 'A snippet of the search result. ' * 5}
+               for i in range(10)]
+    anonymous = AnonymousUser()
+
+    return {
+        'rango/index.html': ({
+            'categories': categories[:5],
+            'pages': pages[:5],
+            'trending_categories': categories[:5],
+            'trending_pages': pages[:5],
+        }, anonymous),
+        'rango/about.html': ({}, anonymous),
+        'rango/category.html': ({
+            'category': category,
+            'pages': pages,
+            'unique_visitors': 1234,
+            'query': 'django',
+            'search_results': results,
+        }, user),
+        'rango/cats.html': ({'cats': categories}, user),
+        'rango/page_list.html': ({'pages': pages}, user),
+        'rango/list_profiles.html': ({
+            'userprofile_list': make_profiles(50),
+        }, user),
+        'rango/profile.html': ({
+            'selecteduser': user,
+            'userprofile': profile,
+            'form': UserProfileForm(),
+            'categories': categories[:10],
+            'created_pages': pages[:20],
+        }, user),
+        'rango/add_category.html': ({'form': CategoryForm()}, user),
+        'rango/add_page.html': ({
+            'category': category,
+            'form': PageForm(),
+        }, user),
+        'registration/login.html': ({'form': AuthenticationForm()},
+                                    anonymous),
+    }
+
+
+def render(engine, name, context, request):
+    # Like django.shortcuts.render(), which looks the template up on
+    # every call.
+    return lambda: engine.get_template(name).render(context, request)
+
+
+def main():
+    setup_database()
+    user = User.objects.create_user('alice')
+    UserProfile.objects.create(user=user)
+
+    plain = make_engine(LOADERS)
+    cached = make_engine([('django.template.loaders.cached.Loader',
+                           LOADERS)])
+    factory = RequestFactory()
+
+    for name, (context, request_user) in contexts(user).items():
+        request = factory.get('/rango/')
+        request.user = request_user
+
+        report(name, {
+            'before: parse per render': measure(
+                render(plain, name, context, request), number=200,
+                warmup=10),
+            'after: cached loader': measure(
+                render(cached, name, context, request), number=200,
+                warmup=10),
+        })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Measures what a profile picture upload costs the request that saves it
+when thumbnails are rendered inline and when they are handed to the
+image worker pool, and how many pictures per second each approach
+renders under concurrent uploads.
+"""
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from io import BytesIO
+
+from benchmarks.harness import measure
+from benchmarks.harness import report
+from benchmarks.harness import setup_database
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from PIL import Image
+
+from rango.models import UserProfile
+from rango.thumbnails import get_image_pool
+from rango.thumbnails import render_variants
+
+UPLOADS = 32
+
+
+def make_photo(width=3000, height=2000):
+    """
+    Returns:
+        bytes: a JPEG with enough detail to make encoding realistic.
+    """
+    image = Image.effect_mandelbrot((width, height),
+                                    (-2.0, -1.5, 1.0, 1.5), 100)
+    buffer = BytesIO()
+    image.convert('RGB').save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def upload(profile, data):
+    def save():
+        profile.picture = SimpleUploadedFile('photo.jpg', data,
+                                             'image/jpeg')
+        profile.save()
+    return save
+
+
+def throughput(executor, data):
+    args = (data, settings.RANGO_THUMBNAIL_SIZES,
+            settings.RANGO_THUMBNAIL_QUALITY)
+    start = time.perf_counter()
+    wait([executor.submit(render_variants, *args) for _ in range(UPLOADS)])
+    return UPLOADS / (time.perf_counter() - start)
+
+
+def main():
+    setup_database()
+    media_root = tempfile.mkdtemp()
+    data = make_photo()
+
+    try:
+        with override_settings(MEDIA_ROOT=media_root):
+            profile = UserProfile.objects.create(
+                user=User.objects.create_user('alice'))
+            results = {}
+
+            with override_settings(RANGO_TASKS_EAGER=True):
+                results['before: render in request'] = measure(
+                    upload(profile, data), number=20, warmup=2)
+            results['after: render in worker pool'] = measure(
+                upload(profile, data), number=20, warmup=2)
+            report('UserProfile.save() with a 3000x2000 JPEG', results)
+
+            # Let the uploads above finish before timing the pool.
+            get_image_pool().submit(int).result()
+            time.sleep(1)
+
+            with ThreadPoolExecutor(settings.RANGO_IMAGE_WORKERS) as threads:
+                inline = throughput(threads, data)
+            pool = throughput(get_image_pool(), data)
+
+            print('Thumbnails rendered per second, %d concurrent uploads'
+                  % UPLOADS)
+            print('%-32s %12.1f' % ('%d request threads'
+                                    % settings.RANGO_IMAGE_WORKERS, inline))
+            print('%-32s %12.1f' % ('%d worker processes'
+                                    % settings.RANGO_IMAGE_WORKERS, pool))
+    finally:
+        shutil.rmtree(media_root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import os
+import statistics
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE',
+                      'tango_with_django.settings')
+import django
+django.setup()
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import setup_test_environment
+
+
+def setup_database():
+    """
+    Sets up the test environment and creates an empty test database.
+    """
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def measure(func, number=500, warmup=50):
+    """
+    Times a function call.
+
+    Args:
+        func (callable): the function to time, called without
+        arguments.
+
+        number (int): the number of timed calls.
+
+        warmup (int): the number of untimed calls made first.
+
+    Returns:
+        dict: the median and 95th percentile time per call in
+        microseconds, the calls per second and the number of queries
+        of one call.
+    """
+    for _ in range(warmup):
+        func()
+
+    # Every request clears the query log, so count before moving on.
+    with CaptureQueriesContext(connection) as queries:
+        func()
+    query_count = len(queries)
+
+    timings = []
+    for _ in range(number):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1e6)
+
+    timings.sort()
+    return {
+        'median_us': statistics.median(timings),
+        'p95_us': timings[int(len(timings) * 0.95) - 1],
+        'per_second': 1e6 / statistics.mean(timings),
+        'queries': query_count,
+    }
+
+
+def report(title, results):
+    """
+    Prints the results of measure() as a table.
+
+    Args:
+        title (str): the title of the table.
+
+        results (dict): measure() results keyed by the row label.
+    """
+    print(title)
+    print('%-32s %12s %12s %12s %8s' % ('', 'median us', 'p95 us',
+                                        'req/s', 'queries'))
+    for label, result in results.items():
+        print('%-32s %12.1f %12.1f %12.1f %8d' % (
+            label, result['median_us'], result['p95_us'],
+            result['per_second'], result['queries']))
+    print()
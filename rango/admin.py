@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.db.models import F
 
 from rango.models import Category
 from rango.models import Page
@@ -11,6 +12,18 @@ class PageAdmin(admin.ModelAdmin):
 
 class CategoryAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
+    readonly_fields = ('version',)
+
+    def save_model(self, request, obj, form, change):
+        """
+        Saves a category, bumping its version on changes so API clients
+        holding the old ETag get 412 Precondition Failed.
+        """
+        if change:
+            obj.version = F('version') + 1
+        super().save_model(request, obj, form, change)
+        if change:
+            obj.refresh_from_db(fields=['version'])
 
 
 admin.site.register(UserProfile)
@@ -0,0 +1,205 @@
+import time
+from datetime import timedelta
+from datetime import timezone as datetime_timezone
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from rango.models import DailyPageViews
+from rango.models import HourlyPageViews
+from rango.models import Page
+from rango.models import PageViewEvent
+
+HOUR = 'hour'
+DAY = 'day'
+
+ROLLUPS = {HOUR: HourlyPageViews, DAY: DailyPageViews}
+STEPS = {HOUR: timedelta(hours=1), DAY: timedelta(days=1)}
+
+
+def truncate(moment, period):
+    """
+    Gets the start of the bucket a moment falls into.
+
+    Args:
+        moment (datetime): an aware datetime.
+
+        period (str): HOUR or DAY.
+
+    Returns:
+        datetime: the start of the hour or the UTC day.
+    """
+    moment = moment.astimezone(datetime_timezone.utc).replace(
+        minute=0, second=0, microsecond=0)
+
+    if period == DAY:
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def record_page_views(page_views, now=None):
+    """
+    Appends the flushed views of pages to the view event log.
+
+    Args:
+        page_views (dict): the views added per page id.
+
+        now (datetime): the time of the views, defaults to now.
+    """
+    if now is None:
+        now = timezone.now()
+
+    categories = dict(Page.objects.filter(
+        id__in=list(page_views)).values_list('id', 'category_id'))
+
+    PageViewEvent.objects.bulk_create([
+        PageViewEvent(page_id=page_id, category_id=categories[page_id],
+                      occurred_at=now, count=count)
+        for page_id, count in page_views.items() if page_id in categories])
+
+
+def add_to_rollup(model, totals):
+    """
+    Adds views to the buckets of one rollup table, creating the
+    missing buckets. Must be called inside a transaction.
+
+    Args:
+        model (PageViewRollup): HourlyPageViews or DailyPageViews.
+
+        totals (dict): maps (page id, bucket start) to a list of the
+        category id and the views to add.
+    """
+    stored = {(rollup.page_id, rollup.start): rollup for rollup in
+              model.objects.select_for_update().filter(
+                  page_id__in={page_id for page_id, _ in totals},
+                  start__in={start for _, start in totals})}
+    updated = []
+    created = []
+
+    for (page_id, start), (category_id, views) in totals.items():
+        if (page_id, start) in stored:
+            rollup = stored[(page_id, start)]
+            rollup.views += views
+            updated.append(rollup)
+        else:
+            created.append(model(page_id=page_id, category_id=category_id,
+                                 start=start, views=views))
+
+    model.objects.bulk_update(updated, ['views'])
+    model.objects.bulk_create(created)
+
+
+def compact_view_events(batch_size=1000, pause=0):
+    """
+    Folds the view events into the hourly and daily rollups and deletes
+    them, in batches of 'batch_size' events.
+
+    Each batch is its own short transaction. Only events that existed
+    when the compaction started are compacted, so a steady stream of
+    new events cannot keep it running forever.
+
+    Args:
+        batch_size (int): the number of events per batch.
+
+        pause (float): seconds to sleep between batches.
+
+    Returns:
+        int: the number of events compacted.
+    """
+    last_id = PageViewEvent.objects.order_by('-id').values_list(
+        'id', flat=True).first()
+    compacted = 0
+
+    while last_id is not None:
+        with transaction.atomic():
+            events = list(PageViewEvent.objects.filter(
+                id__lte=last_id).order_by('id')[:batch_size])
+
+            if not events:
+                break
+
+            for period, model in ROLLUPS.items():
+                totals = {}
+                for event in events:
+                    key = (event.page_id, truncate(event.occurred_at, period))
+                    totals.setdefault(key, [event.category_id, 0])
+                    totals[key][1] += event.count
+                add_to_rollup(model, totals)
+
+            PageViewEvent.objects.filter(
+                id__in=[event.id for event in events]).delete()
+
+        compacted += len(events)
+        time.sleep(pause)
+
+    return compacted
+
+
+def view_series(period, buckets, page_id=None, category_id=None, now=None):
+    """
+    Gets the views per bucket over the most recent buckets, from the
+    rollups, including buckets without views.
+
+    Args:
+        period (str): HOUR or DAY.
+
+        buckets (int): the number of buckets, ending with the current
+        one.
+
+        page_id (int): only count the views of this page.
+
+        category_id (int): only count the views of this category.
+
+        now (datetime): the end of the series, defaults to now.
+
+    Returns:
+        list: (bucket start, views) tuples, oldest first.
+    """
+    if now is None:
+        now = timezone.now()
+
+    step = STEPS[period]
+    first = truncate(now, period) - (buckets - 1) * step
+    rollups = ROLLUPS[period].objects.filter(start__gte=first)
+
+    if page_id is not None:
+        rollups = rollups.filter(page_id=page_id)
+    if category_id is not None:
+        rollups = rollups.filter(category_id=category_id)
+
+    views = dict(rollups.values('start').annotate(
+        total=Sum('views')).values_list('start', 'total'))
+    return [(first + i * step, views.get(first + i * step, 0))
+            for i in range(buckets)]
+
+
+def top_pages(hours=24, limit=10, category_id=None, now=None):
+    """
+    Gets the most viewed pages of the last hours, from the hourly
+    rollups.
+
+    Args:
+        hours (int): the number of hours, including the current one.
+
+        limit (int): the maximum number of pages.
+
+        category_id (int): only rank the pages of this category.
+
+        now (datetime): the end of the period, defaults to now.
+
+    Returns:
+        list: (page id, views) tuples, most viewed first.
+    """
+    if now is None:
+        now = timezone.now()
+
+    first = truncate(now, HOUR) - timedelta(hours=hours - 1)
+    rollups = HourlyPageViews.objects.filter(start__gte=first)
+
+    if category_id is not None:
+        rollups = rollups.filter(category_id=category_id)
+
+    return list(rollups.values('page_id').annotate(
+        total=Sum('views')).order_by('-total', 'page_id').values_list(
+        'page_id', 'total')[:limit])
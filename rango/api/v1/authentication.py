@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.authentication import get_authorization_header
+
+API_KEY_SALT = 'rango.api.v1.key'
+
+
+def make_api_key(user):
+    """
+    Creates a signed API key for a user.
+
+    The key is the user's primary key signed with SECRET_KEY, so it
+    needs no token table and no session. Changing SECRET_KEY revokes
+    every key at once.
+
+    Args:
+        user (User): the owner of the key.
+
+    Returns:
+        str: the API key, sent as 'Authorization: Key <key>'.
+    """
+    return signing.dumps({'user': user.pk}, salt=API_KEY_SALT)
+
+
+class SignedKeyAuthentication(BaseAuthentication):
+    """
+    Stateless authentication with keys created by make_api_key.
+
+    Keys older than settings.RANGO_API_KEY_MAX_AGE seconds are rejected.
+
+    Attributes:
+        keyword (str): the authorization scheme of the header.
+    """
+    keyword = 'Key'
+
+    def authenticate(self, request):
+        """
+        Authenticates the request from its Authorization header.
+
+        Args:
+            request (Request): the request object.
+
+        Returns:
+            tuple: the user and None, or None if the request does not
+            carry a key.
+
+        Raises:
+            AuthenticationFailed: if the key is malformed, expired or
+            belongs to an unknown or inactive user.
+        """
+        auth = get_authorization_header(request).split()
+
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid key header.')
+
+        try:
+            payload = signing.loads(auth[1].decode(), salt=API_KEY_SALT,
+                                    max_age=settings.RANGO_API_KEY_MAX_AGE)
+            user = User.objects.get(pk=payload['user'], is_active=True)
+        except (signing.BadSignature, UnicodeError, KeyError, TypeError,
+                User.DoesNotExist):
+            raise exceptions.AuthenticationFailed('Invalid key.')
+
+        return user, None
+
+    def authenticate_header(self, request):
+        """
+        Returns:
+            str: the WWW-Authenticate header of 401 responses.
+        """
+        return self.keyword
@@ -0,0 +1,52 @@
+from rest_framework.pagination import CursorPagination
+
+
+class PageCursorPagination(CursorPagination):
+    """
+    Cursor pagination for the Page endpoints.
+
+    Only orderings that are backed by one of the Page indexes are
+    accepted. The cursor holds the value of the first ordering field,
+    so the default ordering is by id, newest first: ids are unique and
+    never change, and every page of results is an index range scan.
+
+    Attributes:
+        ordering (tuple): the default ordering, newest first.
+
+        ordering_fields (dict): the accepted values of the 'ordering'
+        query parameter mapped to the ordering they apply. The views
+        orderings are not unique, so the cursor skips pages with equal
+        views with an OFFSET, and a page whose views change while a
+        client pages through may be skipped or returned twice.
+
+        page_size_query_param (str): query parameter for overriding
+        the page size.
+    """
+    ordering = ('-id',)
+    ordering_fields = {
+        'views': ('views', 'id'),
+        '-views': ('-views', '-id'),
+        'id': ('id',),
+        '-id': ('-id',),
+    }
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Gets the ordering from the 'ordering' query parameter, falling
+        back to the default ordering for unknown values.
+
+        Args:
+            request (Request): the request object.
+
+            queryset (QuerySet): the queryset being paginated.
+
+            view (APIView): the view using the paginator.
+
+        Returns:
+            tuple: the ordering applied to the queryset.
+        """
+        ordering = request.query_params.get('ordering')
+        return self.ordering_fields.get(ordering, self.ordering)
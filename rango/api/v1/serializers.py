@@ -1,12 +1,49 @@
 from rest_framework import serializers
 from rango.models import Category
+from rango.models import CategoryDeletion
+from rango.models import Page
 
 class CategoryGetSerializer(serializers.ModelSerializer):
+    unique_visitors = serializers.SerializerMethodField()
+
     class Meta:
         model = Category
         fields = '__all__'
 
+    def get_unique_visitors(self, obj):
+        return self.context.get('unique_visitors', {}).get(obj.id, 0)
+
 class CategoryPostPutSerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        exclude = ['slug', 'views', 'likes']
+        exclude = ['slug', 'views', 'likes', 'version', 'trending_score',
+                   'page_count', 'total_page_views', 'is_deleted']
+
+class CategoryDeletionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CategoryDeletion
+        fields = '__all__'
+
+class PageGetSerializer(serializers.ModelSerializer):
+    category_slug = serializers.SlugField(source='category.slug',
+                                          read_only=True)
+    added_by = serializers.CharField(source='added_by.username',
+                                     read_only=True, default=None)
+    unique_visitors = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Page
+        fields = ['id', 'category', 'category_slug', 'title', 'url', 'views',
+                  'added_by', 'unique_visitors']
+
+    def get_unique_visitors(self, obj):
+        return self.context.get('unique_visitors', {}).get(obj.id, 0)
+
+class TopPageSerializer(PageGetSerializer):
+    recent_views = serializers.SerializerMethodField()
+
+    class Meta(PageGetSerializer.Meta):
+        fields = PageGetSerializer.Meta.fields + ['recent_views']
+
+    def get_recent_views(self, obj):
+        return self.context['recent_views'][obj.id]
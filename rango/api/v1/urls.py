@@ -3,5 +3,15 @@ from rango.api.v1 import views
 
 urlpatterns = [
     path('Category/', views.CategoryList.as_view()),
-    path('Category/details/<int:pk>', views.CategoryDetail.as_view())
+    path('Category/details/<int:pk>', views.CategoryDetail.as_view()),
+    path('Category/details/<int:pk>/Page/', views.CategoryPageList.as_view()),
+    path('Category/details/<int:pk>/views/',
+         views.CategoryViewSeries.as_view()),
+    path('Category/deletions/<int:pk>',
+         views.CategoryDeletionDetail.as_view(), name='category_deletion'),
+    path('Page/', views.PageList.as_view()),
+    path('Page/details/<int:pk>', views.PageDetail.as_view()),
+    path('Page/details/<int:pk>/views/', views.PageViewSeries.as_view()),
+    path('Page/top/', views.TopPages.as_view()),
+    path('metrics/', views.Metrics.as_view())
 ]
\ No newline at end of file
@@ -1,9 +1,30 @@
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from django.db import transaction
+from django.db.models import F
+from django.http import Http404
+from django.conf import settings
+from django.urls import reverse
+from django.template.defaultfilters import slugify
+from rango.bots import bot_classifier
 from rango.models import Category
+from rango.models import CategoryDeletion
+from rango.models import Page
+from rango.models import UniqueVisitorCounter
+from rango.api.v1.pagination import PageCursorPagination
+from rango.api.v1.serializers import CategoryDeletionSerializer
 from rango.api.v1.serializers import CategoryGetSerializer
 from rango.api.v1.serializers import CategoryPostPutSerializer
+from rango.api.v1.serializers import PageGetSerializer
+from rango.api.v1.serializers import TopPageSerializer
+from rango import analytics
+from rango.page_cache import category_tag
+from rango.page_cache import expire_tags
+from rango.signals import deleting_category
+from rango.tasks import schedule_category_deletion
+from rango.visitors import unique_visitors
 
 class CategoryList(APIView):
     def get(self, request, format=None):
@@ -12,8 +33,12 @@ class CategoryList(APIView):
         except:
             return Response({"error": "No Category Objects"}, status=
                             status.HTTP_404_NOT_FOUND)
-        serializer = CategoryGetSerializer(category_objects, many=True)
-        print(serializer)
+        counts = unique_visitors.counts(
+            UniqueVisitorCounter.CATEGORY,
+            [category.id for category in category_objects])
+        serializer = CategoryGetSerializer(
+            category_objects, many=True,
+            context={'unique_visitors': counts})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def post(self, request, format=None):
@@ -27,29 +52,270 @@ class CategoryList(APIView):
                             status.HTTP_400_BAD_REQUEST)
 
 class CategoryDetail(APIView):
+    """
+    Category detail endpoint with optimistic concurrency control.
+
+    Responses carry the category version as ETag. PUT and PATCH accept
+    an If-Match header and answer 412 when it does not match the
+    current version. Both only write the fields that actually changed.
+    """
     def get_object(self, pk):
         try:
             return Category.objects.get(id=pk)
         except Category.DoesNotExist:
-            return Response(status=status.HTTP_404_NOT_FOUND)
-        
+            raise Http404
+
+    def get_etag(self, category):
+        return '"%d"' % category.version
+
+    def matches_if_match(self, request, category):
+        header = request.headers.get('If-Match')
+
+        if header is None:
+            return True
+
+        etags = [etag.strip().replace('W/', '', 1)
+                 for etag in header.split(',')]
+        return '*' in etags or self.get_etag(category) in etags
+
+    def update(self, request, pk, partial):
+        category = self.get_object(pk)
+
+        if not self.matches_if_match(request, category):
+            return Response({"error": "Category was modified"},
+                            status=status.HTTP_412_PRECONDITION_FAILED,
+                            headers={'ETag': self.get_etag(category)})
+
+        serializer = CategoryPostPutSerializer(
+            category, data=request.data, partial=partial)
+
+        if not serializer.is_valid():
+            return Response(serializer.errors,
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        changed = {field: value for field, value
+                   in serializer.validated_data.items()
+                   if getattr(category, field) != value}
+
+        if changed:
+            if 'name' in changed:
+                changed['slug'] = slugify(changed['name'])
+
+            # select_for_update() does not lock on SQLite, so the
+            # version read above is compared in the UPDATE itself.
+            updated = Category.objects.filter(
+                id=category.id, version=category.version).update(
+                version=F('version') + 1, **changed)
+
+            if not updated:
+                category = self.get_object(pk)
+                return Response({"error": "Category was modified"},
+                                status=status.HTTP_412_PRECONDITION_FAILED,
+                                headers={'ETag': self.get_etag(category)})
+
+            for field, value in changed.items():
+                setattr(category, field, value)
+            category.version = category.version + 1
+
+            # update() sends no post_save, so the cached pages are
+            # expired here.
+            tags = ['index', category_tag(category.id)]
+            transaction.on_commit(lambda: expire_tags(tags))
+
+        return Response(serializer.data, status=status.HTTP_200_OK,
+                        headers={'ETag': self.get_etag(category)})
+
     def get(self, request, pk, format=None):
         category = self.get_object(pk)
-        serializer = CategoryGetSerializer(category)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    
+        counts = unique_visitors.counts(UniqueVisitorCounter.CATEGORY,
+                                        [category.id])
+        serializer = CategoryGetSerializer(
+            category, context={'unique_visitors': counts})
+        return Response(serializer.data, status=status.HTTP_200_OK,
+                        headers={'ETag': self.get_etag(category)})
+
     def put(self, request, pk, format=None):
+        return self.update(request, pk, partial=False)
+
+    def patch(self, request, pk, format=None):
+        return self.update(request, pk, partial=True)
+
+    def delete(self, request, pk, format=None):
         category = self.get_object(pk)
-        serializer = CategoryPostPutSerializer(category, data=request.data)
 
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
+        if settings.RANGO_CATEGORY_DELETION != 'background':
+            with deleting_category(category.id):
+                category.delete()
+            return Response(status=status.HTTP_200_OK)
+
+        deletion = schedule_category_deletion(category)
+        status_url = request.build_absolute_uri(
+            reverse('category_deletion', args=[deletion.id]))
+        return Response({"status_url": status_url},
+                        status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': status_url})
+
+class CategoryDeletionDetail(APIView):
+    def get(self, request, pk, format=None):
+        try:
+            deletion = CategoryDeletion.objects.get(id=pk)
+        except CategoryDeletion.DoesNotExist:
+            raise Http404
+        serializer = CategoryDeletionSerializer(deletion)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+class PageList(APIView):
+    """
+    Cursor-paginated list of pages.
+
+    Supports the 'category' (id), 'added_by' (username), 'min_views'
+    and 'max_views' filters and the orderings accepted by
+    PageCursorPagination.
+    """
+    def get_queryset(self, request, category=None):
+        pages = Page.objects.select_related('category', 'added_by').filter(
+            category__is_deleted=False)
+
+        if category is not None:
+            pages = pages.filter(category=category)
+        elif request.query_params.get('category'):
+            pages = pages.filter(
+                category_id=request.query_params['category'])
+
+        if request.query_params.get('added_by'):
+            pages = pages.filter(
+                added_by__username=request.query_params['added_by'])
+
+        if request.query_params.get('min_views'):
+            pages = pages.filter(
+                views__gte=int(request.query_params['min_views']))
+
+        if request.query_params.get('max_views'):
+            pages = pages.filter(
+                views__lte=int(request.query_params['max_views']))
+
+        return pages
+
+    def get(self, request, format=None, category=None):
+        try:
+            pages = self.get_queryset(request, category)
+        except ValueError:
+            return Response({"error": "Filters must be integers"}, status=
+                            status.HTTP_400_BAD_REQUEST)
+        paginator = PageCursorPagination()
+        result_page = paginator.paginate_queryset(pages, request, view=self)
+        counts = unique_visitors.counts(UniqueVisitorCounter.PAGE,
+                                        [page.id for page in result_page])
+        serializer = PageGetSerializer(result_page, many=True,
+                                       context={'unique_visitors': counts})
+        return paginator.get_paginated_response(serializer.data)
+
+class CategoryPageList(PageList):
+    def get(self, request, pk, format=None):
+        try:
+            category = Category.objects.get(id=pk)
+        except Category.DoesNotExist:
+            raise Http404
+        return super().get(request, format, category=category)
+
+class PageDetail(APIView):
+    def get_object(self, pk):
+        try:
+            return Page.objects.select_related('category', 'added_by').get(
+                id=pk, category__is_deleted=False)
+        except Page.DoesNotExist:
+            raise Http404
+
+    def get(self, request, pk, format=None):
+        page = self.get_object(pk)
+        counts = unique_visitors.counts(UniqueVisitorCounter.PAGE, [page.id])
+        serializer = PageGetSerializer(
+            page, context={'unique_visitors': counts})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class ViewSeries(APIView):
+    """
+    Views per hour or per day of a page or a category, served from the
+    analytics rollups.
+
+    Accepts 'period' ('hour' or 'day') and 'buckets', the number of
+    hours or days ending with the current one.
+    """
+    model = None
+    default_buckets = {analytics.HOUR: 24, analytics.DAY: 30}
+
+    def get(self, request, pk, format=None):
+        if not self.model.objects.filter(id=pk).exists():
+            raise Http404
+
+        period = request.query_params.get('period', analytics.HOUR)
+        if period not in analytics.ROLLUPS:
+            return Response({"error": "period must be 'hour' or 'day'"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            buckets = int(request.query_params.get(
+                'buckets', self.default_buckets[period]))
+        except ValueError:
+            return Response({"error": "buckets must be an integer"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if period == analytics.HOUR:
+            max_buckets = settings.RANGO_ANALYTICS_HOURLY_RETENTION_DAYS * 24
         else:
-            return Response(serializer.errors, 
+            max_buckets = 366
+        buckets = max(1, min(buckets, max_buckets))
+
+        if self.model is Page:
+            series = analytics.view_series(period, buckets, page_id=pk)
+        else:
+            series = analytics.view_series(period, buckets, category_id=pk)
+        return Response({"period": period,
+                         "series": [{"start": start, "views": views}
+                                    for start, views in series]},
+                        status=status.HTTP_200_OK)
+
+class PageViewSeries(ViewSeries):
+    model = Page
+
+class CategoryViewSeries(ViewSeries):
+    model = Category
+
+class TopPages(APIView):
+    """
+    The most viewed pages of the last 'hours' hours (24 by default),
+    optionally within one 'category', served from the hourly rollups.
+    """
+    def get(self, request, format=None):
+        try:
+            hours = int(request.query_params.get('hours', 24))
+            limit = int(request.query_params.get('limit', 10))
+            category_id = request.query_params.get('category')
+            if category_id is not None:
+                category_id = int(category_id)
+        except ValueError:
+            return Response({"error": "Parameters must be integers"},
                             status=status.HTTP_400_BAD_REQUEST)
-    
-    def delete(self, request, pk, format=None):
-        category = self.get_object(pk)
-        category.delete()
-        return Response(status=status.HTTP_200_OK)
\ No newline at end of file
+        hours = max(1, min(
+            hours, settings.RANGO_ANALYTICS_HOURLY_RETENTION_DAYS * 24))
+        limit = max(1, min(limit, 100))
+
+        recent_views = dict(analytics.top_pages(hours, limit, category_id))
+        pages = Page.objects.select_related('category', 'added_by').filter(
+            category__is_deleted=False).in_bulk(list(recent_views))
+        ranked = [pages[page_id] for page_id in recent_views
+                  if page_id in pages]
+        serializer = TopPageSerializer(
+            ranked, many=True, context={'recent_views': recent_views})
+        return Response({"hours": hours, "results": serializer.data},
+                        status=status.HTTP_200_OK)
+
+
+class Metrics(APIView):
+    """
+    Operational metrics of the worker process answering the request.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, format=None):
+        return Response({"bot_filter": bot_classifier.stats()},
+                        status=status.HTTP_200_OK)
@@ -1,5 +1,18 @@
 from django.apps import AppConfig
+from django.conf import settings
+from PIL import Image
 
 
 class RangoConfig(AppConfig):
     name = 'rango'
+
+    def ready(self):
+        """
+        Connects the signal receivers and system checks of the app and
+        lowers Pillow's decompression bomb limit to the largest image we
+        accept.
+        """
+        import rango.checks  # noqa: F401
+        import rango.signals  # noqa: F401
+
+        Image.MAX_IMAGE_PIXELS = settings.RANGO_MAX_IMAGE_PIXELS
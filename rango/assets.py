@@ -0,0 +1,227 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.exceptions import ImproperlyConfigured
+
+from rango.compression import brotli
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+# Bundles are served from this directory below STATIC_URL, which is
+# where settings.RANGO_ASSET_BUILD_DIR lies in the rango static files.
+BUILD_PREFIX = 'build'
+
+MANIFEST = 'manifest.json'
+
+# Source map references of vendored files point to maps which are not
+# shipped, and would only cause 404s in the browser.
+SOURCE_MAP = re.compile(r'^\s*(?://|/\*)# sourceMappingURL=.*$', re.M)
+
+# Comments which are not kept, i.e. all but the /*! ... */ license
+# banners.
+CSS_COMMENT = re.compile(r'/\*(?!!).*?\*/', re.S)
+CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+JS_LINE_COMMENT = re.compile(r'^\s*//.*$', re.M)
+
+_manifest = None
+_manifest_key = None
+
+
+def minify_css(source):
+    """
+    Minifies a stylesheet with rcssmin when it is installed, otherwise
+    by dropping comments and the whitespace around punctuation.
+    """
+    if rcssmin is not None:
+        return rcssmin.cssmin(source, keep_bang_comments=True)
+
+    source = CSS_COMMENT.sub('', source)
+    source = CSS_PUNCTUATION.sub(r'\1', source)
+    return re.sub(r'\s+', ' ', source).strip()
+
+
+def minify_js(source):
+    """
+    Minifies a script with rjsmin when it is installed. The fallback
+    only drops indentation, blank lines and whole-line comments, since
+    anything more needs a real tokenizer to leave strings and regular
+    expressions alone.
+    """
+    if rjsmin is not None:
+        return rjsmin.jsmin(source, keep_bang_comments=True)
+
+    source = JS_LINE_COMMENT.sub('', source)
+    return '\n'.join(line.strip() for line in source.splitlines()
+                     if line.strip())
+
+
+def read_source(path):
+    """
+    Reads one source file of a bundle, minifying it unless it is
+    already minified.
+
+    Args:
+        path (str): the path of the file relative to the static files,
+        e.g. 'js/rango-ajax.js'.
+
+    Returns:
+        str: the file content.
+    """
+    found = finders.find(path)
+    if found is None:
+        raise ImproperlyConfigured(
+            'Static file %r of RANGO_ASSET_BUNDLES not found.' % path)
+
+    with open(found, encoding='utf-8') as f:
+        source = SOURCE_MAP.sub('', f.read())
+
+    if '.min.' in os.path.basename(path):
+        return source.strip()
+    if path.endswith('.css'):
+        return minify_css(source)
+    return minify_js(source)
+
+
+def build_bundle(name, sources):
+    """
+    Concatenates the source files of a bundle.
+
+    Args:
+        name (str): the bundle name, whose extension is '.css' or '.js'.
+
+        sources (list): the paths of the files relative to the static
+        files.
+
+    Returns:
+        bytes: the bundle.
+    """
+    # A script missing its final semicolon must not run into the next.
+    separator = '\n' if name.endswith('.css') else ';\n'
+    return (separator.join(read_source(path) for path in sources)
+            + '\n').encode('utf-8')
+
+
+def compress(data):
+    """
+    Compresses a bundle for web servers serving precompressed files,
+    such as nginx with gzip_static and brotli_static.
+
+    Returns:
+        dict: the compressed bytes by file extension, 'gz' and, when a
+        brotli module is installed, 'br'. Encodings which do not make
+        the file smaller are left out.
+    """
+    compressed = {'gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressed['br'] = brotli.compress(data, quality=11)
+
+    return {extension: content for extension, content in compressed.items()
+            if len(content) < len(data)}
+
+
+def write_file(path, data):
+    """
+    Writes a file atomically, so a running server never reads half of
+    it.
+    """
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+def build_assets():
+    """
+    Builds every bundle of settings.RANGO_ASSET_BUNDLES into
+    settings.RANGO_ASSET_BUILD_DIR.
+
+    Each bundle is written as <name>.<hash>.<extension>, named after
+    the first 12 hex digits of its SHA-256, together with its .gz and
+    .br siblings. The manifest maps the bundle names to these file
+    names. Files of earlier builds are removed afterwards.
+
+    Returns:
+        dict: the manifest.
+    """
+    build_dir = settings.RANGO_ASSET_BUILD_DIR
+    os.makedirs(build_dir, exist_ok=True)
+    manifest = {}
+
+    for name, sources in settings.RANGO_ASSET_BUNDLES.items():
+        data = build_bundle(name, sources)
+        stem, extension = os.path.splitext(name)
+        filename = '%s.%s%s' % (stem, hashlib.sha256(data).hexdigest()[:12],
+                                extension)
+
+        write_file(os.path.join(build_dir, filename), data)
+        for suffix, content in compress(data).items():
+            write_file(os.path.join(build_dir, filename + '.' + suffix),
+                       content)
+        manifest[name] = filename
+
+    write_file(os.path.join(build_dir, MANIFEST),
+               json.dumps(manifest, indent=4, sort_keys=True).encode())
+
+    current = {MANIFEST}
+    for filename in manifest.values():
+        current.update((filename, filename + '.gz', filename + '.br'))
+
+    for filename in os.listdir(build_dir):
+        if filename not in current:
+            os.remove(os.path.join(build_dir, filename))
+    return manifest
+
+
+def get_manifest():
+    """
+    Gets the manifest of the last build, re-reading it whenever
+    build_assets rewrote it.
+
+    Returns:
+        dict: the file names by bundle name, or None when the assets
+        were not built.
+    """
+    global _manifest, _manifest_key
+
+    path = os.path.join(settings.RANGO_ASSET_BUILD_DIR, MANIFEST)
+    try:
+        key = (path, os.stat(path).st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+    if key != _manifest_key:
+        with open(path, encoding='utf-8') as f:
+            _manifest = json.load(f)
+        _manifest_key = key
+    return _manifest
+
+
+def asset_paths(name):
+    """
+    Gets the static paths a page has to load for a bundle.
+
+    Args:
+        name (str): the bundle name, e.g. 'rango.css'.
+
+    Returns:
+        list: the built bundle, or its separate source files when the
+        assets were not built, as in development.
+    """
+    manifest = get_manifest()
+
+    if manifest is not None and name in manifest:
+        return ['%s/%s' % (BUILD_PREFIX, manifest[name])]
+    return list(settings.RANGO_ASSET_BUNDLES[name])
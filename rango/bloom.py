@@ -0,0 +1,149 @@
+import hashlib
+import math
+import threading
+import time
+
+
+class BloomFilter:
+    """
+    Bloom filter over strings.
+
+    It answers "possibly seen" or "definitely not seen" in a fixed
+    amount of memory. False positives happen at about 'error_rate'
+    once 'capacity' keys have been added; false negatives never do.
+
+    Attributes:
+        size (int): the number of bits.
+
+        hash_count (int): the number of bits set per key.
+
+        bits (bytearray): the bit array.
+    """
+
+    def __init__(self, capacity, error_rate):
+        """
+        Initializes the BloomFilter instance.
+
+        Args:
+            capacity (int): the expected number of keys.
+
+            error_rate (float): the false positive rate at capacity.
+        """
+        self.size = math.ceil(-capacity * math.log(error_rate)
+                              / math.log(2) ** 2)
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(math.ceil(self.size / 8))
+
+    def positions(self, key):
+        """
+        Gets the bit positions of a key, by double hashing one digest.
+
+        Args:
+            key (str): the key.
+
+        Returns:
+            list: 'hash_count' bit positions.
+        """
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:], 'big') | 1
+        return [(first + i * second) % self.size
+                for i in range(self.hash_count)]
+
+    def add(self, key):
+        """
+        Adds a key.
+
+        Args:
+            key (str): the key.
+        """
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        """
+        Checks whether a key was possibly added.
+
+        Args:
+            key (str): the key.
+
+        Returns:
+            bool: False if the key was definitely never added.
+        """
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self.positions(key))
+
+
+class RotatingBloomFilter:
+    """
+    Time-windowed Bloom filter made of two generations.
+
+    Keys go into the current generation. Every 'window' seconds the
+    current generation becomes the previous one and the oldest one is
+    dropped. A key is remembered for at least 'window' and at most
+    twice 'window' seconds, and memory stays fixed at two filters.
+
+    Attributes:
+        capacity (int): the expected number of keys per window.
+
+        error_rate (float): the false positive rate per generation.
+
+        window (float): the rotation interval in seconds.
+    """
+
+    def __init__(self, capacity, error_rate, window):
+        """
+        Initializes the RotatingBloomFilter instance.
+
+        Args:
+            capacity (int): the expected number of keys per window.
+
+            error_rate (float): the false positive rate per generation.
+
+            window (float): the rotation interval in seconds.
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.window = window
+        self.current = BloomFilter(capacity, error_rate)
+        self.previous = BloomFilter(capacity, error_rate)
+        self.rotated_at = time.time()
+        self.lock = threading.Lock()
+
+    def rotate(self, now):
+        """
+        Starts new generations when their window has passed.
+
+        Args:
+            now (float): the current time.
+        """
+        if now - self.rotated_at >= 2 * self.window:
+            self.previous = BloomFilter(self.capacity, self.error_rate)
+            self.current = BloomFilter(self.capacity, self.error_rate)
+            self.rotated_at = now
+        elif now - self.rotated_at >= self.window:
+            self.previous = self.current
+            self.current = BloomFilter(self.capacity, self.error_rate)
+            self.rotated_at = now
+
+    def check_and_add(self, key, now=None):
+        """
+        Checks whether a key was seen within the window and adds it.
+
+        Args:
+            key (str): the key.
+
+            now (float): the current time, defaults to time.time().
+
+        Returns:
+            bool: True if the key was (possibly) seen before.
+        """
+        if now is None:
+            now = time.time()
+
+        with self.lock:
+            self.rotate(now)
+            seen = key in self.current or key in self.previous
+            if not seen:
+                self.current.add(key)
+        return seen
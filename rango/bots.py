@@ -0,0 +1,116 @@
+import re
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.functional import SimpleLazyObject
+from django.utils.functional import empty
+
+from rango.lru import LRUCache
+
+
+class UserAgentClassifier:
+    """
+    Classifies requests as bots or humans by their user agent.
+
+    All patterns are compiled into a single case-insensitive regular
+    expression, and the verdicts of recently seen user agents are kept
+    in an LRU cache, so most requests cost a dictionary lookup.
+
+    Attributes:
+        pattern (Pattern): the compiled bot patterns.
+
+        verdicts (LRUCache): recent verdicts by user agent.
+
+        requests (int): the number of classified requests.
+
+        filtered (int): the number of requests classified as bots.
+    """
+
+    def __init__(self, patterns, cache_size=1024):
+        """
+        Initializes the UserAgentClassifier instance.
+
+        Args:
+            patterns (list): regular expressions matching bot user
+            agents.
+
+            cache_size (int): the number of verdicts to remember.
+        """
+        self.pattern = re.compile(
+            '|'.join('(?:%s)' % pattern for pattern in patterns),
+            re.IGNORECASE)
+        self.verdicts = LRUCache(cache_size)
+        self.requests = 0
+        self.filtered = 0
+        self.lock = threading.Lock()
+
+    def is_bot_user_agent(self, user_agent):
+        """
+        Classifies a user agent string.
+
+        Args:
+            user_agent (str): the user agent.
+
+        Returns:
+            bool: True if the user agent matches a bot pattern.
+        """
+        verdict = self.verdicts.get(user_agent)
+
+        if verdict is None:
+            verdict = bool(self.pattern.search(user_agent))
+            self.verdicts.set(user_agent, verdict)
+        return verdict
+
+    def is_bot(self, request):
+        """
+        Classifies a request, counting it once for the statistics.
+
+        Args:
+            request (HttpRequest): the request object.
+
+        Returns:
+            bool: True if the request comes from a bot.
+        """
+        if not hasattr(request, 'is_bot'):
+            request.is_bot = self.is_bot_user_agent(
+                request.META.get('HTTP_USER_AGENT', ''))
+
+            with self.lock:
+                self.requests += 1
+                self.filtered += request.is_bot
+        return request.is_bot
+
+    def stats(self):
+        """
+        Returns:
+            dict: the number of classified and filtered requests, the
+            share of filtered requests and the verdict cache hit rate
+            of this process.
+        """
+        lookups = self.verdicts.hits + self.verdicts.misses
+        return {
+            'requests': self.requests,
+            'filtered': self.filtered,
+            'filtered_ratio': (self.filtered / self.requests
+                               if self.requests else 0.0),
+            'verdict_cache_hit_ratio': (self.verdicts.hits / lookups
+                                        if lookups else 0.0),
+        }
+
+
+# Created on first use, and again after its settings change.
+bot_classifier = SimpleLazyObject(lambda: UserAgentClassifier(
+    settings.RANGO_BOT_USER_AGENT_PATTERNS,
+    settings.RANGO_BOT_VERDICT_CACHE_SIZE))
+
+
+@receiver(setting_changed)
+def reset_bot_classifier(setting, **kwargs):
+    """
+    Drops bot_classifier when one of its settings changes, e.g. in
+    override_settings(), so it is created again with the new values.
+    """
+    if setting.startswith('RANGO_BOT_'):
+        bot_classifier._wrapped = empty
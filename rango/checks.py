@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core import checks
+
+# Cache backends whose entries live in the memory of a single process,
+# or nowhere at all, so processes cannot see each other's writes.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_process_local(alias):
+    """
+    Checks if a cache is not shared between processes.
+
+    Args:
+        alias (str): the key of the cache in settings.CACHES.
+    """
+    return settings.CACHES[alias]['BACKEND'] in PROCESS_LOCAL_CACHES
+
+
+@checks.register(checks.Tags.caches)
+def check_session_cache(app_configs, **kwargs):
+    """
+    Refuses the cached_db session engine on a process-local cache, with
+    which a process keeps reading a session another process changed,
+    e.g. one that logged out.
+    """
+    if (settings.SESSION_ENGINE != 'django.contrib.sessions.backends.cached_db'
+            or not is_process_local(settings.SESSION_CACHE_ALIAS)):
+        return []
+
+    return [checks.Error(
+        'The cached_db session engine needs a cache shared by all '
+        'processes, but CACHES[%r] uses %s.' % (
+            settings.SESSION_CACHE_ALIAS,
+            settings.CACHES[settings.SESSION_CACHE_ALIAS]['BACKEND']),
+        hint="Set RANGO_SESSION_CACHE_URL to a redis server, or use "
+             "RANGO_SESSION_PROFILE='db'.",
+        id='rango.E001',
+    )]
+
+
+@checks.register(checks.Tags.caches)
+def check_throttle_cache(app_configs, **kwargs):
+    """
+    Warns when the token buckets of the throttles live in a
+    process-local cache outside of DEBUG, where every worker process
+    would allow the full rate.
+    """
+    if settings.DEBUG or not is_process_local(settings.RANGO_THROTTLE_CACHE):
+        return []
+
+    return [checks.Warning(
+        'Throttles keep their token buckets in CACHES[%r], which is not '
+        'shared between processes, so each worker allows the full rate.'
+        % settings.RANGO_THROTTLE_CACHE,
+        hint='Point RANGO_THROTTLE_CACHE at a memcached or redis cache.',
+        id='rango.W001',
+    )]
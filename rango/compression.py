@@ -0,0 +1,179 @@
+import re
+import secrets
+import struct
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+# Content types worth compressing. Images, video, audio, fonts and
+# archives are compressed already, and compressing them again only
+# costs CPU.
+COMPRESSIBLE_TYPES = re.compile(
+    r'^(text/|application/(json|javascript|xml|x-javascript)|'
+    r'application/[\w.-]+\+(json|xml)|image/svg\+xml)')
+
+ACCEPT_ENCODING = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?')
+
+# Magic number, deflate method, flags, zero mtime, no extra flags and an
+# unknown operating system.
+GZIP_HEADER = b'\x1f\x8b\x08%c\x00\x00\x00\x00\x00\xff'
+GZIP_FNAME = 0x08
+
+
+def available_encodings():
+    """
+    Returns:
+        list: the supported content encodings, preferred first.
+    """
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def negotiate(accept_encoding, encodings=None):
+    """
+    Picks the content encoding for a response.
+
+    Args:
+        accept_encoding (str): the Accept-Encoding header of the
+        request, e.g. 'gzip, deflate, br;q=0.9'.
+
+        encodings (list): the encodings to pick from, by default
+        available_encodings().
+
+    Returns:
+        str: 'br' or 'gzip', the one with the higher quality value, and
+        brotli on a tie since it is smaller; None when the client
+        accepts neither.
+    """
+    qualities = {}
+
+    for item in accept_encoding.split(','):
+        match = ACCEPT_ENCODING.match(item)
+        if match is None:
+            continue
+        try:
+            quality = float(match.group(2) or 1)
+        except ValueError:
+            continue
+        qualities[match.group(1).lower()] = quality
+
+    best, best_quality = None, 0
+    for encoding in encodings or available_encodings():
+        quality = qualities.get(encoding, qualities.get('*', 0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def gzip_header(max_random_bytes=0):
+    """
+    Builds the header of a gzip stream.
+
+    Args:
+        max_random_bytes (int): when set, the header holds a file name
+        of a random length below this, as in Django's GZipMiddleware.
+        The compressed size then varies from response to response,
+        which mitigates BREACH attacks guessing secrets in the body by
+        its size.
+
+    Returns:
+        bytes: the header.
+    """
+    if not max_random_bytes:
+        return GZIP_HEADER % 0
+    return (GZIP_HEADER % GZIP_FNAME
+            + b'a' * secrets.randbelow(max_random_bytes) + b'\x00')
+
+
+def gzip_trailer(crc, size):
+    return struct.pack('<II', crc, size & 0xffffffff)
+
+
+def compressor(encoding, level, max_random_bytes=0):
+    """
+    Creates an incremental compressor.
+
+    Args:
+        encoding (str): 'br' or 'gzip'.
+
+        level (int): the brotli quality or gzip level.
+
+        max_random_bytes (int): see gzip_header(), ignored by brotli.
+
+    Returns:
+        tuple: functions compressing a chunk so that the client can
+        decode everything sent so far, and finishing the stream.
+    """
+    if encoding == 'br':
+        compress = brotli.Compressor(quality=level)
+        return (lambda chunk: compress.process(chunk) + compress.flush(),
+                compress.finish)
+
+    # Raw deflate, since the header and trailer are written here.
+    compress = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    header = gzip_header(max_random_bytes)
+    crc = size = 0
+
+    def process(chunk):
+        nonlocal header, crc, size
+        crc = zlib.crc32(chunk, crc)
+        size += len(chunk)
+        data = header + compress.compress(chunk) + compress.flush(
+            zlib.Z_SYNC_FLUSH)
+        header = b''
+        return data
+
+    def finish():
+        return header + compress.flush() + gzip_trailer(crc, size)
+
+    return process, finish
+
+
+def compress(data, encoding, level, max_random_bytes=0):
+    """
+    Compresses a whole response body.
+
+    Args:
+        max_random_bytes (int): see gzip_header(), ignored by brotli.
+
+    Returns:
+        bytes: the compressed data.
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+
+    compress = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return (gzip_header(max_random_bytes) + compress.compress(data)
+            + compress.flush() + gzip_trailer(zlib.crc32(data), len(data)))
+
+
+def compress_stream(chunks, encoding, level, max_random_bytes=0):
+    """
+    Compresses a streaming response body chunk by chunk, flushing after
+    every chunk so the client receives each as soon as it is produced.
+
+    Args:
+        chunks (iterable): the chunks of the body.
+
+        encoding (str): 'br' or 'gzip'.
+
+        level (int): the brotli quality or gzip level.
+
+        max_random_bytes (int): see gzip_header(), ignored by brotli.
+
+    Yields:
+        bytes: the compressed chunks.
+    """
+    process, finish = compressor(encoding, level, max_random_bytes)
+
+    for chunk in chunks:
+        if chunk:
+            compressed = process(chunk)
+            if compressed:
+                yield compressed
+    yield finish()
@@ -0,0 +1,120 @@
+import atexit
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from rango.models import Category
+from rango.models import Page
+from rango.signals import page_views_flushed
+from rango.tasks import submit
+from rango.tasks import submit_later
+
+
+class PageViewCounter:
+    """
+    Buffers page view increments in memory and writes them in batches.
+
+    A flush is started in the background once
+    RANGO_PAGE_VIEWS_FLUSH_INTERVAL seconds have passed since the last
+    one or RANGO_PAGE_VIEWS_MAX_PENDING pages have pending views, so
+    counting a view costs no database write. Pending views are flushed
+    by a timer at most RANGO_PAGE_VIEWS_FLUSH_INTERVAL seconds after
+    they were counted. Each flush issues one UPDATE ... SET views =
+    views + n per distinct n, adds the views to the total_page_views of
+    the categories in the same transaction and then sends the
+    page_views_flushed signal.
+
+    Attributes:
+        pending (Counter): views per page id not yet written.
+
+        last_flush (float): time of the last flush.
+
+        timer (threading.Timer): the timer of the next flush, if one is
+        scheduled.
+    """
+
+    def __init__(self):
+        """
+        Initializes the PageViewCounter instance.
+        """
+        self.pending = Counter()
+        self.last_flush = time.time()
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def incr(self, page_id, amount=1):
+        """
+        Counts views of a page.
+
+        Args:
+            page_id (int): the primary key of the page.
+
+            amount (int): the number of views.
+        """
+        with self.lock:
+            self.pending[page_id] += amount
+
+            due = (len(self.pending) >= settings.RANGO_PAGE_VIEWS_MAX_PENDING
+                   or time.time() - self.last_flush
+                   >= settings.RANGO_PAGE_VIEWS_FLUSH_INTERVAL)
+            if due:
+                self.last_flush = time.time()
+            elif self.timer is None:
+                self.timer = submit_later(
+                    settings.RANGO_PAGE_VIEWS_FLUSH_INTERVAL, self.flush)
+
+        if due:
+            submit(self.flush)
+
+    def flush(self):
+        """
+        Writes the pending views to the database.
+
+        Returns:
+            dict: the views added per page id.
+        """
+        with self.lock:
+            pending, self.pending = dict(self.pending), Counter()
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+        if not pending:
+            return pending
+
+        by_amount = {}
+        for page_id, amount in pending.items():
+            by_amount.setdefault(amount, []).append(page_id)
+
+        category_views = Counter()
+
+        with transaction.atomic():
+            for amount, page_ids in by_amount.items():
+                Page.objects.filter(id__in=page_ids).update(
+                    views=F('views') + amount)
+
+            for page_id, category_id in Page.objects.filter(
+                    id__in=list(pending)).values_list('id', 'category_id'):
+                category_views[category_id] += pending[page_id]
+
+            by_amount = {}
+            for category_id, amount in category_views.items():
+                by_amount.setdefault(amount, []).append(category_id)
+
+            for amount, category_ids in by_amount.items():
+                Category.all_objects.filter(id__in=category_ids).update(
+                    total_page_views=F('total_page_views') + amount)
+
+        page_views_flushed.send(sender=self.__class__, page_views=pending,
+                                category_views=dict(category_views))
+        return pending
+
+
+page_views = PageViewCounter()
+
+# Do not lose the views buffered by a worker that shuts down cleanly.
+atexit.register(page_views.flush)
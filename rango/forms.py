@@ -1,7 +1,11 @@
 import re
+import warnings
 
 from django import forms
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.template.defaultfilters import filesizeformat
+from PIL import Image
 
 from rango.models import Category
 from rango.models import Page
@@ -87,7 +91,80 @@ class PageForm(forms.ModelForm):
 
     class Meta:
         model = Page
-        exclude = ('category', 'added_by')
+        exclude = ('category', 'added_by', 'trending_score')
+
+
+class BoundedImageField(forms.ImageField):
+    """
+    Image field which rejects oversized images before Pillow decodes
+    them.
+
+    Only the image header is read to learn the dimensions, so a small
+    file which would decompress into a huge bitmap is refused without
+    allocating it. Files larger than settings.RANGO_MAX_UPLOAD_SIZE,
+    images with a side longer than settings.RANGO_MAX_IMAGE_DIMENSION
+    and images with more than settings.RANGO_MAX_IMAGE_PIXELS pixels
+    are rejected.
+    """
+    default_error_messages = {
+        'file_too_large': 'The file is larger than %(limit)s.',
+        'too_large': 'The image must be at most %(limit)d pixels wide '
+                     'and high.',
+        'too_many_pixels': 'The image must have at most %(limit)d '
+                           'pixels.',
+    }
+
+    def to_python(self, data):
+        """
+        Checks the size and the header of the upload before the full
+        validation of forms.ImageField.
+
+        Args:
+            data (UploadedFile): the uploaded file.
+
+        Returns:
+            UploadedFile: the validated file, see forms.ImageField.
+
+        Raises:
+            ValidationError: if the file or the image is too large.
+        """
+        if data in self.empty_values:
+            return super().to_python(data)
+
+        if data.size > settings.RANGO_MAX_UPLOAD_SIZE:
+            raise ValidationError(
+                self.error_messages['file_too_large'],
+                code='file_too_large',
+                params={'limit': filesizeformat(
+                    settings.RANGO_MAX_UPLOAD_SIZE)})
+
+        try:
+            # Pillow only warns below twice its limit, so the pixels are
+            # checked below rather than left to it.
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+                with Image.open(data) as image:
+                    width, height = image.size
+        except Image.DecompressionBombError:
+            width = height = settings.RANGO_MAX_IMAGE_PIXELS
+        except Exception:
+            # Let forms.ImageField report files which are not images.
+            width = height = 0
+        finally:
+            data.seek(0)
+
+        if max(width, height) > settings.RANGO_MAX_IMAGE_DIMENSION:
+            raise ValidationError(
+                self.error_messages['too_large'], code='too_large',
+                params={'limit': settings.RANGO_MAX_IMAGE_DIMENSION})
+
+        if width * height > settings.RANGO_MAX_IMAGE_PIXELS:
+            raise ValidationError(
+                self.error_messages['too_many_pixels'],
+                code='too_many_pixels',
+                params={'limit': settings.RANGO_MAX_IMAGE_PIXELS})
+
+        return super().to_python(data)
 
 
 class UserProfileForm(forms.ModelForm):
@@ -97,10 +174,32 @@ class UserProfileForm(forms.ModelForm):
     Attributes:
         website (URLField): the user's website URL.
 
-        picture (ImageField): the user's profile picture.
+        picture (BoundedImageField): the user's profile picture.
     """
     website = forms.URLField(required=False, widget=forms.TextInput)
-    picture = forms.ImageField(required=False)
+    picture = BoundedImageField(required=False)
+
+    def __init__(self, *args, upload_errors=None, **kwargs):
+        """
+        Initializes the form.
+
+        Args:
+            upload_errors (dict): errors of files dropped while they
+            were uploaded, by field name, see LimitedUploadHandler.
+        """
+        super().__init__(*args, **kwargs)
+        self.upload_errors = upload_errors or {}
+
+    def clean(self):
+        """
+        Reports the files dropped while they were uploaded.
+        """
+        cleaned_data = super().clean()
+
+        for field, error in self.upload_errors.items():
+            self.add_error(field, error)
+
+        return cleaned_data
 
     def clean_website(self):
         """
@@ -118,4 +217,4 @@ class UserProfileForm(forms.ModelForm):
 
     class Meta:
         model = UserProfile
-        exclude = ('user', 'liked_categories')
+        exclude = ('user', 'liked_categories', 'picture_variants')
@@ -0,0 +1,40 @@
+from rango.page_cache import expire_tags
+from rango.page_cache import tag_versions
+
+
+def page_list_tag(category_id):
+    return 'page-list:%d' % category_id
+
+
+def page_list_version(category_id):
+    """
+    Gets the version of the cached page list of a category, which is
+    part of the fragment cache key in category.html. Setting a new
+    version makes the old fragments unused, and they expire after
+    settings.RANGO_PAGE_LIST_CACHE_TIMEOUT.
+
+    Args:
+        category_id (int): the primary key of the category.
+
+    Returns:
+        int: the version, created if the cache has none.
+    """
+    return tag_versions([page_list_tag(category_id)])[
+        page_list_tag(category_id)]
+
+
+def expire_page_lists(category_ids, min_age=0):
+    """
+    Gives the page lists of categories a new version, so they are
+    rendered again on the next request.
+
+    Args:
+        category_ids (iterable): the primary keys of the categories.
+
+        min_age (float): expire versions younger than this many seconds
+        only once they reach that age. View counts are flushed every
+        few seconds, and would otherwise make the cache useless on busy
+        categories.
+    """
+    expire_tags([page_list_tag(category_id) for category_id in category_ids],
+                min_age)
@@ -0,0 +1,96 @@
+import hashlib
+import math
+
+
+class HyperLogLog:
+    """
+    HyperLogLog cardinality estimator.
+
+    It estimates the number of distinct values added to it with a
+    fixed number of one-byte registers, regardless of how many values
+    are added. With the default precision of 11 it uses 2 KiB and has
+    a standard error of about 2.3%.
+
+    Attributes:
+        precision (int): number of hash bits used to pick a register.
+
+        registers (bytearray): 2 ** precision registers, each holding
+        the longest run of leading zeros seen for that register.
+    """
+
+    def __init__(self, precision=11, registers=None):
+        """
+        Initializes the HyperLogLog instance.
+
+        Args:
+            precision (int): number of hash bits used to pick a
+            register, between 4 and 16.
+
+            registers (bytes): registers of a stored estimator, which
+            also determine the precision.
+        """
+        if registers is not None:
+            precision = int(math.log2(len(registers)))
+            registers = bytearray(registers)
+        else:
+            registers = bytearray(1 << precision)
+
+        self.precision = precision
+        self.registers = registers
+
+    def add(self, value):
+        """
+        Adds a value to the estimator.
+
+        Args:
+            value (str): the value, e.g. a visitor key.
+        """
+        digest = hashlib.blake2b(value.encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> (64 - self.precision)
+        rest_bits = 64 - self.precision
+        rest = hashed & ((1 << rest_bits) - 1)
+        rank = rest_bits - rest.bit_length() + 1
+
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        """
+        Merges another estimator of the same precision into this one,
+        after which this one counts the union of both.
+
+        Args:
+            other (HyperLogLog): the estimator to merge.
+        """
+        if other.precision != self.precision:
+            raise ValueError('Cannot merge HyperLogLogs of different '
+                             'precision.')
+
+        self.registers = bytearray(
+            max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self):
+        """
+        Estimates the number of distinct values added.
+
+        Returns:
+            int: the estimated cardinality.
+        """
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+
+        # Linear counting is more accurate for small cardinalities.
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+
+        return int(round(estimate))
+
+    def to_bytes(self):
+        """
+        Returns:
+            bytes: the registers, for storing the estimator.
+        """
+        return bytes(self.registers)
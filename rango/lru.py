@@ -0,0 +1,87 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded mapping which evicts the least recently
+    used entry once it is full.
+
+    Attributes:
+        maxsize (int): the maximum number of entries.
+
+        hits (int): the number of get() calls that found their key.
+
+        misses (int): the number of get() calls that did not.
+    """
+
+    def __init__(self, maxsize):
+        """
+        Initializes the LRUCache instance.
+
+        Args:
+            maxsize (int): the maximum number of entries.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Gets the value of a key and marks it as recently used.
+
+        Args:
+            key: the key.
+
+            default: returned when the key is missing.
+
+        Returns:
+            the stored value or the default.
+        """
+        with self.lock:
+            try:
+                self.data.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return self.data[key]
+
+    def set(self, key, value):
+        """
+        Stores a value, evicting the least recently used entry if the
+        cache is full.
+
+        Args:
+            key: the key.
+
+            value: the value.
+        """
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+
+            if len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def pop(self, key):
+        """
+        Removes a key if it is present.
+
+        Args:
+            key: the key.
+        """
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        """
+        Removes every entry.
+        """
+        with self.lock:
+            self.data.clear()
+
+    def __len__(self):
+        return len(self.data)
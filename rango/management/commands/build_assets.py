@@ -0,0 +1,26 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from rango.assets import build_assets
+
+
+class Command(BaseCommand):
+    help = ('Bundles and minifies the CSS and JavaScript files of '
+            'RANGO_ASSET_BUNDLES into content-hashed files with gzip and '
+            'brotli siblings. Run it before collectstatic.')
+
+    def handle(self, *args, **options):
+        manifest = build_assets()
+
+        for name, filename in sorted(manifest.items()):
+            path = os.path.join(settings.RANGO_ASSET_BUILD_DIR, filename)
+            sizes = ['%d bytes' % os.path.getsize(path)]
+
+            for suffix in ('gz', 'br'):
+                if os.path.exists(path + '.' + suffix):
+                    sizes.append('%s %d bytes' % (
+                        suffix, os.path.getsize(path + '.' + suffix)))
+            self.stdout.write('%s -> %s (%s)' % (name, filename,
+                                                 ', '.join(sizes)))
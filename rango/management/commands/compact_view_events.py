@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from rango.analytics import compact_view_events
+from rango.models import HourlyPageViews
+
+
+class Command(BaseCommand):
+    help = ('Folds the page view events into the hourly and daily '
+            'rollups in small batches, and drops hourly rollups older '
+            'than the retention period.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of events compacted per batch.')
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Seconds to sleep between batches.')
+
+    def handle(self, *args, **options):
+        compacted = compact_view_events(options['batch_size'],
+                                        options['pause'])
+
+        cutoff = timezone.now() - timedelta(
+            days=settings.RANGO_ANALYTICS_HOURLY_RETENTION_DAYS)
+        pruned, _ = HourlyPageViews.objects.filter(
+            start__lt=cutoff).delete()
+
+        self.stdout.write('Compacted %d view events, pruned %d hourly '
+                          'rollups.' % (compacted, pruned))
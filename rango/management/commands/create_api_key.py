@@ -0,0 +1,21 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from rango.api.v1.authentication import make_api_key
+
+
+class Command(BaseCommand):
+    help = 'Prints a signed API key for the given user.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError('User "%s" does not exist.'
+                               % options['username'])
+
+        self.stdout.write(make_api_key(user))
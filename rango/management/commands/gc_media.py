@@ -0,0 +1,77 @@
+import os
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from rango.models import UserProfile
+from rango.storage import get_profile_picture_storage
+
+
+class Command(BaseCommand):
+    help = ('Deletes profile pictures and thumbnails which no profile '
+            'refers to anymore, in small batches. Files younger than '
+            '--min-age are kept, since their profile may not be saved '
+            'yet.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of files deleted per batch.')
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Seconds to sleep between batches.')
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help='Seconds a file must be unused for.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only list the files to delete.')
+
+    def walk(self, storage, directory):
+        """
+        Yields the names of all files below a storage directory.
+        """
+        directories, files = storage.listdir(directory)
+
+        for name in files:
+            yield os.path.join(directory, name)
+        for name in directories:
+            yield from self.walk(storage, os.path.join(directory, name))
+
+    def handle(self, *args, **options):
+        storage = get_profile_picture_storage()
+        directory = UserProfile._meta.get_field('picture').upload_to
+        cutoff = timezone.now() - timedelta(seconds=options['min_age'])
+
+        if not storage.exists(directory):
+            self.stdout.write('Deleted 0 unused files.')
+            return
+
+        # Files are listed before the references are read, so a file
+        # uploaded in between is either referenced or too young.
+        names = list(self.walk(storage, directory))
+
+        referenced = set()
+        for picture, variants in UserProfile.objects.exclude(
+                picture='').values_list('picture', 'picture_variants'):
+            referenced.add(picture)
+            for files in variants.values():
+                referenced.update(files.values())
+
+        unused = [name for name in names if name not in referenced]
+        deleted = 0
+
+        for start in range(0, len(unused), options['batch_size']):
+            for name in unused[start:start + options['batch_size']]:
+                # Checked right before deleting, since saving an
+                # identical upload refreshes the time of the shared file.
+                if storage.get_modified_time(name) >= cutoff:
+                    continue
+
+                if options['dry_run']:
+                    self.stdout.write(name)
+                else:
+                    storage.delete(name)
+                deleted += 1
+            time.sleep(options['pause'])
+
+        self.stdout.write('%s %d unused files.' % (
+            'Would delete' if options['dry_run'] else 'Deleted', deleted))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from rango.models import UserProfile
+from rango.thumbnails import delete_variants
+from rango.thumbnails import generate_variants
+
+
+class Command(BaseCommand):
+    help = ('Generates the thumbnails of profile pictures uploaded before '
+            'thumbnails existed, or of every picture with --all.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Regenerate existing thumbnails too.')
+
+    def handle(self, *args, **options):
+        profiles = UserProfile.objects.exclude(picture='')
+
+        if not options['all']:
+            profiles = profiles.filter(picture_variants={})
+
+        generated = 0
+
+        for profile in profiles.iterator():
+            try:
+                variants = generate_variants(profile.picture)
+            except (OSError, ValueError) as error:
+                self.stderr.write('Skipped %s: %s' % (profile, error))
+                continue
+
+            # Variants are regenerated under the same names, so only
+            # sizes dropped from RANGO_THUMBNAIL_SIZES are left over.
+            delete_variants(profile.picture.storage,
+                            {size: names for size, names in
+                             profile.picture_variants.items()
+                             if names != variants.get(size)})
+            UserProfile.objects.filter(id=profile.id).update(
+                picture_variants=variants)
+            generated += 1
+
+        self.stdout.write('Generated thumbnails for %d profiles.'
+                          % generated)
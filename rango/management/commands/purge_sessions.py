@@ -0,0 +1,49 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = ('Deletes expired sessions in small batches, each in its own '
+            'short transaction, so the purge never holds the database '
+            'write lock for long.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of sessions deleted per batch.')
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Seconds to sleep between batches.')
+
+    def handle(self, *args, **options):
+        engine = import_module(settings.SESSION_ENGINE)
+
+        if not settings.SESSION_ENGINE.endswith(('.db', '.cached_db')):
+            # Cache sessions expire on their own, file sessions are
+            # removed by the backend.
+            engine.SessionStore.clear_expired()
+            self.stdout.write('Cleared expired sessions of %s.'
+                              % settings.SESSION_ENGINE)
+            return
+
+        now = timezone.now()
+        deleted = 0
+
+        while True:
+            with transaction.atomic():
+                keys = list(Session.objects.filter(
+                    expire_date__lt=now).values_list(
+                    'session_key', flat=True)[:options['batch_size']])
+
+                if not keys:
+                    break
+
+                Session.objects.filter(session_key__in=keys).delete()
+            deleted += len(keys)
+            time.sleep(options['pause'])
+
+        self.stdout.write('Deleted %d expired sessions.' % deleted)
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models import Sum
+
+from rango.models import Category
+from rango.models import Page
+
+
+class Command(BaseCommand):
+    help = ('Recomputes the page_count and total_page_views of every '
+            'category from its pages, in small batches of categories, '
+            'and reports how many had drifted.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of categories per batch.')
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Seconds to sleep between batches.')
+
+    def handle(self, *args, **options):
+        last_id = 0
+        checked = 0
+        fixed = 0
+
+        while True:
+            with transaction.atomic():
+                categories = list(Category.all_objects.select_for_update()
+                                  .filter(id__gt=last_id).order_by('id')
+                                  [:options['batch_size']])
+
+                if not categories:
+                    break
+
+                totals = {row['category_id']: row for row in
+                          Page.objects.filter(category__in=categories)
+                          .values('category_id')
+                          .annotate(pages=Count('id'), views=Sum('views'))}
+                drifted = []
+
+                for category in categories:
+                    row = totals.get(category.id, {'pages': 0, 'views': 0})
+
+                    if (category.page_count != row['pages']
+                            or category.total_page_views != row['views']):
+                        category.page_count = row['pages']
+                        category.total_page_views = row['views']
+                        drifted.append(category)
+
+                Category.all_objects.bulk_update(
+                    drifted, ['page_count', 'total_page_views'])
+
+            last_id = categories[-1].id
+            checked += len(categories)
+            fixed += len(drifted)
+            time.sleep(options['pause'])
+
+        self.stdout.write('Checked %d categories, fixed %d.'
+                          % (checked, fixed))
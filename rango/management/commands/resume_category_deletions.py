@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from rango.models import CategoryDeletion
+from rango.tasks import delete_category
+
+
+class Command(BaseCommand):
+    help = ('Finishes category deletions which were pending or running '
+            'when a server process stopped. Background tasks only live '
+            'in the memory of the process which queued them, so run this '
+            'whenever the servers are restarted.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--failed', action='store_true',
+                            help='Retry failed deletions too.')
+
+    def handle(self, *args, **options):
+        statuses = [CategoryDeletion.PENDING, CategoryDeletion.RUNNING]
+        if options['failed']:
+            statuses.append(CategoryDeletion.FAILED)
+
+        resumed = 0
+
+        for deletion_id in CategoryDeletion.objects.filter(
+                status__in=statuses).order_by('id').values_list(
+                'id', flat=True):
+            try:
+                delete_category(deletion_id)
+            except Exception as error:
+                self.stderr.write('Deletion %d failed: %s'
+                                  % (deletion_id, error))
+                continue
+            resumed += 1
+
+        self.stdout.write('Finished %d category deletions.' % resumed)
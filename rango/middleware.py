@@ -0,0 +1,342 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.urls import Resolver404
+from django.urls import resolve
+from django.utils.cache import get_conditional_response
+from django.utils.cache import patch_cache_control
+from django.utils.cache import patch_vary_headers
+
+from rango.compression import COMPRESSIBLE_TYPES
+from rango.compression import compress
+from rango.compression import compress_stream
+from rango.compression import negotiate
+from rango.page_cache import PAGE_KEY
+from rango.page_cache import tag_versions
+
+
+def is_api_request(request):
+    """
+    Checks if the request goes to the v1 API and the lean middleware
+    path is enabled.
+
+    Args:
+        request (HttpRequest): the request object.
+
+    Returns:
+        bool: True if the stateful middleware should be skipped.
+    """
+    return (settings.RANGO_API_LEAN_MIDDLEWARE
+            and request.path_info.startswith(settings.RANGO_API_PREFIX))
+
+
+class ApiExemptMixin:
+    """
+    Mixin for Django middleware which turns the middleware into a
+    pass-through for API requests.
+
+    The API authenticates with signed keys, so it needs neither the
+    session (a django_session lookup per request), nor messages, nor
+    CSRF checks, which only apply to cookie-based authentication.
+    """
+    def __call__(self, request):
+        """
+        Skips process_request and process_response for API requests.
+        """
+        if is_api_request(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class ApiExemptSessionMiddleware(ApiExemptMixin, SessionMiddleware):
+    pass
+
+
+class ApiExemptCsrfViewMiddleware(ApiExemptMixin, CsrfViewMiddleware):
+    def process_view(self, request, callback, callback_args,
+                     callback_kwargs):
+        """
+        Skips the CSRF check for API requests.
+        """
+        if is_api_request(request):
+            return None
+        return super().process_view(request, callback, callback_args,
+                                    callback_kwargs)
+
+
+class ApiExemptAuthenticationMiddleware(ApiExemptMixin,
+                                        AuthenticationMiddleware):
+    pass
+
+
+class ApiExemptMessageMiddleware(ApiExemptMixin, MessageMiddleware):
+    pass
+
+
+class AnonymousPageCacheMiddleware:
+    """
+    Middleware serving the pages of views which call cache_page() from
+    the cache to anonymous visitors.
+
+    A request counts as anonymous when it carries neither a session
+    cookie nor a messages cookie, so deciding it needs no session or
+    user lookup, and a cache hit costs two cache reads and no query.
+    It has to come before SessionMiddleware, so it sees the cookies
+    the other middleware set on the response. Responses setting
+    cookies are never stored. Views therefore skip per-visitor work
+    when request.page_cacheable is set and do it in a page_cache_hit()
+    class method instead, which runs for hits and for stored misses.
+
+    The cache key holds the host, the path and only the query
+    parameters the view class lists in page_cache_query_params, so
+    made-up query strings cannot fill the cache and evict pages.
+
+    Pages are stored for settings.RANGO_PAGE_CACHE_TIMEOUT seconds and
+    expired earlier through their tags. Browsers and proxies are told
+    to revalidate them, which an ETag makes cheap, and responses for
+    logged in users are marked private.
+    """
+    # Headers which are recomputed or must never be shared.
+    skipped_headers = {'set-cookie', 'content-length', 'date'}
+
+    # The response may only vary on these headers, which the cache key
+    # does not hold: requests with cookies that matter bypass the cache,
+    # and responses are compressed outside of this middleware.
+    cacheable_vary = {'cookie', 'accept-encoding'}
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cacheable = self.is_cacheable_request(request)
+
+        if cacheable:
+            response = self.get_cached_response(request)
+            if response is not None:
+                return response
+
+            # Tells views to leave per-visitor work, such as setting
+            # cookies, to their page_cache_hit() method.
+            request.page_cacheable = True
+
+        response = self.get_response(request)
+
+        if getattr(response, 'page_cache_tags', None) is None:
+            return response
+
+        patch_vary_headers(response, ['Cookie'])
+        if not cacheable:
+            patch_cache_control(response, private=True)
+            return response
+
+        if self.is_cacheable_response(response):
+            self.store(request, response)
+        self.page_cache_hit(request, response, response.page_cache_hit)
+        return response
+
+    def is_cacheable_request(self, request):
+        """
+        Checks if a request may be answered from the cache, without
+        loading its session or user.
+        """
+        return (request.method in ('GET', 'HEAD')
+                and settings.SESSION_COOKIE_NAME not in request.COOKIES
+                and 'messages' not in request.COOKIES)
+
+    def is_cacheable_response(self, response):
+        """
+        Checks if a response is the same for every anonymous visitor.
+        """
+        vary = {header.strip().lower() for header in
+                response.get('Vary', '').split(',') if header.strip()}
+
+        return (response.status_code == 200
+                and not response.streaming
+                and not response.cookies
+                and 'private' not in response.get('Cache-Control', '')
+                and 'no-store' not in response.get('Cache-Control', '')
+                and vary <= self.cacheable_vary)
+
+    def view_class(self, request):
+        """
+        Gets the class of the view a request resolves to.
+
+        Returns:
+            type: the view class, or None for function views and paths
+            which do not resolve.
+        """
+        try:
+            view = resolve(request.path_info).func
+        except Resolver404:
+            return None
+        return getattr(view, 'view_class', None)
+
+    def key(self, request):
+        """
+        Gets the cache key of the response to a request, ignoring the
+        query parameters the view does not use.
+        """
+        params = getattr(self.view_class(request), 'page_cache_query_params',
+                         ())
+        query = sorted((name, value) for name, value in request.GET.items()
+                       if name in params)
+        url = '%s%s?%s' % (request.get_host(), request.path,
+                           urlencode(query))
+        return PAGE_KEY % hashlib.md5(url.encode()).hexdigest()
+
+    def store(self, request, response):
+        """
+        Stores a response under the current versions of its tags, and
+        sets the ETag and Cache-Control headers the cached copies are
+        served with.
+        """
+        response['ETag'] = '"%s"' % hashlib.md5(response.content).hexdigest()
+        patch_cache_control(response, public=True, no_cache=True)
+
+        cache.set(self.key(request), {
+            'content': response.content,
+            'status': response.status_code,
+            'headers': [(name, value) for name, value in response.items()
+                        if name.lower() not in self.skipped_headers],
+            'tags': tag_versions(response.page_cache_tags),
+            'hit': response.page_cache_hit,
+        }, settings.RANGO_PAGE_CACHE_TIMEOUT)
+
+    def get_cached_response(self, request):
+        """
+        Gets the cached response of a request, if its tags did not
+        expire.
+
+        Returns:
+            HttpResponse: the response, 304 Not Modified if the client
+            has it already, or None.
+        """
+        entry = cache.get(self.key(request))
+
+        if entry is None or tag_versions(entry['tags']) != entry['tags']:
+            return None
+
+        headers = dict(entry['headers'])
+        response = get_conditional_response(request, etag=headers['ETag'])
+
+        if response is None:
+            response = HttpResponse(entry['content'], status=entry['status'])
+            if request.method == 'HEAD':
+                response.content = b''
+        for name, value in entry['headers']:
+            response[name] = value
+
+        self.page_cache_hit(request, response, entry['hit'])
+        return response
+
+    def page_cache_hit(self, request, response, hit_kwargs):
+        """
+        Calls the page_cache_hit() method of the view class of a
+        request the cache answered or stored. It runs after storing,
+        so cookies it sets are not cached.
+        """
+        hook = getattr(self.view_class(request), 'page_cache_hit', None)
+        if hook is not None:
+            hook(request, response, **hit_kwargs)
+
+
+class CompressionMiddleware:
+    """
+    Middleware compressing responses with brotli or gzip, whichever the
+    client prefers, brotli on a tie. It replaces Django's GZipMiddleware
+    and has to come first, so it compresses the final response.
+
+    Bodies smaller than settings.RANGO_COMPRESSION_MIN_SIZE bytes are
+    sent as they are, since compressing them saves less than it costs.
+    Streaming responses are compressed chunk by chunk. Only text-like
+    content types are compressed; images, fonts and archives are
+    compressed already. The levels are set by settings.RANGO_GZIP_LEVEL
+    and settings.RANGO_BROTLI_QUALITY, see
+    benchmarks/bench_compression.py.
+
+    Like GZipMiddleware, gzip streams carry a file name of random
+    length to mitigate BREACH. Brotli has no such field, so responses
+    which may hold per-visitor secrets, i.e. vary on the cookie and are
+    not public, are only sent gzipped.
+    """
+    # The same padding as GZipMiddleware.
+    max_random_bytes = 100
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if not self.is_compressible(response):
+            return response
+        if (not response.streaming and len(response.content)
+                < settings.RANGO_COMPRESSION_MIN_SIZE):
+            return response
+
+        patch_vary_headers(response, ['Accept-Encoding'])
+        encoding = negotiate(request.headers.get('Accept-Encoding', ''),
+                             ['gzip'] if self.is_private(response) else None)
+
+        if encoding is None:
+            return response
+
+        level = (settings.RANGO_BROTLI_QUALITY if encoding == 'br'
+                 else settings.RANGO_GZIP_LEVEL)
+
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding, level,
+                self.max_random_bytes)
+            del response['Content-Length']
+        else:
+            compressed = compress(response.content, encoding, level,
+                                  self.max_random_bytes)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The compressed body differs byte for byte, so a strong ETag
+        # of the uncompressed one becomes weak, as in GZipMiddleware.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+
+        response['Content-Encoding'] = encoding
+        return response
+
+    def is_compressible(self, response):
+        """
+        Checks if a response may be compressed at all, independent of
+        the client.
+        """
+        if response.has_header('Content-Encoding'):
+            return False
+        if response.status_code == 206 or response.has_header(
+                'Content-Range'):
+            return False
+        if response.streaming and response.is_async:
+            return False
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return False
+
+        content_type = response.get('Content-Type', '').lower()
+        return COMPRESSIBLE_TYPES.match(content_type) is not None
+
+    def is_private(self, response):
+        """
+        Checks if a response may hold secrets of the visitor, such as a
+        CSRF token.
+        """
+        vary = {header.strip().lower() for header in
+                response.get('Vary', '').split(',')}
+        return ('cookie' in vary
+                and 'public' not in response.get('Cache-Control', ''))
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rango', '0009_page_added_by'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='page',
+            index=models.Index(fields=['-views', '-id'], name='rango_page_views_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='page',
+            index=models.Index(fields=['category', '-views', '-id'], name='rango_page_cat_views_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='page',
+            index=models.Index(fields=['added_by', '-views', '-id'], name='rango_page_user_views_idx'),
+        ),
+    ]
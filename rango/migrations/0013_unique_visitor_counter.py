@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rango', '0012_category_deletion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UniqueVisitorCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('category', 'Category'), ('page', 'Page')], max_length=16)),
+                ('object_id', models.PositiveIntegerField()),
+                ('day', models.DateField()),
+                ('registers', models.BinaryField()),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rango', '0013_unique_visitor_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageViewEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_id', models.PositiveIntegerField()),
+                ('category_id', models.PositiveIntegerField()),
+                ('occurred_at', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=1)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HourlyPageViews',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_id', models.PositiveIntegerField()),
+                ('category_id', models.PositiveIntegerField()),
+                ('start', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'abstract': False,
+                'indexes': [models.Index(fields=['start'], name='rango_hourly_start_idx'), models.Index(fields=['category_id', 'start'], name='rango_hourly_cat_start_idx')],
+                'unique_together': {('page_id', 'start')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyPageViews',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_id', models.PositiveIntegerField()),
+                ('category_id', models.PositiveIntegerField()),
+                ('start', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'abstract': False,
+                'indexes': [models.Index(fields=['start'], name='rango_daily_start_idx'), models.Index(fields=['category_id', 'start'], name='rango_daily_cat_start_idx')],
+                'unique_together': {('page_id', 'start')},
+            },
+        ),
+    ]
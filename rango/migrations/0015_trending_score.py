@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rango', '0014_page_view_analytics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='trending_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='page',
+            name='trending_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['-trending_score', '-id'], name='rango_cat_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='page',
+            index=models.Index(fields=['-trending_score', '-id'], name='rango_page_trending_idx'),
+        ),
+    ]
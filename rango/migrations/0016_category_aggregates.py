@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:45
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models import Sum
+
+
+def compute_aggregates(apps, schema_editor):
+    Category = apps.get_model('rango', 'Category')
+    Page = apps.get_model('rango', 'Page')
+
+    for row in Page.objects.values('category_id').annotate(
+            pages=Count('id'), views=Sum('views')):
+        Category.objects.filter(id=row['category_id']).update(
+            page_count=row['pages'], total_page_views=row['views'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rango', '0015_trending_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='page_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='total_page_views',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(compute_aggregates, migrations.RunPython.noop),
+    ]
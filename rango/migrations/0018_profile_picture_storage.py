@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:49
+
+from django.db import migrations, models
+import rango.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rango', '0017_picture_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userprofile',
+            name='picture',
+            field=models.ImageField(blank=True, storage=rango.storage.get_profile_picture_storage, upload_to='profile_images'),
+        ),
+    ]
@@ -1,7 +1,21 @@
 from django.contrib.auth.models import User
 from django.db import models
+from django.db import transaction
 from django.template.defaultfilters import slugify
 
+from rango.storage import get_profile_picture_storage
+from rango.thumbnails import delete_variants
+from rango.thumbnails import schedule_variants
+
+
+class CategoryManager(models.Manager):
+    """
+    Default manager for categories, which hides categories that are
+    waiting for their background deletion to finish.
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
 
 class Category(models.Model):
     """
@@ -17,11 +31,36 @@ class Category(models.Model):
         value is zero.
 
         slug (str): the slug type of the category name.
+
+        version (int): incremented on every write through the API,
+        the admin or a like, used as the ETag for optimistic
+        concurrency control.
+
+        is_deleted (bool): set when the category is scheduled for
+        deletion, its pages are then removed in the background.
+
+        trending_score (float): the time-decayed sum of the category's
+        likes and page views in log space, see rango.trending.
+
+        page_count (int): the number of pages in the category.
+
+        total_page_views (int): the sum of the views of its pages.
+
+        Both aggregates are maintained by rango.signals and the page
+        view counter, and recomputed by reconcile_category_aggregates.
     """
     name = models.CharField(max_length=128, unique=True)
     views = models.IntegerField(default=0)
     likes = models.IntegerField(default=0)
     slug = models.SlugField(unique=True)
+    version = models.PositiveIntegerField(default=0)
+    is_deleted = models.BooleanField(default=False, db_index=True)
+    trending_score = models.FloatField(default=0)
+    page_count = models.PositiveIntegerField(default=0)
+    total_page_views = models.BigIntegerField(default=0)
+
+    objects = CategoryManager()
+    all_objects = models.Manager()
 
     def save(self, *args, **kwargs):
         """
@@ -42,6 +81,10 @@ class Category(models.Model):
 
     class Meta:
         verbose_name_plural = "Categories"
+        indexes = [
+            models.Index(fields=['-trending_score', '-id'],
+                         name='rango_cat_trending_idx'),
+        ]
 
 
 class Page(models.Model):
@@ -59,6 +102,9 @@ class Page(models.Model):
         views (int): The number of views for the page.
 
         added_by (User): The user (foreign key) who added the page.
+
+        trending_score (float): the time-decayed sum of the page's
+        views in log space, see rango.trending.
     """
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     title = models.CharField(max_length=128)
@@ -66,6 +112,37 @@ class Page(models.Model):
     views = models.IntegerField(default=0)
     added_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True,
                                  blank=True)
+    trending_score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-trending_score', '-id'],
+                         name='rango_page_trending_idx'),
+            models.Index(fields=['-views', '-id'],
+                         name='rango_page_views_idx'),
+            models.Index(fields=['category', '-views', '-id'],
+                         name='rango_page_cat_views_idx'),
+            models.Index(fields=['added_by', '-views', '-id'],
+                         name='rango_page_user_views_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the page in a transaction, together with the aggregates
+        of its category which the post_save receiver updates.
+        """
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Remembers the category and views a page was loaded with, so
+        saving it can adjust the aggregates of its category.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
     def __str__(self):
         """
@@ -77,6 +154,173 @@ class Page(models.Model):
         return self.title
 
 
+class CategoryDeletion(models.Model):
+    """
+    Model tracking the background deletion of a category.
+
+    Attributes:
+        category_id (int): the primary key of the deleted category.
+
+        category_name (str): the name of the category before deletion.
+
+        status (str): pending, running, done or failed.
+
+        pages_deleted (int): the number of pages removed so far.
+
+        created (datetime): when the deletion was requested.
+
+        finished (datetime): when the deletion finished or failed.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'),
+                      (DONE, 'Done'), (FAILED, 'Failed')]
+
+    category_id = models.IntegerField()
+    category_name = models.CharField(max_length=128)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES,
+                              default=PENDING)
+    pages_deleted = models.IntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        """
+        String representation of the category deletion.
+
+        Returns:
+            str: the category name and the deletion status.
+        """
+        return '%s (%s)' % (self.category_name, self.status)
+
+
+class UniqueVisitorCounter(models.Model):
+    """
+    Model holding the HyperLogLog registers which estimate the unique
+    visitors of a category or a page on one day.
+
+    Attributes:
+        kind (str): 'category' or 'page'.
+
+        object_id (int): the primary key of the category or page.
+
+        day (date): the day the visitors are counted for.
+
+        registers (bytes): the HyperLogLog registers, a fixed 2 KiB
+        however many visitors there are.
+    """
+    CATEGORY = 'category'
+    PAGE = 'page'
+    KIND_CHOICES = [(CATEGORY, 'Category'), (PAGE, 'Page')]
+
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    day = models.DateField()
+    registers = models.BinaryField()
+
+    class Meta:
+        unique_together = ('kind', 'object_id', 'day')
+
+    def __str__(self):
+        """
+        String representation of the counter.
+
+        Returns:
+            str: the kind, object id and day of the counter.
+        """
+        return '%s %d on %s' % (self.kind, self.object_id, self.day)
+
+
+class PageViewEvent(models.Model):
+    """
+    Model for the append-only log of page views, one row per page and
+    counter flush. compact_view_events folds the rows into the hourly
+    and daily rollups and deletes them.
+
+    Attributes:
+        page_id (int): the primary key of the viewed page.
+
+        category_id (int): the primary key of the page's category.
+
+        occurred_at (datetime): when the views were flushed.
+
+        count (int): the number of views.
+    """
+    page_id = models.PositiveIntegerField()
+    category_id = models.PositiveIntegerField()
+    occurred_at = models.DateTimeField()
+    count = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        """
+        String representation of the event.
+
+        Returns:
+            str: the page id, count and time of the event.
+        """
+        return 'page %d: %d views at %s' % (self.page_id, self.count,
+                                            self.occurred_at)
+
+
+class PageViewRollup(models.Model):
+    """
+    Abstract model for the views of a page within one time bucket.
+
+    Attributes:
+        page_id (int): the primary key of the viewed page.
+
+        category_id (int): the primary key of the page's category.
+
+        start (datetime): the start of the bucket, in UTC.
+
+        views (int): the number of views within the bucket.
+    """
+    page_id = models.PositiveIntegerField()
+    category_id = models.PositiveIntegerField()
+    start = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+        unique_together = ('page_id', 'start')
+
+    def __str__(self):
+        """
+        String representation of the rollup.
+
+        Returns:
+            str: the page id, views and start of the bucket.
+        """
+        return 'page %d: %d views from %s' % (self.page_id, self.views,
+                                              self.start)
+
+
+class HourlyPageViews(PageViewRollup):
+    """
+    Model for the views of a page within one hour.
+    """
+    class Meta(PageViewRollup.Meta):
+        indexes = [
+            models.Index(fields=['start'], name='rango_hourly_start_idx'),
+            models.Index(fields=['category_id', 'start'],
+                         name='rango_hourly_cat_start_idx'),
+        ]
+
+
+class DailyPageViews(PageViewRollup):
+    """
+    Model for the views of a page within one day.
+    """
+    class Meta(PageViewRollup.Meta):
+        indexes = [
+            models.Index(fields=['start'], name='rango_daily_start_idx'),
+            models.Index(fields=['category_id', 'start'],
+                         name='rango_daily_cat_start_idx'),
+        ]
+
+
 class UserProfile(models.Model):
     """
     Model representing a user profile.
@@ -89,12 +333,50 @@ class UserProfile(models.Model):
         website (str): The user's website URL.
 
         picture (ImageField): The user's profile picture.
+
+        picture_variants (dict): storage names of the thumbnails of
+        the picture by size and extension, see rango.thumbnails.
     """
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     liked_categories = models.ManyToManyField(Category, blank=True)
 
     website = models.URLField(blank=True)
-    picture = models.ImageField(upload_to='profile_images', blank=True)
+    picture = models.ImageField(upload_to='profile_images', blank=True,
+                                storage=get_profile_picture_storage)
+    picture_variants = models.JSONField(default=dict, blank=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Remembers the picture a profile was loaded with, so saving it
+        only regenerates the thumbnails when the picture changed.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_picture = dict(zip(field_names, values)).get(
+            'picture')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the profile and, when the picture changed, drops its old
+        thumbnails and schedules new ones once the transaction commits.
+        The original is stored right away and a placeholder is shown
+        until the thumbnails are ready.
+        """
+        changed = (self.picture.name or '') != (
+            getattr(self, '_loaded_picture', '') or '')
+
+        if changed:
+            delete_variants(self.picture.storage, self.picture_variants)
+            self.picture_variants = {}
+
+        super().save(*args, **kwargs)
+        self._loaded_picture = self.picture.name
+
+        if changed and self.picture:
+            picture = self.picture
+            transaction.on_commit(
+                lambda: schedule_variants(self.id, picture))
 
     def __str__(self):
         """
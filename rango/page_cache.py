@@ -0,0 +1,103 @@
+import time
+
+from django.core.cache import cache
+
+# Cached responses by host and path, and the version of each tag, which
+# is the time in nanoseconds the tag was last expired. A cached
+# response records the versions of its tags when it is stored and is
+# only served while they are unchanged. An expiry kept back by min_age
+# is recorded as the time it is due, and applied by the first
+# tag_versions() call after that.
+PAGE_KEY = 'rango:page:%s'
+TAG_VERSION = 'rango:page-tag:%s'
+TAG_PENDING = 'rango:page-tag-pending:%s'
+
+
+def cache_page(response, tags, **hit_kwargs):
+    """
+    Allows AnonymousPageCacheMiddleware to cache a response for
+    anonymous visitors.
+
+    Args:
+        response (HttpResponse): the response of a view.
+
+        tags (list): the tags which expire the cached response, e.g.
+        ['index', 'category:3'].
+
+        **hit_kwargs: passed to the page_cache_hit() method of the view
+        class, which is called when the response is served from the
+        cache, e.g. to count the visit.
+
+    Query parameters are left out of the cache key unless the view
+    class lists them in a page_cache_query_params attribute.
+
+    Returns:
+        HttpResponse: the response.
+    """
+    response.page_cache_tags = list(tags)
+    response.page_cache_hit = hit_kwargs
+    return response
+
+
+def category_tag(category_id):
+    return 'category:%d' % category_id
+
+
+def expire_tags(tags, min_age=0):
+    """
+    Expires the cached responses of tags.
+
+    Args:
+        tags (iterable): the tags.
+
+        min_age (float): expire versions younger than this many seconds
+        only once they reach that age, for changes such as view counts
+        which may lag.
+    """
+    now = time.time_ns()
+    keys = {TAG_VERSION % tag: tag for tag in tags}
+
+    if min_age:
+        versions = cache.get_many(keys)
+        pending = {TAG_PENDING % keys[key]: version + int(min_age * 1e9)
+                   for key, version in versions.items()
+                   if now - version < min_age * 1e9}
+        if pending:
+            cache.set_many(pending, timeout=None)
+        keys = {key: tag for key, tag in keys.items()
+                if key in versions and TAG_PENDING % tag not in pending}
+
+    if keys:
+        cache.set_many(dict.fromkeys(keys, now), timeout=None)
+
+
+def tag_versions(tags):
+    """
+    Gets the current versions of tags, creating missing ones and
+    applying expiries which are due.
+
+    Returns:
+        dict: the versions by tag.
+    """
+    keys = {TAG_VERSION % tag: tag for tag in tags}
+    pending_keys = {TAG_PENDING % tag: TAG_VERSION % tag for tag in tags}
+    values = cache.get_many(list(keys) + list(pending_keys))
+    versions = {key: values[key] for key in keys if key in values}
+
+    now = time.time_ns()
+    due = [pending_key for pending_key in pending_keys
+           if values.get(pending_key, now + 1) <= now]
+    if due:
+        expired = {pending_keys[pending_key]: now for pending_key in due}
+        cache.set_many(expired, timeout=None)
+        cache.delete_many(due)
+        versions.update(expired)
+
+    for key in keys:
+        if key not in versions:
+            version = time.time_ns()
+            # add() keeps a version another process set in the meantime.
+            if not cache.add(key, version, timeout=None):
+                version = cache.get(key, version)
+            versions[key] = version
+    return {keys[key]: version for key, version in versions.items()}
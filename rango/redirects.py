@@ -0,0 +1,45 @@
+import time
+
+from django.conf import settings
+
+from rango.lru import LRUCache
+from rango.models import Page
+
+# Maps page ids to (url, expiry time). Entries are dropped on Page save
+# and delete in this process; the expiry bounds how long other worker
+# processes can keep redirecting to an outdated URL.
+page_urls = LRUCache(settings.RANGO_REDIRECT_CACHE_SIZE)
+
+# Page ids are positive 32-bit integers. Larger ones cannot exist, and
+# would overflow the integer parameters of SQLite, so requests check
+# them with is_page_id() first.
+MAX_PAGE_ID = 2 ** 31 - 1
+
+
+def is_page_id(value):
+    return 0 < value <= MAX_PAGE_ID
+
+
+def get_page_url(page_id):
+    """
+    Gets the URL of a page, from the redirect cache if possible.
+
+    Args:
+        page_id (int): the primary key of the page.
+
+    Returns:
+        str: the URL of the page, or None if the page does not exist.
+    """
+    now = time.time()
+    cached = page_urls.get(page_id)
+
+    if cached is not None and cached[1] > now:
+        return cached[0]
+
+    url = Page.objects.filter(id=page_id).values_list('url',
+                                                      flat=True).first()
+
+    if url is not None:
+        page_urls.set(page_id,
+                      (url, now + settings.RANGO_REDIRECT_CACHE_TTL))
+    return url
@@ -0,0 +1,188 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import Signal
+from django.dispatch import receiver
+
+from rango.analytics import record_page_views
+from rango.fragments import expire_page_lists
+from rango.page_cache import category_tag
+from rango.page_cache import expire_tags
+from rango import trending
+from rango.models import Category
+from rango.models import Page
+from rango.redirects import page_urls
+
+# Sent after buffered page views were written to the database, with
+# page_views mapping page ids to the number of views added and
+# category_views mapping category ids to the views added to their pages.
+page_views_flushed = Signal()
+
+# Categories whose pages are deleted together with them. Their
+# aggregates and cached pages are not updated page by page, since the
+# category row and its caches go away at the end.
+deleting_categories = ContextVar('deleting_categories', default=frozenset())
+
+
+@contextmanager
+def deleting_category(category_id):
+    """
+    Skips the aggregate and cache updates of the pages of a category
+    which is being deleted, for the duration of the block.
+
+    Args:
+        category_id (int): the primary key of the category.
+    """
+    token = deleting_categories.set(
+        deleting_categories.get() | {category_id})
+    try:
+        yield
+    finally:
+        deleting_categories.reset(token)
+
+
+@receiver(post_save, sender=Page)
+@receiver(post_delete, sender=Page)
+def invalidate_page_url(sender, instance, **kwargs):
+    """
+    Drops a saved or deleted page from the redirect cache.
+    """
+    page_urls.pop(instance.id)
+
+
+# Connected before count_saved_page, which resets the loaded values.
+@receiver(post_save, sender=Page)
+@receiver(post_delete, sender=Page)
+def expire_page_caches(sender, instance, raw=False, **kwargs):
+    """
+    Expires the cached page lists and pages of the categories a page
+    was saved to, moved from or deleted from, and the cached index,
+    once the change is committed, so a concurrent request cannot cache
+    the old content under the new version.
+    """
+    if raw or instance.category_id in deleting_categories.get():
+        return
+
+    category_ids = {instance.category_id}
+    loaded = getattr(instance, '_loaded_values', {})
+    if 'category_id' in loaded:
+        category_ids.add(loaded['category_id'])
+
+    def expire():
+        expire_page_lists(category_ids)
+        expire_tags(['index'] + [category_tag(category_id)
+                                 for category_id in category_ids])
+
+    transaction.on_commit(expire)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def expire_category_pages(sender, instance, raw=False, **kwargs):
+    """
+    Expires the cached page of a saved or deleted category and the
+    cached index, once the change is committed.
+    """
+    if raw:
+        return
+
+    # The id is read now, since deleting clears it before the commit.
+    tags = ['index', category_tag(instance.id)]
+    transaction.on_commit(lambda: expire_tags(tags))
+
+
+@receiver(page_views_flushed)
+def record_view_events(sender, page_views, **kwargs):
+    """
+    Appends flushed page views to the view event log for analytics.
+    """
+    record_page_views(page_views)
+
+
+@receiver(page_views_flushed)
+def update_trending_scores(sender, page_views, category_views, **kwargs):
+    """
+    Adds flushed page views to the trending scores of the pages and
+    their categories.
+    """
+    trending.record(Page, page_views)
+    trending.record(Category, category_views)
+
+
+@receiver(page_views_flushed)
+def expire_viewed_page_lists(sender, category_views, **kwargs):
+    """
+    Expires the cached page lists and pages of categories whose pages
+    were viewed, and the cached index, which shows the most viewed
+    pages, unless they are younger than
+    settings.RANGO_PAGE_LIST_VIEWS_STALENESS seconds.
+    """
+    expire_page_lists(category_views,
+                      min_age=settings.RANGO_PAGE_LIST_VIEWS_STALENESS)
+    expire_tags(['index'] + [category_tag(category_id)
+                             for category_id in category_views],
+                min_age=settings.RANGO_PAGE_LIST_VIEWS_STALENESS)
+
+
+def adjust_category_aggregates(category_id, pages, views):
+    """
+    Adds to the page count and total page views of a category. Neither
+    goes below zero, since pages created with bulk_create() or loaded
+    as raw fixtures were never counted.
+
+    Args:
+        category_id (int): the primary key of the category.
+
+        pages (int): the number of pages to add, may be negative.
+
+        views (int): the number of views to add, may be negative.
+    """
+    Category.all_objects.filter(id=category_id).update(
+        page_count=Greatest(F('page_count') + pages, 0),
+        total_page_views=Greatest(F('total_page_views') + views, 0))
+
+
+@receiver(post_save, sender=Page)
+def count_saved_page(sender, instance, created, raw=False, **kwargs):
+    """
+    Updates the aggregates of the categories of a created, moved or
+    edited page. Page.save() runs in a transaction, so the page and the
+    aggregates are written together.
+    """
+    if raw:
+        return
+
+    loaded = getattr(instance, '_loaded_values', {})
+
+    if created:
+        adjust_category_aggregates(instance.category_id, 1, instance.views)
+    elif 'category_id' in loaded and 'views' in loaded:
+        if loaded['category_id'] != instance.category_id:
+            adjust_category_aggregates(loaded['category_id'], -1,
+                                       -loaded['views'])
+            adjust_category_aggregates(instance.category_id, 1,
+                                       instance.views)
+        elif loaded['views'] != instance.views:
+            adjust_category_aggregates(instance.category_id, 0,
+                                       instance.views - loaded['views'])
+
+    instance._loaded_values = {'category_id': instance.category_id,
+                               'views': instance.views}
+
+
+@receiver(post_delete, sender=Page)
+def count_deleted_page(sender, instance, **kwargs):
+    """
+    Updates the aggregates of the category of a deleted page. Deletes
+    run in a transaction, so the page and the aggregates are written
+    together.
+    """
+    if instance.category_id in deleting_categories.get():
+        return
+    adjust_category_aggregates(instance.category_id, -1, -instance.views)
@@ -28,4 +28,43 @@ $(document).ready(function() {
 	                   me.hide();
 	    });
 	});
+
+    // Page links point at /rango/goto/, which counts the click and
+    // redirects, so clicks are still counted without JavaScript. When
+    // the browser can send beacons, the links go straight to the page
+    // and the clicks are reported in batches when the user leaves.
+    var clicks = [];
+
+    function sendClicks() {
+        if (clicks.length === 0) {
+            return;
+        }
+        var body = new Blob([JSON.stringify({page_ids: clicks})],
+                            {type: 'application/json'});
+        clicks = [];
+        navigator.sendBeacon('/rango/clicks/', body);
+    }
+
+    if (navigator.sendBeacon) {
+        $('a[data-page-id]').each(function() {
+            $(this).attr('href', $(this).attr('data-url'));
+        });
+
+        // Links added later, e.g. by the Add button, are rewritten
+        // when they are clicked.
+        $(document).on('click auxclick', 'a[data-page-id]', function() {
+            $(this).attr('href', $(this).attr('data-url'));
+            clicks.push(parseInt($(this).attr('data-page-id'), 10));
+            if (clicks.length >= 50) {
+                sendClicks();
+            }
+        });
+
+        document.addEventListener('visibilitychange', function() {
+            if (document.visibilityState === 'hidden') {
+                sendClicks();
+            }
+        });
+        window.addEventListener('pagehide', sendClicks);
+    }
 })
\ No newline at end of file
@@ -0,0 +1,79 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.storage import storages
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage which names every file after the SHA-256 of its
+    content, e.g. 'profile_images/3f/3f9a...e1.jpg'.
+
+    Identical uploads end up as one file, and since a name always
+    refers to the same bytes, URLs can be cached forever. Files may be
+    shared, so they are never deleted when a reference goes away; the
+    gc_media command removes the ones nothing refers to anymore.
+
+    Attributes:
+        content_addressed (bool): tells rango.thumbnails and gc_media
+        that files may be shared.
+    """
+    content_addressed = True
+
+    def content_name(self, name, content):
+        """
+        Gets the content-addressed name of a file.
+
+        Args:
+            name (str): the name the file was uploaded under, which
+            provides the directory and the extension.
+
+            content (File): the content, read in chunks.
+
+        Returns:
+            str: the directory, a two-character shard directory and the
+            hex digest with the lower-cased extension.
+        """
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(os.path.dirname(name), digest[:2],
+                            digest + extension)
+
+    def save(self, name, content, max_length=None):
+        """
+        Saves a file under its content-addressed name, unless a file
+        with the same content already exists.
+
+        Returns:
+            str: the name of the stored file.
+        """
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        name = self.content_name(name, content)
+
+        if self.exists(name):
+            # Mark the file as used again, so gc_media does not reclaim
+            # it before the new reference is saved.
+            os.utime(self.path(name))
+            return name
+
+        # If another worker stores the same content at the same time,
+        # FileSystemStorage falls back to a suffixed name, which is a
+        # harmless duplicate.
+        return super().save(name, content, max_length)
+
+
+def get_profile_picture_storage():
+    """
+    Gets the storage of UserProfile.picture, configured by the
+    'profile_pictures' alias of settings.STORAGES.
+    """
+    return storages['profile_pictures']
@@ -0,0 +1,177 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from rango.models import Category
+from rango.models import CategoryDeletion
+from rango.models import Page
+from rango.page_cache import category_tag
+from rango.page_cache import expire_tags
+from rango.signals import deleting_category
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Gets the process-wide pool of background worker threads, creating
+    it on first use.
+
+    Returns:
+        ThreadPoolExecutor: pool with settings.RANGO_TASK_WORKERS
+        threads.
+    """
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RANGO_TASK_WORKERS,
+                thread_name_prefix='rango-task')
+    return _executor
+
+
+def run_task(func, *args):
+    """
+    Runs a task, logs its failure and closes the database connection
+    the worker thread opened for it.
+
+    Args:
+        func (callable): the task.
+
+        *args: arguments of the task.
+    """
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Background task %s failed', func.__name__)
+    finally:
+        connections.close_all()
+
+
+def submit(func, *args):
+    """
+    Runs a task in the background worker pool.
+
+    Queued tasks are lost when the process stops. Tasks which record
+    their progress in the database are resumed by a management
+    command, e.g. resume_category_deletions.
+
+    When settings.RANGO_TASKS_EAGER is set, the task runs immediately
+    in the calling thread instead, which is what the tests rely on.
+
+    Args:
+        func (callable): the task.
+
+        *args: arguments of the task.
+    """
+    if settings.RANGO_TASKS_EAGER:
+        func(*args)
+    else:
+        get_executor().submit(run_task, func, *args)
+
+
+def submit_later(delay, func, *args):
+    """
+    Submits a task to the background worker pool after a delay.
+
+    Args:
+        delay (float): seconds to wait.
+
+        func (callable): the task.
+
+        *args: arguments of the task.
+
+    Returns:
+        threading.Timer: the timer, which can be cancelled. It does not
+        keep the process alive.
+    """
+    timer = threading.Timer(delay, submit, (func,) + args)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+def schedule_category_deletion(category):
+    """
+    Hides a category right away and schedules the deletion of its pages.
+
+    The name and slug are released immediately, so a new category with
+    the same name can be created while the old pages are removed.
+    slugify() never produces a leading dash, so the placeholder slug
+    cannot clash with a real one.
+
+    Args:
+        category (Category): the category to delete.
+
+    Returns:
+        CategoryDeletion: the record tracking the deletion.
+    """
+    with transaction.atomic():
+        deletion = CategoryDeletion.objects.create(
+            category_id=category.id, category_name=category.name)
+        Category.all_objects.filter(id=category.id).update(
+            is_deleted=True,
+            name='--deleted-%d' % category.id,
+            slug='--deleted-%d' % category.id)
+
+    transaction.on_commit(lambda: submit(delete_category, deletion.id))
+    tags = ['index', category_tag(category.id)]
+    transaction.on_commit(lambda: expire_tags(tags))
+    return deletion
+
+
+def delete_category(deletion_id):
+    """
+    Deletes the pages of a category in batches of
+    settings.RANGO_DELETION_BATCH_SIZE and then the category itself.
+
+    Every batch is its own short transaction, followed by a pause of
+    settings.RANGO_DELETION_BATCH_PAUSE seconds, so SQLite's write lock
+    is never held for long and requests can write in between. The
+    pages do not update the aggregates and caches of the category one
+    by one, since it is deleted at the end.
+
+    Args:
+        deletion_id (int): the primary key of the CategoryDeletion.
+    """
+    deletion = CategoryDeletion.objects.get(id=deletion_id)
+    CategoryDeletion.objects.filter(id=deletion_id).update(
+        status=CategoryDeletion.RUNNING)
+
+    try:
+        with deleting_category(deletion.category_id):
+            while True:
+                with transaction.atomic():
+                    ids = list(Page.objects.filter(
+                        category_id=deletion.category_id).values_list(
+                        'id', flat=True)[
+                        :settings.RANGO_DELETION_BATCH_SIZE])
+
+                    if not ids:
+                        break
+
+                    Page.objects.filter(id__in=ids).delete()
+                    CategoryDeletion.objects.filter(id=deletion_id).update(
+                        pages_deleted=F('pages_deleted') + len(ids))
+
+                time.sleep(settings.RANGO_DELETION_BATCH_PAUSE)
+
+            Category.all_objects.filter(id=deletion.category_id).delete()
+    except Exception:
+        CategoryDeletion.objects.filter(id=deletion_id).update(
+            status=CategoryDeletion.FAILED, finished=timezone.now())
+        raise
+
+    CategoryDeletion.objects.filter(id=deletion_id).update(
+        status=CategoryDeletion.DONE, finished=timezone.now())
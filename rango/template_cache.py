@@ -0,0 +1,65 @@
+import itertools
+import logging
+import os
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template import TemplateSyntaxError
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+
+def template_names(engine):
+    """
+    Lists the names of all templates a Django template engine can load.
+
+    Args:
+        engine (DjangoTemplates): the template backend.
+
+    Returns:
+        list: the template names, e.g. 'rango/category.html', in the
+        order of the template directories.
+    """
+    names = []
+    for directory in itertools.chain.from_iterable(
+            loader.get_dirs() for loader in engine.engine.template_loaders):
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                names.append(os.path.relpath(
+                    os.path.join(root, filename), directory).replace(
+                        os.sep, '/'))
+    return list(dict.fromkeys(names))
+
+
+def compile_templates():
+    """
+    Compiles every template of the Django template engines, so that the
+    cached template loader holds them before the first request.
+
+    Templates which fail to compile are logged and skipped, since they
+    fail the same way when a view renders them.
+
+    Returns:
+        int: the number of compiled templates.
+    """
+    start = time.perf_counter()
+    compiled = 0
+
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+
+        for name in template_names(engine):
+            try:
+                engine.get_template(name)
+            except (TemplateDoesNotExist, TemplateSyntaxError,
+                    UnicodeDecodeError) as e:
+                logger.warning('Could not compile template %s: %s', name, e)
+            else:
+                compiled += 1
+
+    logger.info('Compiled %d templates in %.0f ms.', compiled,
+                (time.perf_counter() - start) * 1000)
+    return compiled
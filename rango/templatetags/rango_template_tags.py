@@ -1,8 +1,54 @@
 from django import template
+from rango.assets import asset_paths
 from rango.models import Category
 
 register = template.Library()
 
 @register.inclusion_tag('rango/cats.html')
 def get_category_list(cat=None):
-    return{'cats': Category.objects.all(), 'act_cat': cat}
\ No newline at end of file
+    return{'cats': Category.objects.all(), 'act_cat': cat}
+
+
+def variant_srcset(storage, variants, size, extension):
+    """
+    Builds the srcset of one format of a profile picture displayed at
+    'size' pixels, with a 2x candidate for high density screens when a
+    large enough variant exists.
+    """
+    sizes = sorted(int(variant) for variant in variants)
+    one = next((s for s in sizes if s >= size), sizes[-1])
+    two = next((s for s in sizes if s >= 2 * size), None)
+
+    srcset = storage.url(variants[str(one)][extension])
+    if two is not None and two != one:
+        srcset += ', %s 2x' % storage.url(variants[str(two)][extension])
+    return storage.url(variants[str(one)][extension]), srcset
+
+
+@register.inclusion_tag('rango/profile_picture.html')
+def profile_picture(profile, size):
+    """
+    Renders a profile picture at 'size' pixels from its pre-sized
+    thumbnails, offering WebP with a JPEG fallback. Profiles without a
+    picture, or whose thumbnails are still being generated, show a
+    placeholder.
+    """
+    context = {'size': size, 'alt': profile.user.username}
+
+    if profile.picture_variants:
+        storage = profile.picture.storage
+        context['webp_srcset'] = variant_srcset(
+            storage, profile.picture_variants, size, 'webp')[1]
+        context['src'], context['srcset'] = variant_srcset(
+            storage, profile.picture_variants, size, 'jpg')
+    return context
+
+
+@register.inclusion_tag('rango/assets.html')
+def assets(name):
+    """
+    Renders the <link> or <script> tags of a bundle of
+    settings.RANGO_ASSET_BUNDLES: one tag for the built, content-hashed
+    file, or one per source file when build_assets has not run.
+    """
+    return {'paths': asset_paths(name), 'css': name.endswith('.css')}
@@ -1,6 +1,98 @@
+import gzip
+import hashlib
+import json
+import math
+import os
+import shutil
+import tempfile
+import warnings
+from datetime import timedelta
+from importlib import import_module
+from io import BytesIO
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.http import StreamingHttpResponse
+from django.template import engines
+from django.test import Client
+from django.test import RequestFactory
 from django.test import TestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rango import analytics
+from rango.admin import CategoryAdmin
+from rango.assets import minify_css
+from rango.api.v1.authentication import make_api_key
+from rango.api.v1.views import CategoryDetail
+from rango.bloom import RotatingBloomFilter
+from rango.bots import UserAgentClassifier
+from rango.bots import bot_classifier
+from rango.checks import check_session_cache
+from rango.checks import check_throttle_cache
+from rango.compression import brotli
+from rango.compression import negotiate
+from rango.counters import PageViewCounter
+from rango.forms import UserProfileForm
+from rango.fragments import expire_page_lists
+from rango.fragments import page_list_version
+from rango.hyperloglog import HyperLogLog
+from rango.middleware import AnonymousPageCacheMiddleware
+from rango.middleware import CompressionMiddleware
 from rango.models import Category
+from rango.models import CategoryDeletion
+from rango.models import DailyPageViews
+from rango.models import HourlyPageViews
+from rango.models import Page
+from rango.models import PageViewEvent
+from rango.models import UserProfile
+from rango.models import UniqueVisitorCounter
+from rango.page_cache import cache_page
+from rango.redirects import get_page_url
+from rango.redirects import page_urls
+from rango.tasks import delete_category
+from rango.template_cache import compile_templates
+from rango.throttling import TokenBucket
+from rango.thumbnails import get_image_pool
+from rango.thumbnails import render_variants
+from rango.thumbnails import save_variants
+from rango import trending
+from rango.visitors import UniqueVisitorTracker
+from rango.visitors import recent_page_views
+from rango.visitors import unique_visitors
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+
+# Flush timers started by a test would fire during later tests and
+# write to the test database from another thread, so none are started.
+timer_patches = [mock.patch('rango.counters.submit_later'),
+                 mock.patch('rango.visitors.submit_later')]
+
+
+def setUpModule():
+    for patch in timer_patches:
+        patch.start()
+
+
+def tearDownModule():
+    for patch in timer_patches:
+        patch.stop()
+
+    # Visits the views added are flushed at exit otherwise, when the
+    # test database is gone.
+    with unique_visitors.lock:
+        unique_visitors.pending.clear()
 
 
 class CategoryMethodTests(TestCase):
@@ -16,8 +108,1376 @@ class CategoryMethodTests(TestCase):
 
 
 class IndexViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
     def test_index_view_with_no_categories(self):
         response = self.client.get(reverse('index'))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'There are no categories present.')
         self.assertQuerySetEqual(response.context['categories'], [])
+
+
+class PageApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='secret')
+        self.python = Category.objects.create(name='Python')
+        self.django = Category.objects.create(name='Django')
+        for views in (5, 50, 10):
+            Page.objects.create(category=self.python, title='py %d' % views,
+                                url='http://example.com/%d' % views,
+                                views=views, added_by=self.user)
+        Page.objects.create(category=self.django, title='dj', views=7,
+                            url='http://example.com/dj')
+
+    def test_page_list_is_cursor_paginated_newest_first(self):
+        response = self.client.get('/api/Page/', {'page_size': 3})
+        self.assertEqual([p['views'] for p in response.json()['results']],
+                         [7, 10, 50])
+        response = self.client.get(response.json()['next'])
+        self.assertEqual([p['views'] for p in response.json()['results']],
+                         [5])
+
+    def test_page_list_is_cursor_paginated_by_views(self):
+        response = self.client.get('/api/Page/', {'page_size': 2,
+                                                  'ordering': '-views'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['views'] for p in response.json()['results']],
+                         [50, 10])
+        response = self.client.get(response.json()['next'])
+        self.assertEqual([p['views'] for p in response.json()['results']],
+                         [7, 5])
+        self.assertIsNone(response.json()['next'])
+
+    def test_page_list_filters(self):
+        response = self.client.get('/api/Page/', {'added_by': 'alice',
+                                                  'min_views': 6,
+                                                  'max_views': 20})
+        self.assertEqual([p['title'] for p in response.json()['results']],
+                         ['py 10'])
+        response = self.client.get('/api/Page/', {'min_views': 'many'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_category_page_list(self):
+        response = self.client.get(
+            '/api/Category/details/%d/Page/' % self.django.id)
+        results = response.json()['results']
+        self.assertEqual([p['category_slug'] for p in results], ['django'])
+        response = self.client.get('/api/Category/details/999/Page/')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(RANGO_THROTTLE_RATES={
+    'api': {'capacity': 2, 'refill_rate': 0.5},
+    'ajax': {'capacity': 1, 'refill_rate': 0.1}})
+class ThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_token_bucket_refills(self):
+        bucket = TokenBucket('test', capacity=1, refill_rate=0.5)
+        self.assertEqual(bucket.consume('client', now=100), (True, 0))
+        self.assertEqual(bucket.consume('client', now=101), (False, 1.0))
+        self.assertEqual(bucket.consume('client', now=102), (True, 0))
+
+    def test_locked_bucket_is_not_spent_twice(self):
+        bucket = TokenBucket('test', capacity=5, refill_rate=1)
+        bucket.lock_attempts = 1
+        cache.add('rango:throttle:test:client:lock', 1)
+        self.assertEqual(bucket.consume('client', now=100),
+                         (False, bucket.lock_timeout))
+
+        cache.delete('rango:throttle:test:client:lock')
+        self.assertEqual(bucket.consume('client', now=100), (True, 0))
+        self.assertIsNone(cache.get('rango:throttle:test:client:lock'))
+
+    @override_settings(DEBUG=False, RANGO_THROTTLE_CACHE='default')
+    def test_process_local_throttle_cache_is_reported(self):
+        self.assertEqual([error.id for error in check_throttle_cache(None)],
+                         ['rango.W001'])
+
+    def test_forwarded_for_does_not_pick_the_bucket(self):
+        for address in ('1.1.1.1', '2.2.2.2'):
+            self.assertEqual(self.client.get(
+                '/api/Page/', HTTP_X_FORWARDED_FOR=address).status_code,
+                200)
+        response = self.client.get('/api/Page/',
+                                   HTTP_X_FORWARDED_FOR='3.3.3.3')
+        self.assertEqual(response.status_code, 429)
+
+    def test_api_is_throttled_per_ip(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get('/api/Page/').status_code, 200)
+        response = self.client.get('/api/Page/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '2')
+        response = self.client.get('/api/Page/', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, 200)
+
+    def test_ajax_is_throttled_per_user(self):
+        User.objects.create_user('bob', password='secret')
+        self.client.login(username='bob', password='secret')
+        url = reverse('suggest_category')
+        self.assertEqual(self.client.get(url, {'suggestion': 'p'})
+                         .status_code, 200)
+        response = self.client.get(url, {'suggestion': 'p'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '10')
+
+
+class ApiAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('carol', password='secret')
+
+    def test_signed_key_skips_session(self):
+        key = make_api_key(self.user)
+        self.client.cookies['sessionid'] = 'not-a-session'
+        # The user and the categories, but no django_session lookup.
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/Category/',
+                                       HTTP_AUTHORIZATION='Key ' + key)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.user, self.user)
+        self.assertFalse(hasattr(response.wsgi_request, 'session'))
+
+    def test_invalid_key_is_rejected(self):
+        response = self.client.get('/api/Category/',
+                                   HTTP_AUTHORIZATION='Key forged')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Key')
+
+
+class CategoryDetailConcurrencyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Python', likes=3)
+        self.url = '/api/Category/details/%d' % self.category.id
+
+    def test_get_returns_version_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['ETag'], '"0"')
+
+    def test_stale_if_match_is_rejected(self):
+        response = self.client.put(self.url, {'name': 'Python 3'},
+                                   content_type='application/json',
+                                   HTTP_IF_MATCH='"0"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"1"')
+        response = self.client.put(self.url, {'name': 'Python 2'},
+                                   content_type='application/json',
+                                   HTTP_IF_MATCH='"0"')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response['ETag'], '"1"')
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.name, 'Python 3')
+
+    def test_update_racing_another_write_is_rejected(self):
+        # Both requests read version 0, the other one wrote first.
+        stale = Category.objects.get(id=self.category.id)
+        Category.objects.filter(id=self.category.id).update(
+            name='Snakes', version=1)
+        fresh = Category.objects.get(id=self.category.id)
+        with mock.patch.object(CategoryDetail, 'get_object',
+                               side_effect=[stale, fresh]):
+            response = self.client.put(self.url, {'name': 'Python 3'},
+                                       content_type='application/json',
+                                       HTTP_IF_MATCH='"0"')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response['ETag'], '"1"')
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.name, 'Snakes')
+
+    def test_patch_writes_only_changed_fields(self):
+        Category.objects.filter(id=self.category.id).update(likes=10)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.url, {'name': 'Snakes'},
+                                         content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        update = [q['sql'] for q in queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(update), 1)
+        self.assertNotIn('likes', update[0])
+        self.category.refresh_from_db()
+        self.assertEqual((self.category.slug, self.category.likes,
+                          self.category.version), ('snakes', 10, 1))
+
+    def test_likes_increment_in_the_database_and_bump_the_version(self):
+        user = User.objects.create_user('alice', password='secret')
+        UserProfile.objects.create(user=user)
+        self.client.login(username='alice', password='secret')
+        # Another request liked the category since it was loaded.
+        Category.objects.filter(id=self.category.id).update(likes=10)
+
+        response = self.client.get(reverse('like_category'),
+                                   {'category_id': self.category.id})
+        self.assertEqual(response.content, b'11')
+        self.category.refresh_from_db()
+        self.assertEqual((self.category.likes, self.category.version),
+                         (11, 1))
+
+    def test_admin_changes_bump_the_version(self):
+        request = RequestFactory().post('/')
+        self.category.name = 'Snakes'
+        CategoryAdmin(Category, admin.site).save_model(
+            request, self.category, None, change=True)
+        self.assertEqual(self.category.version, 1)
+        self.assertEqual(self.client.get(self.url)['ETag'], '"1"')
+
+
+@override_settings(RANGO_DELETION_BATCH_SIZE=2,
+                   RANGO_DELETION_BATCH_PAUSE=0)
+class CategoryDeletionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Python')
+        for i in range(5):
+            Page.objects.create(category=self.category, title='p%d' % i,
+                                url='http://example.com/%d' % i)
+
+    def test_delete_hides_category_and_answers_202(self):
+        with mock.patch('rango.tasks.submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.delete(
+                    '/api/Category/details/%d' % self.category.id)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Location'], response.json()['status_url'])
+        self.assertFalse(Category.objects.filter(name='Python').exists())
+        self.assertEqual(Page.objects.count(), 5)
+        self.assertTrue(submit.called)
+        Category.objects.create(name='Python')
+
+        status_response = self.client.get(response['Location'])
+        self.assertEqual(status_response.json()['status'], 'pending')
+
+    def test_pages_of_a_deleted_category_are_hidden(self):
+        page = Page.objects.first()
+        page.views = 100
+        page.trending_score = 1
+        page.save()
+        with mock.patch('rango.tasks.submit'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(
+                    '/api/Category/details/%d' % self.category.id)
+
+        self.assertEqual(self.client.get('/api/Page/').json()['results'],
+                         [])
+        self.assertEqual(self.client.get(
+            '/api/Page/details/%d' % page.id).status_code, 404)
+        response = self.client.get(reverse('index'))
+        self.assertEqual(list(response.context['pages']), [])
+        self.assertEqual(list(response.context['trending_pages']), [])
+
+    @override_settings(RANGO_TASKS_EAGER=True)
+    def test_pages_are_deleted_in_batches(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(
+                '/api/Category/details/%d' % self.category.id)
+        data = self.client.get(response['Location']).json()
+        self.assertEqual((data['status'], data['pages_deleted']),
+                         ('done', 5))
+        self.assertFalse(Page.objects.exists())
+        self.assertFalse(Category.all_objects.exists())
+
+    def test_interrupted_deletions_are_resumed(self):
+        with mock.patch('rango.tasks.submit'):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.delete(
+                    '/api/Category/details/%d' % self.category.id)
+
+        out = StringIO()
+        call_command('resume_category_deletions', stdout=out)
+        self.assertIn('Finished 1 category deletions', out.getvalue())
+        data = self.client.get(response['Location']).json()
+        self.assertEqual((data['status'], data['pages_deleted']),
+                         ('done', 5))
+        self.assertFalse(Category.all_objects.exists())
+
+    def test_put_cannot_hide_a_category(self):
+        response = self.client.put(
+            '/api/Category/details/%d' % self.category.id,
+            {'name': 'Python', 'is_deleted': True},
+            content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.category.refresh_from_db()
+        self.assertFalse(self.category.is_deleted)
+
+
+@override_settings(
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+class VisitorTrackingTests(TestCase):
+    def session_writes(self, queries):
+        return [q['sql'] for q in queries
+                if 'django_session' in q['sql']
+                and not q['sql'].startswith('SELECT')]
+
+    @override_settings(RANGO_VISITOR_TRACKING='session')
+    def test_session_is_written_once_a_day(self):
+        # Anonymous visits the page cache may answer are not tracked in
+        # the session.
+        self.client.force_login(User.objects.create_user('alice'))
+        with mock.patch('rango.views.time.time', return_value=1000):
+            self.client.get(reverse('index'))
+        self.assertEqual(self.client.session['visits'], 1)
+
+        with mock.patch('rango.views.time.time', return_value=2000):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse('index'))
+        self.assertEqual(self.session_writes(queries), [])
+
+        with mock.patch('rango.views.time.time', return_value=90000):
+            self.client.get(reverse('index'))
+        self.assertEqual(self.client.session['visits'], 2)
+        self.assertEqual(self.client.session['last_visit'], 90000)
+
+    @override_settings(RANGO_VISITOR_TRACKING='cookie')
+    def test_cookie_mode_never_touches_the_session(self):
+        with CaptureQueriesContext(connection) as queries:
+            with mock.patch('rango.views.time.time', return_value=1000):
+                self.client.get(reverse('index'))
+            with mock.patch('rango.views.time.time', return_value=90000):
+                response = self.client.get(reverse('index'))
+        self.assertFalse([q for q in queries
+                          if 'django_session' in q['sql']])
+        self.assertEqual(response.cookies['visits'].value.split(':')[0],
+                         '2')
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+class PurgeSessionsCommandTests(TestCase):
+    def test_expired_sessions_are_deleted_in_batches(self):
+        now = timezone.now()
+        for i in range(5):
+            Session.objects.create(session_key='expired%d' % i,
+                                   session_data='',
+                                   expire_date=now - timedelta(days=1))
+        Session.objects.create(session_key='valid', session_data='',
+                               expire_date=now + timedelta(days=1))
+        out = StringIO()
+        call_command('purge_sessions', batch_size=2, pause=0, stdout=out)
+        self.assertIn('Deleted 5 expired sessions.', out.getvalue())
+        self.assertEqual(list(Session.objects.values_list('session_key',
+                                                          flat=True)),
+                         ['valid'])
+
+    def test_expired_file_sessions_are_deleted(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        with override_settings(
+                SESSION_ENGINE='django.contrib.sessions.backends.file',
+                SESSION_FILE_PATH=path):
+            engine = import_module(settings.SESSION_ENGINE)
+            expired = engine.SessionStore()
+            expired.set_expiry(-1)
+            expired.create()
+            valid = engine.SessionStore()
+            valid.create()
+            call_command('purge_sessions', stdout=StringIO())
+            self.assertFalse(engine.SessionStore().exists(
+                expired.session_key))
+            self.assertTrue(engine.SessionStore().exists(valid.session_key))
+
+
+class SessionCacheCheckTests(TestCase):
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_cached_db_sessions_need_a_shared_cache(self):
+        locmem = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        with override_settings(CACHES=dict(settings.CACHES,
+                                           sessions=locmem)):
+            errors = check_session_cache(None)
+        self.assertEqual([error.id for error in errors], ['rango.E001'])
+
+        redis = {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                 'LOCATION': 'redis://127.0.0.1:6379/1'}
+        with override_settings(CACHES=dict(settings.CACHES, sessions=redis)):
+            self.assertEqual(check_session_cache(None), [])
+
+
+class HyperLogLogTests(TestCase):
+    def test_estimate_and_merge(self):
+        first, second = HyperLogLog(), HyperLogLog()
+        for i in range(20000):
+            first.add('visitor %d' % i)
+            second.add('visitor %d' % (i + 10000))
+        self.assertAlmostEqual(first.count(), 20000, delta=20000 * 0.05)
+        first.merge(second)
+        self.assertAlmostEqual(first.count(), 30000, delta=30000 * 0.05)
+        self.assertEqual(len(first.to_bytes()), 2048)
+
+    def test_small_counts_are_exact_enough(self):
+        hll = HyperLogLog()
+        for i in range(3):
+            hll.add('visitor %d' % i)
+            hll.add('visitor %d' % i)
+        self.assertEqual(hll.count(), 3)
+
+
+class UniqueVisitorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tracker = UniqueVisitorTracker()
+        self.category = Category.objects.create(name='Python')
+
+    def test_flush_merges_with_stored_counters(self):
+        kind = UniqueVisitorCounter.CATEGORY
+        for visitor in ('a', 'b', 'a'):
+            self.tracker.add(kind, self.category.id, visitor)
+        self.tracker.flush()
+        self.tracker.add(kind, self.category.id, 'c')
+        self.assertEqual(self.tracker.counts(kind, [self.category.id]),
+                         {self.category.id: 3})
+        self.tracker.flush()
+        self.tracker.add(kind, self.category.id, 'b')
+        self.tracker.flush()
+        self.assertEqual(UniqueVisitorCounter.objects.count(), 1)
+        self.assertEqual(self.tracker.counts(kind, [self.category.id]),
+                         {self.category.id: 3})
+
+    def test_flush_merges_a_counter_inserted_concurrently(self):
+        kind = UniqueVisitorCounter.CATEGORY
+        today = timezone.now().date()
+        other = UniqueVisitorTracker()
+        other.add(kind, self.category.id, 'a')
+        other.flush()
+        hll = HyperLogLog()
+        hll.add('b')
+        self.tracker.create([UniqueVisitorCounter(
+            kind=kind, object_id=self.category.id, day=today,
+            registers=hll.to_bytes())])
+        self.assertEqual(UniqueVisitorCounter.objects.count(), 1)
+        self.assertEqual(self.tracker.counts(kind, [self.category.id]),
+                         {self.category.id: 2})
+
+    def test_counts_skip_objects_without_visits(self):
+        kind = UniqueVisitorCounter.CATEGORY
+        with mock.patch.object(HyperLogLog, 'count') as count:
+            self.assertEqual(self.tracker.counts(kind, [self.category.id]),
+                             {self.category.id: 0})
+        count.assert_not_called()
+
+    def test_counts_are_cached(self):
+        kind = UniqueVisitorCounter.CATEGORY
+        self.tracker.add(kind, self.category.id, 'a')
+        self.assertEqual(self.tracker.counts(kind, [self.category.id]),
+                         {self.category.id: 1})
+        self.tracker.add(kind, self.category.id, 'b')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.tracker.counts(kind, [self.category.id]),
+                             {self.category.id: 1})
+        cache.clear()
+        self.assertEqual(self.tracker.counts(kind, [self.category.id]),
+                         {self.category.id: 2})
+
+    @override_settings(RANGO_UNIQUE_VISITORS_FLUSH_INTERVAL=60)
+    def test_pending_visits_are_flushed_by_a_timer(self):
+        kind = UniqueVisitorCounter.CATEGORY
+        with mock.patch('rango.visitors.submit_later') as submit_later:
+            self.tracker.add(kind, self.category.id, 'a')
+            self.tracker.add(kind, self.category.id, 'b')
+        submit_later.assert_called_once_with(60, self.tracker.flush)
+
+        timer = self.tracker.timer
+        self.tracker.flush()
+        timer.cancel.assert_called_once_with()
+        self.assertEqual(UniqueVisitorCounter.objects.count(), 1)
+
+    def test_category_page_and_api_show_unique_visitors(self):
+        with mock.patch('rango.views.unique_visitors', self.tracker), \
+                mock.patch('rango.api.v1.views.unique_visitors',
+                           self.tracker):
+            response = self.client.get(
+                reverse('show_category', args=['python']))
+            self.assertEqual(response.context['unique_visitors'], 1)
+            response = self.client.get(
+                '/api/Category/details/%d' % self.category.id)
+            self.assertEqual(response.json()['unique_visitors'], 1)
+
+
+class ViewDeduplicationTests(TestCase):
+    def test_rotating_bloom_filter_forgets_after_window(self):
+        seen = RotatingBloomFilter(capacity=100, error_rate=0.01, window=60)
+        start = seen.rotated_at
+        self.assertFalse(seen.check_and_add('a', now=start))
+        self.assertTrue(seen.check_and_add('a', now=start + 30))
+        self.assertTrue(seen.check_and_add('a', now=start + 70))
+        self.assertFalse(seen.check_and_add('a', now=start + 130))
+
+    def test_filter_follows_its_settings(self):
+        with override_settings(RANGO_VIEW_DEDUP_WINDOW=5):
+            self.assertEqual(recent_page_views.window, 5)
+        self.assertEqual(recent_page_views.window,
+                         settings.RANGO_VIEW_DEDUP_WINDOW)
+
+    def test_repeat_clicks_count_once(self):
+        category = Category.objects.create(name='Python')
+        page = Page.objects.create(category=category, title='Docs',
+                                   url='http://docs.python.org/')
+        recent = RotatingBloomFilter(capacity=100, error_rate=0.01,
+                                     window=60)
+        counter = PageViewCounter()
+        with mock.patch('rango.views.recent_page_views', recent), \
+                mock.patch('rango.views.page_views', counter):
+            for _ in range(3):
+                response = self.client.get(reverse('goto'),
+                                           {'page_id': page.id})
+            self.client.get(reverse('goto'), {'page_id': page.id},
+                            HTTP_USER_AGENT='another browser')
+        self.assertRedirects(response, page.url,
+                             fetch_redirect_response=False)
+        counter.flush()
+        page.refresh_from_db()
+        self.assertEqual(page.views, 2)
+
+
+class BotFilterTests(TestCase):
+    googlebot = ('Mozilla/5.0 (compatible; Googlebot/2.1; '
+                 '+http://www.google.com/bot.html)')
+    firefox = ('Mozilla/5.0 (X11; Linux x86_64; rv:120.0) Gecko/20100101 '
+               'Firefox/120.0')
+
+    def test_classifier_caches_verdicts(self):
+        classifier = UserAgentClassifier([r'bot\b', r'curl/'], cache_size=2)
+        self.assertTrue(classifier.is_bot_user_agent(self.googlebot))
+        self.assertTrue(classifier.is_bot_user_agent('curl/8.0'))
+        self.assertFalse(classifier.is_bot_user_agent(self.firefox))
+        self.assertFalse(classifier.is_bot_user_agent(self.firefox))
+        self.assertEqual(len(classifier.verdicts), 2)
+        self.assertEqual(classifier.verdicts.hits, 1)
+
+    def test_classifier_follows_its_settings(self):
+        with override_settings(RANGO_BOT_USER_AGENT_PATTERNS=[r'Firefox/']):
+            self.assertTrue(bot_classifier.is_bot_user_agent(self.firefox))
+        self.assertFalse(bot_classifier.is_bot_user_agent(self.firefox))
+
+    def test_bots_skip_counters_and_are_reported(self):
+        cache.clear()
+        page = Page.objects.create(
+            category=Category.objects.create(name='Python'), title='Docs',
+            url='http://docs.python.org/')
+        classifier = UserAgentClassifier([r'bot\b'])
+        counter = PageViewCounter()
+        with mock.patch('rango.views.bot_classifier', classifier), \
+                mock.patch('rango.api.v1.views.bot_classifier', classifier), \
+                mock.patch('rango.views.page_views', counter):
+            self.client.get(reverse('goto'), {'page_id': page.id},
+                            HTTP_USER_AGENT=self.googlebot)
+            self.client.get(reverse('index'), HTTP_USER_AGENT=self.googlebot)
+            self.assertNotIn('visits', self.client.session)
+            self.client.get(reverse('goto'), {'page_id': page.id},
+                            HTTP_USER_AGENT=self.firefox)
+
+            admin = User.objects.create_superuser('admin', password='secret')
+            response = self.client.get(
+                '/api/metrics/',
+                HTTP_AUTHORIZATION='Key ' + make_api_key(admin))
+        counter.flush()
+        page.refresh_from_db()
+        self.assertEqual(page.views, 1)
+        self.assertEqual(response.json()['bot_filter']['filtered'], 2)
+        self.assertAlmostEqual(
+            response.json()['bot_filter']['filtered_ratio'], 2 / 3)
+
+
+
+class RedirectCacheTests(TestCase):
+    def setUp(self):
+        page_urls.clear()
+        self.page = Page.objects.create(
+            category=Category.objects.create(name='Python'), title='Docs',
+            url='http://docs.python.org/')
+
+    def test_cached_redirect_does_not_query(self):
+        counter = PageViewCounter()
+        with mock.patch('rango.views.page_views', counter):
+            self.client.get(reverse('goto'), {'page_id': self.page.id})
+            with self.assertNumQueries(0):
+                response = self.client.get(reverse('goto'),
+                                           {'page_id': self.page.id},
+                                           HTTP_USER_AGENT='other')
+        self.assertEqual(response['Location'], 'http://docs.python.org/')
+        self.assertEqual(counter.pending[self.page.id], 2)
+
+        self.assertEqual(counter.flush(), {self.page.id: 2})
+        self.page.refresh_from_db()
+        self.assertEqual(self.page.views, 2)
+
+    def test_cache_is_invalidated_on_save_and_delete(self):
+        self.assertEqual(get_page_url(self.page.id), 'http://docs.python.org/')
+        self.page.url = 'http://python.org/'
+        self.page.save()
+        self.assertEqual(get_page_url(self.page.id), 'http://python.org/')
+        self.page.delete()
+        self.assertIsNone(get_page_url(self.page.id))
+
+    def test_out_of_range_page_ids_redirect_to_the_index(self):
+        for page_id in (0, -1, 2 ** 63, 10 ** 30):
+            response = self.client.get(reverse('goto'), {'page_id': page_id})
+            self.assertEqual(response['Location'], '/rango/')
+
+    @override_settings(RANGO_PAGE_VIEWS_FLUSH_INTERVAL=60)
+    def test_pending_views_are_flushed_by_a_timer(self):
+        counter = PageViewCounter()
+        with mock.patch('rango.counters.submit_later') as submit_later:
+            counter.incr(self.page.id)
+            counter.incr(self.page.id)
+        submit_later.assert_called_once_with(60, counter.flush)
+
+        counter.timer = mock.Mock()
+        timer = counter.timer
+        counter.flush()
+        timer.cancel.assert_called_once_with()
+        self.assertIsNone(counter.timer)
+
+
+class ClickBeaconTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        page_urls.clear()
+        category = Category.objects.create(name='Python')
+        self.docs = Page.objects.create(category=category, title='Docs',
+                                        url='http://docs.python.org/')
+        self.pypi = Page.objects.create(category=category, title='PyPI',
+                                        url='http://pypi.org/')
+
+    def test_category_links_carry_target_url(self):
+        response = self.client.get(reverse('show_category',
+                                           args=['python']))
+        self.assertContains(response, 'data-url="http://docs.python.org/"')
+        self.assertContains(response, '?page_id=%d' % self.docs.id)
+
+    def test_batch_counts_clicks_once_per_visitor(self):
+        recent = RotatingBloomFilter(capacity=100, error_rate=0.01,
+                                     window=60)
+        counter = PageViewCounter()
+        body = {'page_ids': [self.docs.id, self.docs.id, self.pypi.id, 999,
+                             10 ** 30]}
+        with mock.patch('rango.views_ajax.recent_page_views', recent), \
+                mock.patch('rango.views_ajax.page_views', counter):
+            response = self.client.post(reverse('track_clicks'), body,
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(counter.pending, {self.docs.id: 1, self.pypi.id: 1})
+
+    def test_malformed_batch_is_rejected(self):
+        response = self.client.post(reverse('track_clicks'), 'nope',
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ViewAnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Python')
+        self.docs = Page.objects.create(category=self.category, title='Docs',
+                                        url='http://docs.python.org/')
+        self.pypi = Page.objects.create(category=self.category, title='PyPI',
+                                        url='http://pypi.org/')
+        self.now = timezone.now().replace(minute=30)
+
+    def test_flush_appends_view_events(self):
+        counter = PageViewCounter()
+        counter.incr(self.docs.id, 3)
+        counter.flush()
+        event = PageViewEvent.objects.get()
+        self.assertEqual((event.page_id, event.category_id, event.count),
+                         (self.docs.id, self.category.id, 3))
+
+    def test_compaction_rolls_up_and_deletes_events(self):
+        analytics.record_page_views({self.docs.id: 2, self.pypi.id: 1},
+                                    now=self.now - timedelta(hours=2))
+        analytics.record_page_views({self.docs.id: 5}, now=self.now)
+        self.assertEqual(analytics.compact_view_events(batch_size=2), 3)
+        analytics.record_page_views({self.docs.id: 1}, now=self.now)
+        analytics.compact_view_events()
+
+        self.assertFalse(PageViewEvent.objects.exists())
+        self.assertEqual(HourlyPageViews.objects.count(), 3)
+        self.assertEqual(
+            DailyPageViews.objects.filter(page_id=self.docs.id).aggregate(
+                total=Sum('views'))['total'], 8)
+
+        series = analytics.view_series(analytics.HOUR, 3,
+                                       page_id=self.docs.id, now=self.now)
+        self.assertEqual([views for _, views in series], [2, 0, 6])
+        self.assertEqual(analytics.top_pages(hours=1, now=self.now),
+                         [(self.docs.id, 6)])
+        self.assertEqual(analytics.top_pages(hours=3, now=self.now),
+                         [(self.docs.id, 8), (self.pypi.id, 1)])
+
+    def test_api_serves_series_and_top_pages(self):
+        analytics.record_page_views({self.docs.id: 4, self.pypi.id: 7})
+        call_command('compact_view_events', pause=0, stdout=StringIO())
+
+        response = self.client.get(
+            '/api/Category/details/%d/views/' % self.category.id,
+            {'period': 'day', 'buckets': 2})
+        self.assertEqual([bucket['views'] for bucket in
+                          response.json()['series']], [0, 11])
+
+        response = self.client.get('/api/Page/top/', {'hours': 24})
+        self.assertEqual([(page['id'], page['recent_views']) for page in
+                          response.json()['results']],
+                         [(self.pypi.id, 7), (self.docs.id, 4)])
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Python')
+        self.old = Page.objects.create(category=self.category, title='Old',
+                                       url='http://example.com/old')
+        self.new = Page.objects.create(category=self.category, title='New',
+                                       url='http://example.com/new')
+
+    @override_settings(RANGO_TRENDING_HALF_LIFE=3600)
+    def test_recent_views_outrank_older_ones(self):
+        now = timezone.now()
+        trending.record(Page, {self.old.id: 100},
+                        now=now - timedelta(hours=8))
+        trending.record(Page, {self.new.id: 1}, now=now)
+        self.assertEqual(
+            list(Page.objects.order_by('-trending_score', '-id')),
+            [self.new, self.old])
+
+        # 100 views decayed over eight half-lives weigh 100 / 2 ** 8.
+        self.old.refresh_from_db()
+        self.new.refresh_from_db()
+        self.assertAlmostEqual(
+            self.old.trending_score - self.new.trending_score,
+            math.log(100 / 2 ** 8))
+
+    def test_flush_updates_pages_and_categories(self):
+        other = Category.objects.create(name='Django')
+        counter = PageViewCounter()
+        counter.incr(self.old.id, 3)
+        counter.flush()
+        self.old.refresh_from_db()
+        self.category.refresh_from_db()
+        self.assertGreater(self.old.trending_score, self.new.trending_score)
+        self.assertEqual(
+            list(Category.objects.order_by('-trending_score', '-id')),
+            [self.category, other])
+
+        response = self.client.get(reverse('index'))
+        self.assertEqual(list(response.context['trending_pages'])[0],
+                         self.old)
+
+    def test_add_page_ignores_a_posted_trending_score(self):
+        User.objects.create_user('alice', password='secret')
+        self.client.login(username='alice', password='secret')
+
+        response = self.client.post(
+            reverse('add_page', args=[self.category.slug]),
+            {'title': 'Boosted', 'url': 'http://example.com/',
+             'views': 0, 'trending_score': 1e9})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Page.objects.get(title='Boosted').trending_score, 0)
+
+
+class CategoryAggregateTests(TestCase):
+    def setUp(self):
+        self.python = Category.objects.create(name='Python')
+        self.django = Category.objects.create(name='Django')
+
+    def assertAggregates(self, category, page_count, total_page_views):
+        category = Category.all_objects.get(id=category.id)
+        self.assertEqual((category.page_count, category.total_page_views),
+                         (page_count, total_page_views))
+
+    def test_page_writes_and_flushes_maintain_aggregates(self):
+        page = Page.objects.create(category=self.python, title='Docs',
+                                   url='http://docs.python.org/', views=3)
+        Page.objects.create(category=self.python, title='PyPI',
+                            url='http://pypi.org/', views=1)
+        self.assertAggregates(self.python, 2, 4)
+
+        counter = PageViewCounter()
+        counter.incr(page.id, 5)
+        counter.flush()
+        self.assertAggregates(self.python, 2, 9)
+
+        page = Page.objects.get(id=page.id)
+        page.category = self.django
+        page.save()
+        self.assertAggregates(self.python, 1, 1)
+        self.assertAggregates(self.django, 1, 8)
+
+        page.delete()
+        self.assertAggregates(self.django, 0, 0)
+
+    def test_reconcile_fixes_drifted_aggregates(self):
+        Page.objects.create(category=self.python, title='Docs',
+                            url='http://docs.python.org/', views=3)
+        Category.all_objects.update(page_count=7, total_page_views=70)
+        out = StringIO()
+        call_command('reconcile_category_aggregates', batch_size=1, pause=0,
+                     stdout=out)
+        self.assertIn('Checked 2 categories, fixed 2.', out.getvalue())
+        self.assertAggregates(self.python, 1, 3)
+        self.assertAggregates(self.django, 0, 0)
+
+    def test_uncounted_pages_do_not_make_aggregates_negative(self):
+        Page.objects.bulk_create([
+            Page(category=self.python, title='Docs',
+                 url='http://docs.python.org/', views=3)])
+        Page.objects.get(title='Docs').delete()
+        self.assertAggregates(self.python, 0, 0)
+
+    @override_settings(RANGO_DELETION_BATCH_PAUSE=0)
+    def test_deleting_a_category_skips_per_page_updates(self):
+        for i in range(3):
+            Page.objects.create(category=self.python, title='p%d' % i,
+                                url='http://example.com/%d' % i)
+        deletion = CategoryDeletion.objects.create(
+            category_id=self.python.id, category_name=self.python.name)
+
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks() as callbacks:
+                delete_category(deletion.id)
+        self.assertFalse([q for q in queries
+                          if q['sql'].startswith('UPDATE "rango_category"')])
+        # Only the deleted category expires its cached pages.
+        self.assertEqual(len(callbacks), 1)
+
+
+def make_image(width, height, image_format='JPEG'):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), 'orange').save(buffer, image_format)
+    return buffer.getvalue()
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+        self.user = User.objects.create_user('alice', password='secret')
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def upload(self, name='cat.jpg', width=1200):
+        return SimpleUploadedFile(name, make_image(width, 900), 'image/jpeg')
+
+    def test_listing_shows_placeholder_until_variants_are_ready(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            profile = UserProfile.objects.create(user=self.user,
+                                                 picture=self.upload())
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(profile.picture_variants, {})
+        response = self.client.get(reverse('list_profiles'))
+        self.assertContains(response, 'images/profile-placeholder.svg')
+
+        with override_settings(RANGO_TASKS_EAGER=True):
+            callbacks[0]()
+        profile.refresh_from_db()
+        self.assertEqual(sorted(profile.picture_variants, key=int),
+                         ['64', '128', '300'])
+
+        storage = profile.picture.storage
+        with storage.open(profile.picture_variants['64']['webp']) as f:
+            self.assertEqual(Image.open(f).size, (64, 64))
+        self.assertLess(storage.size(profile.picture_variants['64']['jpg']),
+                        storage.size(profile.picture.name))
+
+        response = self.client.get(reverse('list_profiles'))
+        variants = profile.picture_variants
+        self.assertContains(response, storage.url(variants['64']['webp']))
+        self.assertContains(response,
+                            storage.url(variants['128']['webp']) + ' 2x')
+        self.assertNotContains(response, 'profile-placeholder')
+
+        # Saving without a new picture keeps the thumbnails.
+        profile = UserProfile.objects.get(id=profile.id)
+        with self.captureOnCommitCallbacks() as callbacks:
+            profile.website = 'http://example.com/'
+            profile.save()
+        self.assertEqual(callbacks, [])
+        self.assertTrue(profile.picture_variants)
+
+    def test_variants_of_a_replaced_picture_are_discarded(self):
+        profile = UserProfile.objects.create(user=self.user,
+                                             picture=self.upload())
+        first = profile.picture.name
+        profile.picture = self.upload('dog.jpg', width=1000)
+        profile.save()
+
+        rendered = render_variants(make_image(100, 100), [64], 80)
+        save_variants(profile.id, profile.picture.storage, first, rendered)
+        profile.refresh_from_db()
+        self.assertEqual(profile.picture_variants, {})
+
+    def test_image_pool_renders_in_worker_processes(self):
+        path = os.path.join(self.media_root, 'cat.jpg')
+        with open(path, 'wb') as f:
+            f.write(make_image(640, 480))
+
+        future = get_image_pool().submit(render_variants, path, [64], 80)
+        rendered = future.result(timeout=60)
+        self.assertEqual(Image.open(BytesIO(rendered['64']['jpg'])).size,
+                         (64, 64))
+
+    def test_profile_form_does_not_expose_variants(self):
+        self.assertNotIn('picture_variants', UserProfileForm().fields)
+
+    def test_command_backfills_missing_variants(self):
+        profile = UserProfile.objects.create(user=self.user)
+        name = profile.picture.storage.save(
+            'profile_images/old.png', SimpleUploadedFile(
+                'old.png', make_image(500, 500, 'PNG')))
+        UserProfile.objects.filter(id=profile.id).update(picture=name)
+
+        out = StringIO()
+        call_command('generate_thumbnails', stdout=out)
+        self.assertIn('Generated thumbnails for 1 profiles.', out.getvalue())
+        profile.refresh_from_db()
+        self.assertTrue(profile.picture.storage.exists(
+            profile.picture_variants['300']['jpg']))
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_identical_uploads_share_one_file(self):
+        data = make_image(50, 50)
+        alice = UserProfile.objects.create(
+            user=User.objects.create_user('alice'),
+            picture=SimpleUploadedFile('cat.JPG', data))
+        bob = UserProfile.objects.create(
+            user=User.objects.create_user('bob'),
+            picture=SimpleUploadedFile('cat_copy.jpg', data))
+        digest = hashlib.sha256(data).hexdigest()
+        self.assertEqual(alice.picture.name, bob.picture.name)
+        self.assertEqual(alice.picture.name, 'profile_images/%s/%s.jpg'
+                         % (digest[:2], digest))
+
+    def test_gc_deletes_only_old_unreferenced_files(self):
+        profile = UserProfile.objects.create(
+            user=User.objects.create_user('alice'),
+            picture=SimpleUploadedFile('cat.jpg', make_image(50, 50)))
+        storage = profile.picture.storage
+        orphan = storage.save('profile_images/old.jpg',
+                              SimpleUploadedFile('old.jpg', b'old'))
+
+        out = StringIO()
+        call_command('gc_media', min_age=0, pause=0, dry_run=True,
+                     stdout=out)
+        self.assertIn(orphan, out.getvalue())
+        self.assertIn('Would delete 1 unused files.', out.getvalue())
+        self.assertTrue(storage.exists(orphan))
+
+        call_command('gc_media', pause=0, stdout=StringIO())
+        self.assertTrue(storage.exists(orphan))
+
+        call_command('gc_media', min_age=0, pause=0, stdout=StringIO())
+        self.assertFalse(storage.exists(orphan))
+        self.assertTrue(storage.exists(profile.picture.name))
+
+
+class UploadLimitTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+        self.user = User.objects.create_user('alice', password='secret')
+        self.client.login(username='alice', password='secret')
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root)
+
+    @override_settings(RANGO_MAX_UPLOAD_SIZE=10 * 1024)
+    def test_oversized_upload_is_dropped_while_streaming(self):
+        picture = SimpleUploadedFile('big.png', b'\0' * 100 * 1024)
+        response = self.client.post(reverse('register_profile'),
+                                    {'website': 'example.com',
+                                     'picture': picture})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('picture', response.wsgi_request.upload_errors)
+        self.assertFormError(response.context['form'], 'picture',
+                             'The file is larger than 10.0\xa0KB.')
+        self.assertFalse(UserProfile.objects.exists())
+
+    @override_settings(RANGO_MAX_IMAGE_PIXELS=1000 * 1000)
+    def test_pixel_limit_is_checked_from_the_header(self):
+        # A 4000x4000 PNG of one colour is a few KB on disk but 48 MB
+        # once decoded.
+        picture = SimpleUploadedFile('bomb.png',
+                                     make_image(4000, 4000, 'PNG'))
+        self.assertLess(picture.size, 100 * 1024)
+
+        with mock.patch('django.forms.ImageField.to_python') as decode:
+            form = UserProfileForm({}, {'picture': picture})
+            self.assertFalse(form.is_valid())
+        decode.assert_not_called()
+        self.assertEqual(form.errors.as_data()['picture'][0].code,
+                         'too_many_pixels')
+
+    @override_settings(RANGO_MAX_IMAGE_PIXELS=1000 * 1000)
+    def test_pixel_limit_is_checked_below_twice_the_pillow_limit(self):
+        picture = SimpleUploadedFile('wide.png',
+                                     make_image(1500, 1000, 'PNG'))
+
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000 * 1000), \
+                warnings.catch_warnings():
+            warnings.simplefilter('error')
+            form = UserProfileForm({}, {'picture': picture})
+            self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['picture'][0].code,
+                         'too_many_pixels')
+
+    def test_invalid_profile_post_shows_its_errors(self):
+        response = self.client.post(
+            reverse('profile', args=['alice']),
+            {'website': 'example.com',
+             'picture': SimpleUploadedFile('cat.png', b'not an image')})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors['picture'])
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+        self.digest = hashlib.sha256(b'0123456789').hexdigest()
+        self.name = 'profile_images/%s/%s.jpg' % (self.digest[:2],
+                                                  self.digest)
+        os.makedirs(os.path.dirname(os.path.join(self.media_root,
+                                                 self.name)))
+        with open(os.path.join(self.media_root, self.name), 'wb') as f:
+            f.write(b'0123456789')
+        self.url = '/media/' + self.name
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_hashed_files_are_immutable_and_revalidate(self):
+        response = self.client.get(self.url)
+        self.assertEqual(b''.join(response.streaming_content),
+                         b'0123456789')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Cache-Control'],
+                         'public, max-age=31536000, immutable')
+        self.assertEqual(response['ETag'], '"%s"' % self.digest)
+
+        response = self.client.get(self.url,
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, 416)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5',
+                                   HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(RANGO_MEDIA_SERVING='x-accel')
+    def test_offload_to_nginx(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'],
+                         '/protected-media/' + self.name)
+        self.assertEqual(response.content, b'')
+
+    def test_paths_outside_media_root_are_not_found(self):
+        response = self.client.get('/media/../manage.py')
+        self.assertEqual(response.status_code, 404)
+
+
+class AssetPipelineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.build_dir = tempfile.mkdtemp()
+        self.settings = override_settings(
+            RANGO_ASSET_BUILD_DIR=self.build_dir)
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.build_dir)
+
+    def test_pages_load_separate_files_until_built(self):
+        response = self.client.get(reverse('index'))
+        self.assertContains(
+            response, '/static/vendor/bootstrap/css/bootstrap.min.css')
+        self.assertContains(response, '/static/js/rango-ajax.js')
+        self.assertNotContains(response, 'https://')
+
+    def test_build_writes_hashed_precompressed_bundles(self):
+        call_command('build_assets', stdout=StringIO())
+
+        with open(os.path.join(self.build_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+        self.assertRegex(manifest['rango.js'], r'^rango\.[0-9a-f]{12}\.js$')
+
+        path = os.path.join(self.build_dir, manifest['rango.js'])
+        with open(path, 'rb') as f:
+            bundle = f.read()
+        with gzip.open(path + '.gz') as f:
+            self.assertEqual(f.read(), bundle)
+        self.assertIn(hashlib.sha256(bundle).hexdigest()[:12], path)
+        self.assertIn(b'jQuery v3', bundle)
+        self.assertIn(b'sendBeacon', bundle)
+        self.assertNotIn(b'sourceMappingURL', bundle)
+
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, '/static/build/' + manifest['rango.css'])
+        self.assertContains(response, '<script', count=1)
+
+    def test_rebuild_removes_stale_bundles(self):
+        stale = os.path.join(self.build_dir, 'rango.000000000000.js')
+        open(stale, 'w').close()
+        call_command('build_assets', stdout=StringIO())
+        self.assertFalse(os.path.exists(stale))
+
+    def test_minify_css_keeps_license_comments(self):
+        self.assertEqual(
+            minify_css('/*! MIT */\n/* note */\na > b ,\nc {\n'
+                       '  color: red;\n}'),
+            '/*! MIT */ a>b,c{color: red;}')
+
+
+class TemplateWarmupTests(TestCase):
+    @override_settings(TEMPLATES=[{
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': settings.TEMPLATES[0]['DIRS'],
+        'OPTIONS': dict(settings.TEMPLATES[0]['OPTIONS'], loaders=[
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ]),
+    }])
+    def test_compile_templates_fills_the_cached_loader(self):
+        self.assertGreater(compile_templates(), 0)
+
+        loader = engines['django'].engine.template_loaders[0]
+        self.assertIn('rango/category.html', loader.get_template_cache)
+        self.assertIn('registration/login.html', loader.get_template_cache)
+
+
+class PageListCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Python')
+        self.page = Page.objects.create(category=self.category,
+                                        title='Docs',
+                                        url='http://docs.python.org/')
+        self.url = reverse('show_category', args=[self.category.slug])
+
+    def page_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        return response, [query for query in queries
+                          if 'rango_page' in query['sql']]
+
+    def test_cached_page_list_skips_the_page_query(self):
+        response, queries = self.page_queries()
+        self.assertContains(response, 'Docs')
+        self.assertEqual(len(queries), 1)
+
+        response, queries = self.page_queries()
+        self.assertContains(response, 'Docs')
+        self.assertEqual(queries, [])
+
+    def test_page_writes_expire_the_page_list(self):
+        self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Page.objects.create(category=self.category, title='PyPI',
+                                url='http://pypi.org/')
+        self.assertContains(self.client.get(self.url), 'PyPI')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Page.objects.get(title='PyPI').delete()
+        self.assertNotContains(self.client.get(self.url), 'PyPI')
+
+    def test_flushes_expire_only_stale_page_lists(self):
+        version = page_list_version(self.category.id)
+        counter = PageViewCounter()
+
+        with override_settings(RANGO_PAGE_LIST_VIEWS_STALENESS=60):
+            counter.incr(self.page.id, 5)
+            counter.flush()
+        self.assertEqual(page_list_version(self.category.id), version)
+
+        with override_settings(RANGO_PAGE_LIST_VIEWS_STALENESS=0):
+            counter.incr(self.page.id, 5)
+            counter.flush()
+        self.assertNotEqual(page_list_version(self.category.id), version)
+        self.assertContains(self.client.get(self.url), '(10 views)')
+
+    def test_kept_back_expiry_is_applied_once_due(self):
+        version = page_list_version(self.category.id)
+        expire_page_lists([self.category.id], min_age=60)
+        self.assertEqual(page_list_version(self.category.id), version)
+
+        later = version + 61 * 10 ** 9
+        with mock.patch('rango.page_cache.time.time_ns', return_value=later):
+            self.assertEqual(page_list_version(self.category.id), later)
+            self.assertEqual(page_list_version(self.category.id), later)
+
+
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Python')
+        self.url = reverse('show_category', args=[self.category.slug])
+
+    def test_anonymous_hits_need_no_queries(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first['Cache-Control'], 'public, no-cache')
+        self.assertIn('Cookie', first['Vary'])
+
+        with mock.patch('rango.views.unique_visitors') as visitors:
+            with self.assertNumQueries(0):
+                second = self.client.get(self.url)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        visitors.add.assert_called_once_with(
+            UniqueVisitorCounter.CATEGORY, self.category.id, mock.ANY)
+
+        response = self.client.get(self.url,
+                                   HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_logged_in_users_bypass_the_cache(self):
+        self.client.get(self.url)
+        User.objects.create_user('alice', password='secret')
+        self.client.login(username='alice', password='secret')
+
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Add a Page')
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_page_and_category_changes_expire_cached_pages(self):
+        self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Page.objects.create(category=self.category, title='PyPI',
+                                url='http://pypi.org/')
+        self.assertContains(self.client.get(self.url), 'PyPI')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.filter(id=self.category.id).update(likes=7)
+            Category.objects.get(id=self.category.id).save()
+        self.assertContains(self.client.get(self.url),
+                            '<strong id="like_count">7</strong>')
+
+    def test_second_anonymous_index_get_needs_no_queries(self):
+        for tracking in ('session', 'cookie'):
+            with self.subTest(tracking=tracking), override_settings(
+                    RANGO_VISITOR_TRACKING=tracking):
+                cache.clear()
+                client = Client()
+                first = client.get(reverse('index'))
+
+                with self.assertNumQueries(0):
+                    second = client.get(reverse('index'))
+                self.assertEqual(second.content, first.content)
+                self.assertNotIn('sessionid', second.cookies)
+                self.assertEqual(tracking == 'cookie',
+                                 'visits' in first.cookies)
+
+    def test_unused_query_parameters_share_the_cached_page(self):
+        cache.clear()
+        first = self.client.get(reverse('index'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('index') + '?x=12345')
+        self.assertEqual(response.content, first.content)
+        self.assertEqual(response['ETag'], first['ETag'])
+
+    def test_responses_setting_cookies_are_not_stored(self):
+        views = []
+
+        def view(request):
+            views.append(request)
+            response = HttpResponse('<p>Hello</p>')
+            response.set_cookie('flavour', 'chocolate')
+            return cache_page(response, ['about'])
+
+        middleware = AnonymousPageCacheMiddleware(view)
+        for _ in range(2):
+            response = middleware(RequestFactory().get(reverse('about')))
+        self.assertEqual(len(views), 2)
+        self.assertIn('flavour', response.cookies)
+
+
+class CompressionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.body = b'<p>Rango says hello.</p>' * 100
+
+    def compress(self, response, accept_encoding='gzip, deflate, br'):
+        request = RequestFactory().get(
+            '/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_negotiation(self):
+        self.assertEqual(negotiate('gzip, br;q=0.5'), 'gzip')
+        self.assertEqual(negotiate('gzip;q=0, identity'), None)
+        self.assertEqual(negotiate('*'), 'br' if brotli else 'gzip')
+        if brotli is not None:
+            self.assertEqual(negotiate('gzip, deflate, br'), 'br')
+
+    def test_html_is_compressed_and_varies(self):
+        response = self.compress(HttpResponse(self.body), 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response['Content-Length'],
+                         str(len(response.content)))
+
+    def test_gzip_size_is_padded_against_breach(self):
+        sizes = {len(self.compress(HttpResponse(self.body), 'gzip').content)
+                 for _ in range(10)}
+        self.assertGreater(len(sizes), 1)
+
+    def test_private_responses_are_never_brotli_compressed(self):
+        response = HttpResponse(self.body)
+        response['Vary'] = 'Cookie'
+        response = self.compress(response)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+
+    def test_small_and_compressed_responses_are_left_alone(self):
+        response = self.compress(HttpResponse(b'<p>Hi</p>'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+        response = self.compress(HttpResponse(self.body,
+                                              content_type='image/png'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming_responses_are_compressed_incrementally(self):
+        response = self.compress(
+            StreamingHttpResponse(iter([self.body, self.body])), 'gzip')
+        chunks = list(response.streaming_content)
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(gzip.decompress(b''.join(chunks)), self.body * 2)
+
+    def test_pages_are_compressed(self):
+        response = self.client.get(reverse('about'),
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'Rango', gzip.decompress(response.content))
@@ -0,0 +1,223 @@
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from rest_framework.throttling import BaseThrottle
+
+
+class TokenBucket:
+    """
+    Token bucket whose state is kept in a Django cache backend, so all
+    workers that share the cache also share the buckets. With a
+    process-local cache every worker has its own buckets, which the
+    rango.W001 system check warns about.
+
+    A bucket is read and written under a lock taken with cache.add(),
+    which is atomic on every backend, so concurrent requests of one
+    client cannot both spend the same token.
+
+    Each key owns a bucket of at most 'capacity' tokens which refills
+    continuously at 'refill_rate' tokens per second. A request consumes
+    one token and is rejected when the bucket is empty.
+
+    Attributes:
+        scope (str): name of the bucket family, used in the cache key.
+
+        capacity (int): the maximum number of tokens, i.e. the allowed
+        burst size.
+
+        refill_rate (float): the number of tokens added per second.
+
+        cache (BaseCache): the cache backend holding the bucket state.
+    """
+    # How often and how long to wait for the lock of a bucket another
+    # request holds. A client still waiting after that is throttled.
+    lock_attempts = 20
+    lock_wait = 0.005
+
+    # The lock is dropped after this many seconds if its holder died.
+    lock_timeout = 1
+
+    def __init__(self, scope, capacity, refill_rate, cache_alias='default'):
+        """
+        Initializes the TokenBucket instance.
+
+        Args:
+            scope (str): name of the bucket family.
+
+            capacity (int): the maximum number of tokens.
+
+            refill_rate (float): the number of tokens added per second.
+
+            cache_alias (str): alias of the cache in settings.CACHES.
+        """
+        self.scope = scope
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.cache = caches[cache_alias]
+
+    def consume(self, key, now=None):
+        """
+        Takes one token from the bucket of the given key.
+
+        Args:
+            key (str): identifies the client owning the bucket.
+
+            now (float): the current time, defaults to time.time().
+
+        Returns:
+            allowed (bool): True if a token was available.
+
+            retry_after (float): seconds until the next token is
+            available, zero if the request was allowed.
+        """
+        if now is None:
+            now = time.time()
+
+        cache_key = 'rango:throttle:%s:%s' % (self.scope, key)
+        lock_key = cache_key + ':lock'
+
+        for _ in range(self.lock_attempts):
+            if self.cache.add(lock_key, 1, self.lock_timeout):
+                break
+            time.sleep(self.lock_wait)
+        else:
+            return False, self.lock_timeout
+
+        try:
+            tokens, last = self.cache.get(cache_key, (self.capacity, now))
+            tokens = min(self.capacity,
+                         tokens + max(0, now - last) * self.refill_rate)
+
+            if tokens >= 1:
+                tokens -= 1
+                allowed, retry_after = True, 0
+            else:
+                allowed = False
+                retry_after = (1 - tokens) / self.refill_rate
+
+            # An untouched bucket is full again after this long, so
+            # there is no need to keep it around any longer.
+            timeout = math.ceil(self.capacity / self.refill_rate) + 1
+            self.cache.set(cache_key, (tokens, now), timeout)
+        finally:
+            self.cache.delete(lock_key)
+
+        return allowed, retry_after
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle backed by a TokenBucket, keyed per authenticated user and
+    per IP address for anonymous clients.
+
+    It is a Django REST framework throttle class, but it only needs
+    request.user and request.META, so ThrottleMixin also uses it for
+    plain Django views.
+
+    Attributes:
+        scope (str): the key of settings.RANGO_THROTTLE_RATES holding
+        the capacity and refill rate of the buckets.
+    """
+    scope = None
+
+    def __init__(self):
+        """
+        Initializes the throttle with the bucket settings of its scope.
+        """
+        rate = settings.RANGO_THROTTLE_RATES[self.scope]
+        self.bucket = TokenBucket(self.scope, rate['capacity'],
+                                  rate['refill_rate'],
+                                  settings.RANGO_THROTTLE_CACHE)
+        self.retry_after = None
+
+    def get_cache_key(self, request):
+        """
+        Gets the client key of the request.
+
+        Args:
+            request (HttpRequest): the request object.
+
+        Returns:
+            str: 'user:<pk>' for authenticated users and 'ip:<address>'
+            for everybody else.
+        """
+        user = getattr(request, 'user', None)
+
+        if user is not None and user.is_authenticated:
+            return 'user:%s' % user.pk
+        # Not get_ident(), which trusts any X-Forwarded-For header
+        # unless NUM_PROXIES is set, so a client could pick a fresh
+        # bucket per request. Behind a proxy, REMOTE_ADDR is set by
+        # the server from the header the proxy appends.
+        return 'ip:%s' % request.META.get('REMOTE_ADDR', '')
+
+    def allow_request(self, request, view):
+        """
+        Checks whether the request may proceed.
+
+        Args:
+            request (HttpRequest): the request object.
+
+            view (View): the view handling the request.
+
+        Returns:
+            bool: True if the client still had a token.
+        """
+        allowed, self.retry_after = self.bucket.consume(
+            self.get_cache_key(request))
+        return allowed
+
+    def wait(self):
+        """
+        Returns:
+            float: the number of seconds the client should wait before
+            retrying.
+        """
+        return self.retry_after
+
+
+class ApiThrottle(TokenBucketThrottle):
+    scope = 'api'
+
+
+class AjaxThrottle(TokenBucketThrottle):
+    scope = 'ajax'
+
+
+class BeaconThrottle(TokenBucketThrottle):
+    scope = 'beacon'
+
+
+class ThrottleMixin:
+    """
+    Mixin for Django class-based views which answers 429 Too Many
+    Requests with a Retry-After header once the client runs out of
+    tokens.
+
+    Attributes:
+        throttle_class (TokenBucketThrottle): the throttle applied to
+        every request of the view.
+    """
+    throttle_class = AjaxThrottle
+
+    def dispatch(self, request, *args, **kwargs):
+        """
+        Checks the throttle before dispatching the request.
+
+        Args:
+            request (HttpRequest): the request object.
+
+        Returns:
+            HttpResponse: 429 response if throttled, otherwise the
+            response of the view.
+        """
+        throttle = self.throttle_class()
+
+        if not throttle.allow_request(request, self):
+            response = HttpResponse('Request was throttled.', status=429)
+            response['Retry-After'] = str(math.ceil(throttle.wait()))
+            return response
+        return super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,252 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image
+from PIL import ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Pillow format name and file extension of each variant encoding. Every
+# size is stored in all of them, so templates can offer WebP and fall
+# back to JPEG.
+FORMATS = [('WEBP', 'webp'), ('JPEG', 'jpg')]
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def variant_name(name, size, extension):
+    """
+    Gets the storage name of one variant of a picture.
+
+    Args:
+        name (str): the storage name of the original picture.
+
+        size (int): the width and height of the variant.
+
+        extension (str): the file extension of the variant.
+
+    Returns:
+        str: e.g. 'profile_images/thumbs/cat_64.webp' for
+        'profile_images/cat.jpg'.
+    """
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'thumbs',
+                        '%s_%d.%s' % (stem, size, extension))
+
+
+def render_variants(source, sizes, quality):
+    """
+    Encodes square thumbnails of an image in every size and format.
+
+    It only uses Pillow, not Django, so it can run in the image worker
+    processes. The original is decoded once. For JPEGs, draft() lets
+    the decoder scale down by up to 8x while decoding, which is much
+    cheaper than decoding the full image and resizing it afterwards.
+
+    Args:
+        source (str or bytes): the path of the original image file, or
+        its content.
+
+        sizes (list): the widths and heights of the thumbnails.
+
+        quality (int): the encoder quality.
+
+    Returns:
+        dict: the encoded files by size and extension, e.g.
+        {'64': {'webp': b'...', 'jpg': b'...'}, ...}.
+    """
+    sizes = sorted(sizes)
+    rendered = {}
+
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+
+    with Image.open(source) as original:
+        original.draft('RGB', (sizes[-1], sizes[-1]))
+        image = ImageOps.exif_transpose(original).convert('RGB')
+
+    # Resizing from the largest variant down is cheaper than resizing
+    # every variant from the original and looks the same at these sizes.
+    for size in reversed(sizes):
+        image = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        rendered[str(size)] = {}
+
+        for image_format, extension in FORMATS:
+            buffer = BytesIO()
+            image.save(buffer, image_format, quality=quality, optimize=True)
+            rendered[str(size)][extension] = buffer.getvalue()
+
+    return rendered
+
+
+def store_variants(storage, name, rendered):
+    """
+    Saves encoded thumbnails next to their original.
+
+    Args:
+        storage (Storage): the storage holding the original.
+
+        name (str): the storage name of the original.
+
+        rendered (dict): the files returned by render_variants().
+
+    Returns:
+        dict: the storage names by size and extension.
+    """
+    variants = {}
+
+    for size, files in rendered.items():
+        variants[size] = {}
+
+        for extension, content in files.items():
+            variant = variant_name(name, int(size), extension)
+
+            if (storage.exists(variant)
+                    and not getattr(storage, 'content_addressed', False)):
+                storage.delete(variant)
+            variants[size][extension] = storage.save(
+                variant, ContentFile(content))
+
+    return variants
+
+
+def generate_variants(picture):
+    """
+    Creates the thumbnails of a picture in the calling thread, in every
+    size of settings.RANGO_THUMBNAIL_SIZES and every format of FORMATS.
+
+    Args:
+        picture (FieldFile): the stored original picture.
+
+    Returns:
+        dict: the storage names by size and extension.
+    """
+    with picture.open('rb'):
+        data = picture.read()
+
+    return store_variants(picture.storage, picture.name, render_variants(
+        data, settings.RANGO_THUMBNAIL_SIZES,
+        settings.RANGO_THUMBNAIL_QUALITY))
+
+
+def delete_variants(storage, variants):
+    """
+    Deletes the stored thumbnails of a picture. Content-addressed
+    files may be shared with other pictures, so they are left to the
+    gc_media command instead.
+
+    Args:
+        storage (Storage): the storage holding the thumbnails.
+
+        variants (dict): the names returned by generate_variants().
+    """
+    if getattr(storage, 'content_addressed', False):
+        return
+
+    for names in variants.values():
+        for name in names.values():
+            storage.delete(name)
+
+
+def get_image_pool():
+    """
+    Gets the process-wide pool of image worker processes, creating it
+    on first use.
+
+    Decoding and resizing is CPU bound and holds the GIL for most of
+    the time, so it runs in separate processes. They are spawned
+    rather than forked, since forking a threaded server is unsafe, and
+    replaced after a number of images to release fragmented memory.
+
+    Returns:
+        ProcessPoolExecutor: pool with settings.RANGO_IMAGE_WORKERS
+        processes.
+    """
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.RANGO_IMAGE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                max_tasks_per_child=settings.RANGO_IMAGE_TASKS_PER_WORKER)
+    return _pool
+
+
+def schedule_variants(profile_id, picture):
+    """
+    Creates the thumbnails of a newly saved profile picture in the
+    image worker pool, without blocking the calling thread.
+
+    The worker reads the original from its path, so the upload is not
+    read into memory here. Only storages without local files are read
+    here and pass the content instead. The rendered files are stored
+    by a background task thread, which then records them on the profile
+    unless its picture changed in the meantime. Until then templates
+    show a placeholder.
+
+    When settings.RANGO_TASKS_EAGER is set, everything runs in the
+    calling thread instead, which is what the tests rely on.
+
+    Args:
+        profile_id (int): the primary key of the UserProfile.
+
+        picture (FieldFile): the stored original picture.
+    """
+    from rango.tasks import submit
+
+    try:
+        source = picture.path
+    except NotImplementedError:
+        with picture.open('rb'):
+            source = picture.read()
+
+    args = (source, settings.RANGO_THUMBNAIL_SIZES,
+            settings.RANGO_THUMBNAIL_QUALITY)
+
+    if settings.RANGO_TASKS_EAGER:
+        save_variants(profile_id, picture.storage, picture.name,
+                      render_variants(*args))
+        return
+
+    def rendered(future):
+        if future.exception() is not None:
+            logger.error('Rendering thumbnails of %s failed: %r',
+                         picture.name, future.exception())
+            return
+        submit(save_variants, profile_id, picture.storage, picture.name,
+               future.result())
+
+    get_image_pool().submit(render_variants, *args).add_done_callback(
+        rendered)
+
+
+def save_variants(profile_id, storage, name, rendered):
+    """
+    Stores rendered thumbnails and records them on a profile.
+
+    Args:
+        profile_id (int): the primary key of the UserProfile.
+
+        storage (Storage): the storage holding the original.
+
+        name (str): the storage name of the original.
+
+        rendered (dict): the files returned by render_variants().
+    """
+    from rango.models import UserProfile
+
+    variants = store_variants(storage, name, rendered)
+
+    if not UserProfile.objects.filter(id=profile_id, picture=name).update(
+            picture_variants=variants):
+        # The picture was replaced while its thumbnails were rendered.
+        delete_variants(storage, variants)
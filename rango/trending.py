@@ -0,0 +1,74 @@
+import math
+from datetime import datetime
+from datetime import timezone as datetime_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+# Scores are measured from this moment. The default score of 0 stands
+# for a single event at EPOCH, which is negligible after a few
+# half-lives.
+EPOCH = datetime(2024, 1, 1, tzinfo=datetime_timezone.utc)
+
+
+def event_score(amount, now):
+    """
+    Gets the score of 'amount' events happening at 'now'.
+
+    With decay rate r = ln 2 / RANGO_TRENDING_HALF_LIFE, an event at
+    time t is worth e^(-r (now - t)) at any later time. Every stored
+    score is scaled by the same factor e^(r (now - EPOCH)), so instead
+    of decaying all rows as time passes, new events are worth
+    e^(r (t - EPOCH)) and old scores stay untouched. The sum is kept as
+    its logarithm so it never overflows.
+
+    Args:
+        amount (float): the number of events, e.g. views.
+
+        now (datetime): the time of the events.
+
+    Returns:
+        float: log(amount) + r (now - EPOCH).
+    """
+    rate = math.log(2) / settings.RANGO_TRENDING_HALF_LIFE
+    return math.log(amount) + rate * (now - EPOCH).total_seconds()
+
+
+def add_scores(first, second):
+    """
+    Adds two scores kept in log space.
+
+    Returns:
+        float: log(e^first + e^second), computed without overflow.
+    """
+    high, low = max(first, second), min(first, second)
+    return high + math.log1p(math.exp(low - high))
+
+
+def record(model, amounts, now=None):
+    """
+    Adds events to the trending scores of several rows.
+
+    Args:
+        model (Model): Category or Page.
+
+        amounts (dict): the number of events per primary key.
+
+        now (datetime): the time of the events, defaults to now.
+    """
+    if now is None:
+        now = timezone.now()
+
+    amounts = {pk: amount for pk, amount in amounts.items() if amount > 0}
+
+    if not amounts:
+        return
+
+    with transaction.atomic():
+        rows = model._base_manager.select_for_update().filter(
+            id__in=list(amounts)).values_list('id', 'trending_score')
+        updated = [model(id=pk, trending_score=add_scores(
+                       score, event_score(amounts[pk], now)))
+                   for pk, score in rows]
+        model._base_manager.bulk_update(updated, ['trending_score'])
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+from django.core.files.uploadhandler import SkipFile
+from django.template.defaultfilters import filesizeformat
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    """
+    Upload handler which drops every uploaded file larger than
+    settings.RANGO_MAX_UPLOAD_SIZE as soon as that many bytes arrived,
+    instead of buffering it whole first.
+
+    It must come first in settings.FILE_UPLOAD_HANDLERS, so it sees each
+    chunk before the handlers which store it. The rest of a dropped file
+    is read and discarded, so the request's other fields still arrive.
+    The error is left in request.upload_errors by field name, for
+    UserProfileForm to report.
+    """
+
+    def new_file(self, field_name, *args, **kwargs):
+        """
+        Starts counting the bytes of a new file.
+        """
+        super().new_file(field_name, *args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        """
+        Passes a chunk on to the next handler, unless the file has
+        grown past the limit.
+
+        Raises:
+            SkipFile: when the file is too large.
+        """
+        self.received += len(raw_data)
+
+        if self.received > settings.RANGO_MAX_UPLOAD_SIZE:
+            if not hasattr(self.request, 'upload_errors'):
+                self.request.upload_errors = {}
+            self.request.upload_errors[self.field_name] = (
+                'The file is larger than %s.'
+                % filesizeformat(settings.RANGO_MAX_UPLOAD_SIZE))
+            raise SkipFile()
+        return raw_data
+
+    def file_complete(self, file_size):
+        """
+        Leaves the file object to the next handler.
+        """
+        return None
@@ -24,4 +24,6 @@ urlpatterns = [
     path('suggest/', views_ajax.CategorySearchView.as_view(),
          name='suggest_category'),
     path('add/', views_ajax.AutoAddPageView.as_view(), name='auto_add_page'),
+    path('clicks/', views_ajax.ClickBeaconView.as_view(),
+         name='track_clicks'),
 ]
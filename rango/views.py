@@ -1,6 +1,7 @@
-from datetime import datetime
+import time
 from typing import Any
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
@@ -15,13 +16,24 @@ from django.views import View
 
 from registration.backends.simple.views import RegistrationView
 
+from rango.bots import bot_classifier
+from rango.counters import page_views
 from rango.forms import CategoryForm
 from rango.forms import PageForm
 from rango.forms import UserProfileForm
+from rango.fragments import page_list_version
 from rango.google_search import CustomSearch
 from rango.models import Category
 from rango.models import Page
+from rango.models import UniqueVisitorCounter
 from rango.models import UserProfile
+from rango.page_cache import cache_page
+from rango.page_cache import category_tag
+from rango.redirects import get_page_url
+from rango.redirects import is_page_id
+from rango.visitors import get_visitor_key
+from rango.visitors import recent_page_views
+from rango.visitors import unique_visitors
 
 
 class IndexView(View):
@@ -38,9 +50,10 @@ class IndexView(View):
         """
         GET request for the Index View.
 
-        Retrieves the top five categories based on likes and top five
-        pages based on views and also calls the visitor_cookie_handler
-        function from the CookieHandlerView class.
+        Retrieves the top five categories based on likes, the top five
+        pages based on views, the five trending categories and pages,
+        and also calls the visitor_cookie_handler function from the
+        CookieHandlerView class.
 
         Args:
             request (HttpRequest): The request object.
@@ -49,18 +62,50 @@ class IndexView(View):
             HttpResponse: Rendered response with the template and
             context.
         """
-        cookie_handler_view = CookieHandlerView()
-        cookie_handler_view.visitor_cookie_handler(request)
         category_list = Category.objects.order_by('-likes')[:5]
 
-        page_list = Page.objects.order_by('-views')[:5]
+        # Pages of a category scheduled for deletion are hidden with it.
+        page_list = Page.objects.filter(
+            category__is_deleted=False).order_by('-views')[:5]
 
-        request.session.set_test_cookie()
+        trending_categories = Category.objects.order_by(
+            '-trending_score', '-id')[:5]
+
+        trending_pages = Page.objects.filter(
+            category__is_deleted=False).order_by('-trending_score', '-id')[:5]
 
         context_dict = {'categories': category_list,
-                        'pages': page_list}
+                        'pages': page_list,
+                        'trending_categories': trending_categories,
+                        'trending_pages': trending_pages}
 
-        return render(request, self.template_name, context=context_dict)
+        response = render(request, self.template_name, context=context_dict)
+
+        # Visits the page cache may answer are counted by
+        # page_cache_hit(), so the stored response sets no cookie.
+        if (not bot_classifier.is_bot(request)
+                and not getattr(request, 'page_cacheable', False)):
+            cookie_handler_view = CookieHandlerView()
+            cookie_handler_view.visitor_cookie_handler(request, response)
+
+        return cache_page(response, ['index'])
+
+    @classmethod
+    def page_cache_hit(cls, request, response):
+        """
+        Counts the visit of an anonymous visitor whose request the page
+        cache answered or stored. Only the signed cookie is used, since
+        session tracking would create a session in the database; with
+        session tracking such visits are not counted.
+
+        Args:
+            request (HttpRequest): The request object.
+
+            response (HttpResponse): The response sent to the visitor.
+        """
+        if (settings.RANGO_VISITOR_TRACKING == 'cookie'
+                and not bot_classifier.is_bot(request)):
+            CookieHandlerView().visitor_cookie_handler(request, response)
 
 
 class AboutView(View):
@@ -81,7 +126,7 @@ class AboutView(View):
         Returns:
             None
         """
-        return render(request, self.template_name)
+        return cache_page(render(request, self.template_name), ['about'])
 
 
 class ShowCategoryView(View):
@@ -121,7 +166,13 @@ class ShowCategoryView(View):
             'category': category,
             'query': category.name,
             'search_results': results,
-            'page_title': [page.title for page in pages]
+            # Only needed to offer adding results, and evaluating the
+            # pages would defeat the cached page list otherwise.
+            'page_title': [page.title for page in pages] if results else [],
+            'unique_visitors': unique_visitors.counts(
+                UniqueVisitorCounter.CATEGORY, [category.id])[category.id],
+            'page_list_version': page_list_version(category.id),
+            'page_list_timeout': settings.RANGO_PAGE_LIST_CACHE_TIMEOUT,
         }
 
     def get_category_and_pages(self, category_name_slug):
@@ -164,9 +215,36 @@ class ShowCategoryView(View):
             context.
         """
         category, pages = self.get_category_and_pages(category_name_slug)
+
+        if category and not bot_classifier.is_bot(request):
+            unique_visitors.add(UniqueVisitorCounter.CATEGORY, category.id,
+                                get_visitor_key(request))
+
         self.context_dict.update(self.get_context_dict(category, pages))
 
-        return render(request, self.template_name, context=self.context_dict)
+        response = render(request, self.template_name,
+                          context=self.context_dict)
+        return cache_page(response, [category_tag(category.id)],
+                          category_id=category.id)
+
+    @classmethod
+    def page_cache_hit(cls, request, response, category_id):
+        """
+        Counts the unique visitor of a category page whose request the
+        page cache answered or stored. The visit is only added in
+        memory, so a cache hit still needs no query, and adding a
+        visitor twice counts it once.
+
+        Args:
+            request (HttpRequest): request object.
+
+            response (HttpResponse): the response sent to the visitor.
+
+            category_id (int): the primary key of the category.
+        """
+        if not bot_classifier.is_bot(request):
+            unique_visitors.add(UniqueVisitorCounter.CATEGORY, category_id,
+                                get_visitor_key(request))
 
     def post(self, request, category_name_slug, *args, **kwargs):
         """
@@ -483,7 +561,9 @@ class RegisterProfileView(View):
             HttpResponse: rendered response based on the form
             vlidation result.
         """
-        self.form = UserProfileForm(request.POST, request.FILES)
+        self.form = UserProfileForm(
+            request.POST, request.FILES,
+            upload_errors=getattr(request, 'upload_errors', None))
 
         if self.form.is_valid():
             user_profile = self.form.save(commit=False)
@@ -633,18 +713,21 @@ class ProfileView(View):
             validation result.
         """
         try:
-            context_dict = {}
             self.user, self.userprofile = self.get_user(username)
 
-            self.form = UserProfileForm(request.POST, request.FILES,
-                                   instance=self.userprofile)
+            form = UserProfileForm(
+                request.POST, request.FILES, instance=self.userprofile,
+                upload_errors=getattr(request, 'upload_errors', None))
 
-            if self.form.is_valid():
-                self.form.save(commit=True)
-                context_dict.update(self.get_context_dict())
+            if form.is_valid():
+                form.save(commit=True)
                 return redirect('profile', self.user.username)
             else:
-                print(self.form.errors)
+                print(form.errors)
+
+            context_dict = self.get_context_dict()
+            # Shows the errors of the invalid form, not a blank one.
+            context_dict['form'] = form
             return render(request, self.template_name, context=context_dict)
         except User.DoesNotExist:
             return redirect('index')
@@ -727,9 +810,24 @@ class CookieHandlerView(View):
     View for handling cookies, specifically for tracking visitor
     information.
 
+    The visit count and the last visit time (seconds since the epoch)
+    are kept in the session, or in a signed cookie when
+    settings.RANGO_VISITOR_TRACKING is 'cookie'. Either way they are
+    only written when the visit count changes, i.e. on the first visit
+    and once a day after that.
+
     Attributes:
-        None
+        cookie_name (str): name of the signed visitor cookie.
+
+        cookie_salt (str): salt used for signing the visitor cookie.
+
+        visit_interval (int): seconds that must pass since the last
+        visit before a new visit is counted.
     """
+    cookie_name = 'visits'
+    cookie_salt = 'rango.visits'
+    visit_interval = 24 * 60 * 60
+
     def get_server_side_cookie(self, request, cookie, default_val=None):
         """
         Retrieve a value from the server-side session cookie.
@@ -749,36 +847,89 @@ class CookieHandlerView(View):
             val = default_val
         return val
 
-    def visitor_cookie_handler(self, request):
+    def get_visit_data(self, request):
+        """
+        Reads the visit count and the last visit time of the visitor.
+
+        Args:
+            request (HttpRequest): The request object.
+
+        Returns:
+            visits (int): the number of visits so far.
+
+            last_visit (int): seconds since the epoch of the last
+            counted visit, or None for new visitors and for sessions
+            which still hold the old datetime string.
+        """
+        if settings.RANGO_VISITOR_TRACKING == 'cookie':
+            value = request.get_signed_cookie(self.cookie_name, default='',
+                                              salt=self.cookie_salt)
+            visits, _, last_visit = value.partition(':')
+        else:
+            visits = self.get_server_side_cookie(request, 'visits', 1)
+            last_visit = self.get_server_side_cookie(request, 'last_visit')
+
+        try:
+            visits = int(visits)
+        except ValueError:
+            visits = 1
+
+        try:
+            last_visit = int(last_visit)
+        except (TypeError, ValueError):
+            last_visit = None
+
+        return visits, last_visit
+
+    def visitor_cookie_handler(self, request, response):
         """
         Handle visitor cookie tracking.
 
-        Updates the visit count and last visit time in the session.
+        Updates the visit count and last visit time, but only when a
+        new visit is counted.
 
         Args:
             request (HttpRequest): The request object.
+
+            response (HttpResponse): The response, which receives the
+            signed cookie in cookie mode.
+
+        Returns:
+            visits (int): the number of visits of the visitor.
         """
-        visits = int(self.get_server_side_cookie(request, 'visits', '1'))
-        print("visit", visits)
-        last_visit_cookie = self.get_server_side_cookie(request,
-                                                'last_visit',
-                                                str(datetime.now()))
-        last_visit_time = datetime.strptime(last_visit_cookie[:-7],
-                                            '%Y-%m-%d %H:%M:%S')
+        now = int(time.time())
+        visits, last_visit = self.get_visit_data(request)
 
-        if (datetime.now() - last_visit_time).days > 0:
+        if last_visit is not None and now - last_visit < self.visit_interval:
+            return visits
+
+        if last_visit is not None:
             visits = visits + 1
-            request.session['last_visit'] = str(datetime.now())
+
+        if settings.RANGO_VISITOR_TRACKING == 'cookie':
+            response.set_signed_cookie(self.cookie_name,
+                                       '%d:%d' % (visits, now),
+                                       salt=self.cookie_salt,
+                                       max_age=365 * 24 * 60 * 60,
+                                       httponly=True, samesite='Lax')
         else:
-            request.session['last_visit'] = last_visit_cookie
+            request.session['visits'] = visits
+            request.session['last_visit'] = now
 
-        request.session['visits'] = visits
+            if not request.session.test_cookie_worked():
+                request.session.set_test_cookie()
+
+        return visits
 
 
 class TrackUrlView(View):
     """
     View for tracking and updating the view count of a page.
 
+    The page URL comes from the in-memory redirect cache and the view
+    is added to the buffered page view counter, so a redirect to a
+    cached page does not touch the database.
+
     Attributes:
         page_id (int): The ID of the page to track.
         url (str): The default URL to redirect to if the page ID is not
@@ -792,8 +943,8 @@ class TrackUrlView(View):
         Handles GET requests for tracking and updating the view count
         of a page.
 
-        Retrieves the page ID from the request, updates the page's view
-        count, and redirects to the page's URL.
+        Retrieves the page ID from the request, counts the view of the
+        page, and redirects to the page's URL.
 
         Args:
             request (HttpRequest): The request object.
@@ -801,16 +952,30 @@ class TrackUrlView(View):
         Returns:
             HttpResponse: Redirects to the page's URL.
         """
-        if 'page_id' in request.GET:
-            self.page_id = request.GET['page_id']
+        url = self.url
 
-            try:
-                page = Page.objects.get(id=self.page_id)
-                page.views = page.views + 1
-                page.save()
-                url = page.url
-            except Exception:
-                pass
+        try:
+            self.page_id = int(request.GET['page_id'])
+        except (KeyError, ValueError):
+            return redirect(url)
+
+        if not is_page_id(self.page_id):
+            return redirect(url)
+
+        page_url = get_page_url(self.page_id)
+
+        if page_url is not None:
+            url = page_url
+
+            if not bot_classifier.is_bot(request):
+                visitor_key = get_visitor_key(request)
+
+                if not recent_page_views.check_and_add(
+                        '%s|%s' % (visitor_key, self.page_id)):
+                    page_views.incr(self.page_id)
+
+                unique_visitors.add(UniqueVisitorCounter.PAGE, self.page_id,
+                                    visitor_key)
         return redirect(url)
 
 
@@ -834,7 +999,7 @@ class ListProfilesView(View):
         Returns:
             HttpResponse: Rendered response with the user profile list.
         """
-        userprofile_list = UserProfile.objects.all()
+        userprofile_list = UserProfile.objects.select_related('user')
 
         return render(request, 'rango/list_profiles.html',
                       {'userprofile_list': userprofile_list})
@@ -1,16 +1,32 @@
+import json
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponse
+from django.db.models import F
+from django.http import HttpResponseBadRequest
 from django.shortcuts import render
 from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 
+from rango import trending
+from rango.bots import bot_classifier
+from rango.counters import page_views
 from rango.models import Category
 from rango.models import Page
-
+from rango.models import UniqueVisitorCounter
+from rango.redirects import get_page_url
+from rango.redirects import is_page_id
+from rango.throttling import BeaconThrottle
+from rango.throttling import ThrottleMixin
+from rango.visitors import get_visitor_key
+from rango.visitors import recent_page_views
+from rango.visitors import unique_visitors
 
 
 @method_decorator(login_required, name='dispatch')
-class LikeCategoryView(View):
+class LikeCategoryView(ThrottleMixin, View):
     """
     View for handling category liking.
 
@@ -45,14 +61,20 @@ class LikeCategoryView(View):
 
             if cat:
                 user.liked_categories.add(cat)
-                self.likes = cat.likes + 1
-                cat.likes = self.likes
-                cat.save()
+                # Concurrent likes must not overwrite each other, and
+                # API clients holding the old ETag must get 412.
+                cat.likes = F('likes') + 1
+                cat.version = F('version') + 1
+                cat.save(update_fields=['likes', 'version'])
+                cat.refresh_from_db(fields=['likes', 'version'])
+                self.likes = cat.likes
+                trending.record(Category, {
+                    cat.id: settings.RANGO_TRENDING_LIKE_WEIGHT})
         return HttpResponse(self.likes)
 
 
 @method_decorator(login_required, name='dispatch')
-class CategorySearchView(View):
+class CategorySearchView(ThrottleMixin, View):
     """
     View for searching and retrieving the categories based on the
     search query.
@@ -111,7 +133,7 @@ class CategorySearchView(View):
 
 
 @method_decorator(login_required, name='dispatch')
-class AutoAddPageView(View):
+class AutoAddPageView(ThrottleMixin, View):
     """
     View for automatically adding a page to a category.
 
@@ -161,3 +183,57 @@ class AutoAddPageView(View):
             pages = Page.objects.filter(category=category).order_by('-views')
             self.context_dict['pages'] = pages
         return render(request, self.template_name, self.context_dict)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ClickBeaconView(ThrottleMixin, View):
+    """
+    View receiving batches of link clicks sent with navigator.sendBeacon.
+
+    The category page links straight to each page when JavaScript is
+    on and reports the clicks here, instead of sending the user through
+    the /rango/goto/ redirect. sendBeacon cannot add a CSRF header, and
+    the view only counts views, so it is CSRF exempt.
+
+    Attributes:
+        throttle_class (TokenBucketThrottle): the throttle of the view.
+    """
+    throttle_class = BeaconThrottle
+
+    def post(self, request, *args, **kwargs):
+        """
+        Handle POST requests with a JSON body such as
+        {"page_ids": [1, 2, 2]}.
+
+        Every click is deduplicated and counted like a click through
+        TrackUrlView. At most settings.RANGO_BEACON_MAX_EVENTS clicks
+        are read from one request.
+
+        Args:
+            request (HttpRequest): The request object.
+
+        Returns:
+            HttpResponse: 204 No Content, or 400 for a malformed body.
+        """
+        try:
+            page_ids = json.loads(request.body)['page_ids']
+            page_ids = [int(page_id) for page_id
+                        in page_ids[:settings.RANGO_BEACON_MAX_EVENTS]]
+        except (ValueError, TypeError, KeyError):
+            return HttpResponseBadRequest('Expected {"page_ids": [...]}.')
+
+        if not bot_classifier.is_bot(request):
+            visitor_key = get_visitor_key(request)
+
+            for page_id in page_ids:
+                if not is_page_id(page_id) or get_page_url(page_id) is None:
+                    continue
+
+                if not recent_page_views.check_and_add(
+                        '%s|%s' % (visitor_key, page_id)):
+                    page_views.incr(page_id)
+
+                unique_visitors.add(UniqueVisitorCounter.PAGE, page_id,
+                                    visitor_key)
+
+        return HttpResponse(status=204)
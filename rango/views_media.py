@@ -0,0 +1,187 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse
+from django.http import Http404
+from django.http import HttpResponse
+from django.http import StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views import View
+
+# Names written by ContentAddressedStorage end in the SHA-256 of the
+# file, so their bytes never change.
+HASHED_NAME = re.compile(r'(?:^|/)(?P<digest>[0-9a-f]{64})\.[a-z0-9]+$')
+
+RANGE = re.compile(r'^bytes=(?P<start>\d*)-(?P<end>\d*)$')
+
+
+def read_range(path, start, length, chunk_size=64 * 1024):
+    """
+    Yields a byte range of a file in chunks.
+
+    Args:
+        path (str): the file path.
+
+        start (int): the offset of the first byte.
+
+        length (int): the number of bytes.
+
+        chunk_size (int): the size of the chunks.
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+class MediaView(View):
+    """
+    View serving uploaded media, replacing django.conf.urls.static.
+
+    Depending on settings.RANGO_MEDIA_SERVING, the file is streamed by
+    Django ('django'), or only the headers are set and the web server
+    is asked to send the bytes with X-Accel-Redirect ('x-accel', nginx)
+    or X-Sendfile ('x-sendfile', Apache), so no application worker is
+    busy while the file is transferred.
+
+    Content-addressed names are cached forever as immutable, other
+    files for settings.RANGO_MEDIA_MAX_AGE seconds. ETag and
+    Last-Modified allow 304 responses, and in 'django' mode single
+    byte ranges are answered with 206 Partial Content; the web server
+    handles ranges in the other modes.
+    """
+
+    def get(self, request, path, *args, **kwargs):
+        """
+        Handles GET and HEAD requests for a media file.
+
+        Args:
+            request (HttpRequest): The request object.
+
+            path (str): the path of the file below MEDIA_ROOT.
+
+        Returns:
+            HttpResponse: the file, a part of it, 304 Not Modified or
+            416 Range Not Satisfiable.
+        """
+        try:
+            full_path = safe_join(settings.MEDIA_ROOT, path)
+        except SuspiciousFileOperation:
+            raise Http404
+
+        if not os.path.isfile(full_path):
+            raise Http404
+
+        stat = os.stat(full_path)
+        hashed = HASHED_NAME.search(path)
+
+        if hashed:
+            etag = '"%s"' % hashed.group('digest')
+            cache_control = 'public, max-age=31536000, immutable'
+        else:
+            etag = '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+            cache_control = 'public, max-age=%d' % (
+                settings.RANGO_MEDIA_MAX_AGE)
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(stat.st_mtime))
+        if response is None:
+            response = self.file_response(request, path, full_path, stat,
+                                          etag)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Cache-Control'] = cache_control
+        return response
+
+    def file_response(self, request, path, full_path, stat, etag):
+        """
+        Builds the response carrying the file, or the offload headers
+        for the web server.
+
+        Returns:
+            HttpResponse: the response without caching headers.
+        """
+        content_type = (mimetypes.guess_type(full_path)[0]
+                        or 'application/octet-stream')
+        mode = settings.RANGO_MEDIA_SERVING
+
+        if mode == 'x-accel':
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = quote(
+                settings.RANGO_MEDIA_ACCEL_PREFIX + path)
+            return response
+
+        if mode == 'x-sendfile':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = full_path
+            return response
+
+        byte_range = request.headers.get('Range')
+        if_range = request.headers.get('If-Range')
+
+        if byte_range and (if_range is None or if_range == etag):
+            response = self.range_response(byte_range, full_path,
+                                           stat.st_size, content_type)
+            if response is not None:
+                return response
+
+        response = FileResponse(open(full_path, 'rb'),
+                                content_type=content_type)
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    def range_response(self, byte_range, full_path, size, content_type):
+        """
+        Answers a single byte range request.
+
+        Args:
+            byte_range (str): the Range header, e.g. 'bytes=0-1023',
+            'bytes=1024-' or 'bytes=-512'.
+
+            full_path (str): the file path.
+
+            size (int): the file size.
+
+            content_type (str): the content type of the file.
+
+        Returns:
+            HttpResponse: 206 with the range, 416 if it lies outside the
+            file, or None for ranges this view does not support, which
+            are answered with the whole file.
+        """
+        match = RANGE.match(byte_range.strip())
+
+        if match is None or not (match.group('start')
+                                 or match.group('end')):
+            return None
+
+        if match.group('start'):
+            start = int(match.group('start'))
+            end = min(int(match.group('end') or size - 1), size - 1)
+        else:
+            start = max(size - int(match.group('end')), 0)
+            end = size - 1
+
+        if start >= size or start > end:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */%d' % size
+            return response
+
+        response = StreamingHttpResponse(
+            read_range(full_path, start, end - start + 1), status=206,
+            content_type=content_type)
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = 'bytes %d-%d/%d' % (start, end, size)
+        response['Accept-Ranges'] = 'bytes'
+        return response
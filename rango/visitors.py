@@ -0,0 +1,286 @@
+import atexit
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import Q
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from django.utils.functional import empty
+
+from rango.bloom import RotatingBloomFilter
+from rango.hyperloglog import HyperLogLog
+from rango.models import UniqueVisitorCounter
+from rango.tasks import submit
+from rango.tasks import submit_later
+
+ESTIMATE_KEY = 'rango:unique-visitors:%s:%s:%s'
+
+def get_visitor_key(request):
+    """
+    Gets a key identifying the visitor of a request without creating a
+    session for it.
+
+    Args:
+        request (HttpRequest): the request object.
+
+    Returns:
+        str: the user id for logged in users, otherwise a hash of the
+        IP address and the user agent.
+    """
+    user = getattr(request, 'user', None)
+
+    if user is not None and user.is_authenticated:
+        return 'user:%s' % user.pk
+
+    client = '%s|%s' % (request.META.get('REMOTE_ADDR', ''),
+                        request.META.get('HTTP_USER_AGENT', ''))
+    return 'anon:' + hashlib.blake2b(client.encode(),
+                                     digest_size=12).hexdigest()
+
+
+class UniqueVisitorTracker:
+    """
+    Estimates the unique visitors of categories and pages per day.
+
+    Visits are added to in-memory HyperLogLogs, one per (kind, object
+    id, day). They are merged into the UniqueVisitorCounter rows in
+    batches, once RANGO_UNIQUE_VISITORS_FLUSH_INTERVAL seconds have
+    passed or RANGO_UNIQUE_VISITORS_MAX_PENDING counters are pending,
+    so a visit costs no database write. Pending visits are merged by a
+    timer at most RANGO_UNIQUE_VISITORS_FLUSH_INTERVAL seconds after
+    they were added.
+
+    The estimates are cached for RANGO_UNIQUE_VISITORS_CACHE_TIMEOUT
+    seconds, so listing categories does not count every HyperLogLog
+    on every request.
+
+    Attributes:
+        pending (dict): HyperLogLogs not yet written to the database.
+
+        last_flush (float): time of the last flush.
+
+        timer (threading.Timer): the timer of the next flush, if one is
+        scheduled.
+    """
+
+    def __init__(self):
+        """
+        Initializes the UniqueVisitorTracker instance.
+        """
+        self.pending = {}
+        self.last_flush = time.time()
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def add(self, kind, object_id, visitor_key):
+        """
+        Records a visit.
+
+        Args:
+            kind (str): UniqueVisitorCounter.CATEGORY or PAGE.
+
+            object_id (int): the primary key of the category or page.
+
+            visitor_key (str): the key from get_visitor_key().
+        """
+        key = (kind, object_id, timezone.now().date())
+
+        with self.lock:
+            if key not in self.pending:
+                self.pending[key] = HyperLogLog()
+            self.pending[key].add(visitor_key)
+
+            due = (len(self.pending)
+                   >= settings.RANGO_UNIQUE_VISITORS_MAX_PENDING
+                   or time.time() - self.last_flush
+                   >= settings.RANGO_UNIQUE_VISITORS_FLUSH_INTERVAL)
+            if due:
+                self.last_flush = time.time()
+            elif self.timer is None:
+                self.timer = submit_later(
+                    settings.RANGO_UNIQUE_VISITORS_FLUSH_INTERVAL,
+                    self.flush)
+
+        if due:
+            submit(self.flush)
+
+    def flush(self):
+        """
+        Merges the pending HyperLogLogs into the database, in batches of
+        RANGO_UNIQUE_VISITORS_BATCH_SIZE counters per transaction.
+        """
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+        keys = list(pending)
+        batch_size = settings.RANGO_UNIQUE_VISITORS_BATCH_SIZE
+
+        for start in range(0, len(keys), batch_size):
+            batch = keys[start:start + batch_size]
+
+            with transaction.atomic():
+                query = Q()
+                for kind, object_id, day in batch:
+                    query |= Q(kind=kind, object_id=object_id, day=day)
+
+                stored = {(c.kind, c.object_id, c.day): c for c in
+                          UniqueVisitorCounter.objects.select_for_update()
+                          .filter(query)}
+                updated = []
+                created = []
+
+                for key in batch:
+                    hll = pending[key]
+
+                    if key in stored:
+                        counter = stored[key]
+                        hll.merge(HyperLogLog(registers=counter.registers))
+                        counter.registers = hll.to_bytes()
+                        updated.append(counter)
+                    else:
+                        created.append(UniqueVisitorCounter(
+                            kind=key[0], object_id=key[1], day=key[2],
+                            registers=hll.to_bytes()))
+
+                UniqueVisitorCounter.objects.bulk_update(updated,
+                                                         ['registers'])
+                self.create(created)
+
+    def create(self, counters):
+        """
+        Inserts new counters, merging those another process inserted
+        first since they were read.
+
+        Args:
+            counters (list): unsaved UniqueVisitorCounter instances.
+        """
+        if not counters:
+            return
+
+        UniqueVisitorCounter.objects.bulk_create(counters,
+                                                 ignore_conflicts=True)
+
+        query = Q()
+        for counter in counters:
+            query |= Q(kind=counter.kind, object_id=counter.object_id,
+                       day=counter.day)
+
+        stored = {(c.kind, c.object_id, c.day): c for c in
+                  UniqueVisitorCounter.objects.select_for_update()
+                  .filter(query)}
+        merged = []
+
+        for counter in counters:
+            other = stored[(counter.kind, counter.object_id, counter.day)]
+            if bytes(other.registers) != counter.registers:
+                hll = HyperLogLog(registers=other.registers)
+                hll.merge(HyperLogLog(registers=counter.registers))
+                other.registers = hll.to_bytes()
+                merged.append(other)
+
+        UniqueVisitorCounter.objects.bulk_update(merged, ['registers'])
+
+    def counts(self, kind, object_ids, day=None):
+        """
+        Gets the estimated unique visitors of several objects on one day,
+        from the cache where possible.
+
+        Args:
+            kind (str): UniqueVisitorCounter.CATEGORY or PAGE.
+
+            object_ids (list): primary keys of the categories or pages.
+
+            day (date): the day, defaults to today.
+
+        Returns:
+            dict: the estimated unique visitors by object id.
+        """
+        if day is None:
+            day = timezone.now().date()
+
+        keys = {ESTIMATE_KEY % (kind, day.isoformat(), object_id): object_id
+                for object_id in object_ids}
+        counts = {keys[key]: count
+                  for key, count in cache.get_many(list(keys)).items()}
+        missing = [object_id for object_id in object_ids
+                   if object_id not in counts]
+
+        if missing:
+            estimates = self.estimate(kind, missing, day)
+            cache.set_many(
+                {ESTIMATE_KEY % (kind, day.isoformat(), object_id): count
+                 for object_id, count in estimates.items()},
+                settings.RANGO_UNIQUE_VISITORS_CACHE_TIMEOUT)
+            counts.update(estimates)
+
+        return counts
+
+    def estimate(self, kind, object_ids, day):
+        """
+        Estimates the unique visitors of several objects on one day,
+        including the visits not yet flushed by this process.
+
+        Args:
+            kind (str): UniqueVisitorCounter.CATEGORY or PAGE.
+
+            object_ids (list): primary keys of the categories or pages.
+
+            day (date): the day.
+
+        Returns:
+            dict: the estimated unique visitors by object id, 0 for the
+            objects nobody visited.
+        """
+        counters = {}
+
+        for object_id, registers in UniqueVisitorCounter.objects.filter(
+                kind=kind, day=day, object_id__in=object_ids).values_list(
+                'object_id', 'registers'):
+            counters[object_id] = HyperLogLog(registers=registers)
+
+        with self.lock:
+            for object_id in object_ids:
+                hll = self.pending.get((kind, object_id, day))
+                if hll is None:
+                    continue
+                if object_id in counters:
+                    counters[object_id].merge(hll)
+                else:
+                    counters[object_id] = HyperLogLog(
+                        registers=hll.to_bytes())
+
+        counts = dict.fromkeys(object_ids, 0)
+        counts.update((object_id, hll.count())
+                      for object_id, hll in counters.items())
+        return counts
+
+unique_visitors = UniqueVisitorTracker()
+
+# Do not lose the visits buffered by a worker that shuts down cleanly.
+atexit.register(unique_visitors.flush)
+
+# Remembers which visitor viewed which page recently, so refreshes and
+# double clicks are not counted as new views. It is created on first
+# use, and again after its settings change.
+recent_page_views = SimpleLazyObject(lambda: RotatingBloomFilter(
+    settings.RANGO_VIEW_DEDUP_CAPACITY, settings.RANGO_VIEW_DEDUP_ERROR_RATE,
+    settings.RANGO_VIEW_DEDUP_WINDOW))
+
+
+@receiver(setting_changed)
+def reset_recent_page_views(setting, **kwargs):
+    """
+    Drops recent_page_views when one of its settings changes, e.g. in
+    override_settings(), so it is created again with the new values.
+    """
+    if setting.startswith('RANGO_VIEW_DEDUP_'):
+        recent_page_views._wrapped = empty
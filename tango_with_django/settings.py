@@ -45,24 +45,40 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'rango.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'rango.middleware.AnonymousPageCacheMiddleware',
+    'rango.middleware.ApiExemptSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',  # AuthenticationMiddleware now includes SessionAuthenticationMiddleware
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'rango.middleware.ApiExemptCsrfViewMiddleware',
+    # AuthenticationMiddleware now includes
+    # SessionAuthenticationMiddleware
+    'rango.middleware.ApiExemptAuthenticationMiddleware',
+    'rango.middleware.ApiExemptMessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 
 ROOT_URLCONF = 'tango_with_django.urls'
 
+# Templates are read from TEMPLATE_DIR, then from the apps. Outside of
+# DEBUG the cached loader keeps every compiled template in memory, so
+# each is read and parsed once per worker instead of on every render.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATE_DIR, ],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -96,6 +112,70 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/1.9/topics/cache/
+#
+# Throttle buckets are only shared between workers that share a cache,
+# so production should point this at memcached or redis.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+# Sessions
+# https://docs.djangoproject.com/en/1.9/topics/http/sessions/
+#
+# RANGO_SESSION_PROFILE picks the session engine:
+#   'db'        - every request reads django_session, the Django default.
+#   'cached_db' - reads come from the redis server at
+#                 RANGO_SESSION_CACHE_URL, writes still go through to the
+#                 database. The cache has to be shared by all processes,
+#                 which the rango.E001 system check enforces.
+#   'file'      - one file per session in SESSION_FILE_PATH, which must
+#                 exist. Sessions never touch the database, and unlike
+#                 FileBasedCache the store never culls live sessions or
+#                 lists the directory on a request. In exchange, every
+#                 process has to share that directory, and expired
+#                 files stay on disk until a purge.
+# Expired sessions are removed with 'manage.py purge_sessions'. For the
+# 'file' profile this lists the whole directory, so run it off-peak.
+
+SESSION_PROFILES = {
+    'db': {
+        'ENGINE': 'django.contrib.sessions.backends.db',
+        'CACHE': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        },
+    },
+    'cached_db': {
+        'ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'CACHE': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('RANGO_SESSION_CACHE_URL',
+                                       'redis://127.0.0.1:6379/1'),
+        },
+    },
+    'file': {
+        'ENGINE': 'django.contrib.sessions.backends.file',
+        'CACHE': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        },
+    },
+}
+
+SESSION_FILE_PATH = os.environ.get(
+    'RANGO_SESSION_FILE_PATH', os.path.join(BASE_DIR, '.cache', 'sessions'))
+
+RANGO_SESSION_PROFILE = os.environ.get('RANGO_SESSION_PROFILE', 'db')
+
+SESSION_ENGINE = SESSION_PROFILES[RANGO_SESSION_PROFILE]['ENGINE']
+SESSION_CACHE_ALIAS = 'sessions'
+CACHES[SESSION_CACHE_ALIAS] = SESSION_PROFILES[RANGO_SESSION_PROFILE]['CACHE']
+
+
 # Password validation
 # https://docs.djangoproject.com/en/1.9/ref/settings/#auth-password-validators
 
@@ -135,8 +215,197 @@ USE_TZ = True
 STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 
+# Uploads larger than FILE_UPLOAD_MAX_MEMORY_SIZE are streamed to a
+# temporary file instead of memory, and LimitedUploadHandler drops
+# files past RANGO_MAX_UPLOAD_SIZE while they arrive.
+FILE_UPLOAD_HANDLERS = [
+    'rango.uploads.LimitedUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+
+# Profile pictures and their thumbnails are named after their content,
+# so identical uploads are stored once. gc_media removes unused ones.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+    'profile_pictures': {
+        'BACKEND': 'rango.storage.ContentAddressedStorage',
+    },
+}
+
 REGISTRATION_OPEN = True
 ACCOUNT_ACTIVATION_DAYS = 7
 REGISTRATION_AUTO_LOGIN = True
 LOGIN_REDIRECT_URL = '/rango/'
 LOGIN_URL = '/accounts/login/'
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rango.api.v1.authentication.SignedKeyAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': ['rango.throttling.ApiThrottle'],
+}
+
+# Requests under RANGO_API_PREFIX skip the session, CSRF, auth and
+# messages middleware and authenticate with signed keys only.
+RANGO_API_PREFIX = '/api/'
+RANGO_API_LEAN_MIDDLEWARE = True
+RANGO_API_KEY_MAX_AGE = 60 * 60 * 24 * 90
+
+# Token bucket throttles: 'capacity' is the allowed burst and
+# 'refill_rate' the sustained number of requests per second. The
+# buckets live in CACHES[RANGO_THROTTLE_CACHE], which has to be shared
+# by all worker processes in production, see the rango.W001 check.
+RANGO_THROTTLE_CACHE = 'default'
+RANGO_THROTTLE_RATES = {
+    'api': {'capacity': 60, 'refill_rate': 1.0},
+    'ajax': {'capacity': 30, 'refill_rate': 2.0},
+    'beacon': {'capacity': 60, 'refill_rate': 1.0},
+}
+
+# Background tasks run in a small thread pool. RANGO_TASKS_EAGER runs
+# them inline instead, which the tests use.
+RANGO_TASK_WORKERS = 2
+RANGO_TASKS_EAGER = False
+
+# 'background' marks a deleted category as gone right away and removes
+# its pages in batches, 'inline' deletes everything in the request.
+RANGO_CATEGORY_DELETION = 'background'
+RANGO_DELETION_BATCH_SIZE = 500
+RANGO_DELETION_BATCH_PAUSE = 0.05
+
+# 'session' keeps the visit count in the session, 'cookie' keeps it in a
+# signed cookie and never writes to the database. Only 'cookie' counts
+# anonymous visits the page cache answers, since creating a session
+# for them would make every visit a database write.
+RANGO_VISITOR_TRACKING = 'cookie'
+
+# Unique visitors are counted in memory with HyperLogLogs and merged
+# into the database in batches. The estimates are cached for
+# RANGO_UNIQUE_VISITORS_CACHE_TIMEOUT seconds, so they may lag that long
+# behind the visits.
+RANGO_UNIQUE_VISITORS_FLUSH_INTERVAL = 30
+RANGO_UNIQUE_VISITORS_MAX_PENDING = 1000
+RANGO_UNIQUE_VISITORS_BATCH_SIZE = 100
+RANGO_UNIQUE_VISITORS_CACHE_TIMEOUT = 60
+
+# Repeat views of a page by the same visitor within this many seconds are
+# not counted. The Bloom filter is sized for RANGO_VIEW_DEDUP_CAPACITY
+# views per window.
+RANGO_VIEW_DEDUP_WINDOW = 30 * 60
+RANGO_VIEW_DEDUP_CAPACITY = 100000
+RANGO_VIEW_DEDUP_ERROR_RATE = 0.001
+
+# Requests whose user agent matches one of these patterns are treated as
+# bots and skip view counters and visitor tracking.
+RANGO_BOT_USER_AGENT_PATTERNS = [
+    r'bot\b', r'crawl', r'spider', r'slurp', r'archiver', r'facebookexternal',
+    r'embedly', r'preview', r'monitor', r'headless', r'phantomjs',
+    r'python-requests', r'python-urllib', r'curl/', r'wget/', r'go-http',
+    r'java/', r'okhttp', r'scrapy',
+]
+RANGO_BOT_VERDICT_CACHE_SIZE = 4096
+
+# /rango/goto/ keeps up to RANGO_REDIRECT_CACHE_SIZE page URLs per worker
+# for RANGO_REDIRECT_CACHE_TTL seconds, and buffers page views for up to
+# RANGO_PAGE_VIEWS_FLUSH_INTERVAL seconds before writing them.
+RANGO_REDIRECT_CACHE_SIZE = 10000
+RANGO_REDIRECT_CACHE_TTL = 300
+RANGO_PAGE_VIEWS_FLUSH_INTERVAL = 5
+RANGO_PAGE_VIEWS_MAX_PENDING = 1000
+
+# The most link clicks read from one sendBeacon request.
+RANGO_BEACON_MAX_EVENTS = 50
+
+# Page views are logged as events and folded into hourly and daily
+# rollups by the compact_view_events command, which should run every
+# few minutes. Hourly rollups are kept this many days; daily ones are
+# kept forever.
+RANGO_ANALYTICS_HOURLY_RETENTION_DAYS = 14
+
+# Trending scores of pages and categories halve every
+# RANGO_TRENDING_HALF_LIFE seconds. A like weighs as much as this many
+# page views.
+RANGO_TRENDING_HALF_LIFE = 24 * 60 * 60
+RANGO_TRENDING_LIKE_WEIGHT = 5
+
+# Profile pictures are re-encoded as square JPEG and WebP thumbnails of
+# these sizes, in pixels, at this quality.
+RANGO_THUMBNAIL_SIZES = (64, 128, 300)
+RANGO_THUMBNAIL_QUALITY = 80
+
+# Thumbnails are rendered in a pool of this many worker processes, each
+# replaced after rendering RANGO_IMAGE_TASKS_PER_WORKER pictures.
+RANGO_IMAGE_WORKERS = 2
+RANGO_IMAGE_TASKS_PER_WORKER = 100
+
+# Limits of uploaded images. RANGO_MAX_IMAGE_PIXELS also becomes
+# Pillow's decompression bomb limit, which bounds the memory of decoding
+# an accepted image to about 4 bytes per pixel.
+RANGO_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+RANGO_MAX_IMAGE_DIMENSION = 6000
+RANGO_MAX_IMAGE_PIXELS = 16 * 1000 * 1000
+
+# How MediaView sends uploaded files: 'django' streams them itself,
+# 'x-accel' hands them to nginx through an internal location mapped to
+# MEDIA_ROOT at RANGO_MEDIA_ACCEL_PREFIX, and 'x-sendfile' hands them
+# to Apache's mod_xsendfile. Content-addressed files are cached
+# forever, others for RANGO_MEDIA_MAX_AGE seconds.
+RANGO_MEDIA_SERVING = 'django'
+RANGO_MEDIA_ACCEL_PREFIX = '/protected-media/'
+RANGO_MEDIA_MAX_AGE = 60 * 60
+
+# CSS and JavaScript bundles, each built from static files by the
+# build_assets command into RANGO_ASSET_BUILD_DIR as one minified,
+# content-hashed file with precompressed .gz and .br siblings, which
+# can be cached forever. Templates load them with {% assets %}, which
+# falls back to the separate files until the assets are built.
+RANGO_ASSET_BUNDLES = {
+    'rango.css': [
+        'vendor/bootstrap/css/bootstrap.min.css',
+        'css/rango.css',
+    ],
+    'rango.js': [
+        'vendor/jquery/jquery.min.js',
+        'vendor/bootstrap/js/bootstrap.bundle.min.js',
+        'js/rango-jquery.js',
+        'js/rango-ajax.js',
+    ],
+}
+RANGO_ASSET_BUILD_DIR = os.path.join(BASE_DIR, 'rango', 'static', 'build')
+
+# Compiles every template when a WSGI worker starts, so the first
+# requests do not pay for parsing them. Only useful with the cached
+# template loader, i.e. when DEBUG is off.
+RANGO_TEMPLATE_WARMUP = not DEBUG
+
+# The page list of category.html is cached for
+# RANGO_PAGE_LIST_CACHE_TIMEOUT seconds and rendered again when a page
+# of the category is saved or deleted. Flushed view counts only expire
+# lists, and pages in the anonymous page cache, older than
+# RANGO_PAGE_LIST_VIEWS_STALENESS seconds, so counts may lag that long.
+# With several worker processes, CACHES['default'] has to be shared
+# between them, e.g. memcached or redis.
+RANGO_PAGE_LIST_CACHE_TIMEOUT = 60 * 60
+RANGO_PAGE_LIST_VIEWS_STALENESS = 60
+
+# AnonymousPageCacheMiddleware serves the index, category and about
+# pages to visitors without a session from the default cache for up to
+# RANGO_PAGE_CACHE_TIMEOUT seconds. Category and page changes expire
+# them earlier; unique visitor counts may lag this long.
+RANGO_PAGE_CACHE_TIMEOUT = 5 * 60
+
+# CompressionMiddleware compresses text responses of at least
+# RANGO_COMPRESSION_MIN_SIZE bytes with brotli when the brotli (or
+# brotlicffi) module is installed and the client accepts it, otherwise
+# with gzip. The levels come from benchmarks/bench_compression.py.
+RANGO_COMPRESSION_MIN_SIZE = 512
+RANGO_GZIP_LEVEL = 6
+RANGO_BROTLI_QUALITY = 5
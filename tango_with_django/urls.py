@@ -1,10 +1,12 @@
-from django.urls import path, include
+import re
+
+from django.urls import path, include, re_path
 from django.contrib import admin
 from django.conf import settings
-from django.conf.urls.static import static
 from django.views.generic import RedirectView
 
 from rango import views
+from rango.views_media import MediaView
 
 urlpatterns = [
     path('', RedirectView.as_view(url='/rango/', permanent=True)),
@@ -15,5 +17,7 @@ urlpatterns = [
     path('accounts/login/', views.UserLoginView.as_view(), 
          name='custom_login'),
     path('accounts/', include('registration.backends.simple.urls')),
-    path('api/', include('rango.api.v1.urls'))
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path('api/', include('rango.api.v1.urls')),
+    re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')),
+            MediaView.as_view(), name='media'),
+]
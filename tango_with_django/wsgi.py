@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/1.9/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tango_with_django.settings")
 
 application = get_wsgi_application()
+
+# Parse every template while the worker starts rather than during the
+# first requests it serves.
+if settings.RANGO_TEMPLATE_WARMUP:
+    from rango.template_cache import compile_templates
+    compile_templates()